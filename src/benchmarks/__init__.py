@@ -0,0 +1 @@
+"""Offline benchmarks for the React ReAct agent. Run them from the src directory."""
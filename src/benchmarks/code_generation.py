@@ -0,0 +1,73 @@
+"""
+Benchmarks the single-file vs the planned multi-file code generation of make_code.
+
+The fake LLM takes a time proportional to the lines it writes, like a real one.
+
+Usage: python -m benchmarks.code_generation [--files 6] [--lines 80] [--seconds-per-line 0.005]
+"""
+import asyncio
+import json
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Callable
+
+from openai import AsyncOpenAI
+
+from benchmarks.stubs import llm_stub
+from python.agent.async_react_react_agent import AsyncReactReActAgent
+
+def code_responder(args: Namespace) -> Callable[[dict], dict]:
+    """Builds a fake LLM that plans `files` files and writes `lines` lines per file."""
+    paths = ['src/App.js'] + [f'src/components/Component{i}.js' for i in range(1, args.files)]
+
+    def write(lines: int) -> dict:
+        time.sleep(lines * args.seconds_per_line)
+        code = '\n'.join(f'// line {i}' for i in range(lines - 1))
+        code += '\nexport default function Component() { return null; }'
+        return {'role': 'assistant', 'content': f'```javascript\n{code}\n```'}
+
+    def respond(request: dict) -> dict:
+        system = request['messages'][0]['content']
+        if 'plan the files' in system:
+            plan = {'files': [{'path': path, 'description': 'A component.'} for path in paths]}
+            return {'role': 'assistant', 'content': f'```json\n{json.dumps(plan)}\n```'}
+        if 'single file of the project' in system:
+            return write(args.lines)
+        return write(args.lines * args.files)
+
+    return respond
+
+async def run(args: Namespace) -> None:
+    """Runs both generation modes against the fake LLM."""
+    with llm_stub(latency=0, responder=code_responder(args)) as stub:
+        client = AsyncOpenAI(api_key='benchmark', base_url=f'{stub.url}/v1', max_retries=0)
+        for label, multi_file in (('single', False), ('multi-file', True)):
+            agent = AsyncReactReActAgent(
+                client=client,
+                summary_cache=None,
+                stream=False,
+                multi_file=multi_file,
+                code_workers=args.workers
+                )
+            requests_before = stub.request_count
+            start = time.perf_counter()
+            await agent.make_code('A portfolio.', 'portfolio')
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label:>10}: {len(agent.code_data.files)} files in {elapsed:.2f}s "
+                f"with {stub.request_count - requests_before} requests"
+                )
+        await client.close()
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the code generation against a fake LLM.')
+    parser.add_argument('--files', type=int, default=6)
+    parser.add_argument('--lines', type=int, default=80)
+    parser.add_argument('--seconds-per-line', type=float, default=0.005)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmarks the serial and concurrent README fetching of search_github.
+
+The "before" case is the previous search: a new `requests.get`, and so a new
+connection, for every request, one after the other. It follows the pages of
+the listing, so it fetches the same READMEs. The github cache is disabled,
+so every mode makes every request and the stub answers stay out of the
+user's cache.
+
+Usage: python -m benchmarks.github_fetch [--repos 100] [--latency 0.05] [--workers 8]
+"""
+import base64
+import os
+import time
+from argparse import ArgumentParser
+from typing import List
+
+import requests
+
+from benchmarks.stubs import github_stub
+
+def legacy_search_github(url: str) -> List[str]:
+    """The previous search: a `requests.get` per request, fetching the READMEs serially."""
+    results = []
+    while url:
+        response = requests.get(url, headers={"User-Agent": "React-ReAct-Agent"}, timeout=20)
+        if response.status_code != 200:
+            break
+        for item in response.json():
+            readme_response = requests.get(f"{item['url']}/readme", timeout=20)
+            if readme_response.status_code == 200:
+                results.append(base64.b64decode(readme_response.json()['content']).decode('utf-8'))
+        url = response.links.get('next', {}).get('url')
+    return results
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks search_github against a local stub.')
+    parser.add_argument('--repos', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    # The github settings are read when search_tool is imported.
+    os.environ['GH_CACHE'] = '0'
+    os.environ['GH_OFFLINE'] = '0'
+    from python.utils.search_tool import search_github
+
+    with github_stub(repos=args.repos, latency=args.latency) as stub:
+        url = f"{stub.url}/users/johndoe/repos"
+        timings = {}
+        modes = (
+            ('before', legacy_search_github),
+            ('serial', lambda url: search_github(url, max_workers=1)),
+            ('concurrent', lambda url: search_github(url, max_workers=args.workers)),
+        )
+        for label, search in modes:
+            start = time.perf_counter()
+            readmes = search(url)
+            timings[label] = time.perf_counter() - start
+            print(f"{label:>10}: {len(readmes)} READMEs in {timings[label]:.2f}s")
+        print(f"   speedup: {timings['before'] / timings['concurrent']:.1f}x over before, "
+              f"{timings['serial'] / timings['concurrent']:.1f}x over serial")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmarks the background Github search against the search made inside the turn.
+
+A conversation gives the Github username, the user thinks for a moment, then
+asks for the project. The Github search fetches and summarizes the READMEs
+inside the first turn, or in the background while the conversation goes on,
+with make_code waiting for what is left of it. Each mode runs in its own
+process against the stub servers. The latency of each turn is reported, and
+the run fails when the summary didn't reach the code generation.
+
+Usage: python -m benchmarks.github_prefetch [--repos 30] [--think-seconds 1] [--llm-latency 0.2]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import SUPPRESS, ArgumentParser, Namespace
+from typing import Callable
+
+from openai import AsyncOpenAI
+
+from benchmarks.scenarios import SCENARIOS, answer, scenario_responder, tool_calls
+from benchmarks.stubs import github_stub, llm_stub
+from python.agent.async_react_react_agent import AsyncReactReActAgent
+from python.agent.prompt import (
+    CODE_GENERATION_PROMPT,
+    FILE_GENERATION_PROMPT,
+    PROJECT_PLANNING_PROMPT,
+    PROJECTS_SUMMARIZATION_PROMPT,
+)
+
+PROJECTS_SUMMARY = 'O usuário desenvolve projetos em Python e React.'
+
+def prefetch_responder() -> Callable[[dict], dict]:
+    """Builds the fake model of the conversation, recording the prompts of the code generation."""
+    project_responder = scenario_responder(SCENARIOS['portfolio'])
+
+    def respond(request: dict) -> dict:
+        messages = request['messages']
+        if not request.get('tools'):
+            system = messages[0]['content']
+            if system == PROJECTS_SUMMARIZATION_PROMPT:
+                return answer(PROJECTS_SUMMARY)
+            if system in (PROJECT_PLANNING_PROMPT, FILE_GENERATION_PROMPT, CODE_GENERATION_PROMPT):
+                respond.code_prompts.append(messages[-1]['content'])
+            return project_responder(request)
+        last = messages[-1]
+        if last['role'] == 'user' and last['content'].startswith('My Github'):
+            return tool_calls(('search_github_pages', {'username': last['content'].split()[-1]}))
+        if last['role'] == 'user':
+            return tool_calls(('make_code', {'project_summary': 'Um portfólio.', 'project_name': 'portfolio'}))
+        if any(message.get('tool_calls') and message['tool_calls'][0]['function']['name'] == 'make_code'
+               for message in messages[-3:]):
+            return answer('Pronto.')
+        return answer('Qual é o nome do projeto?')
+
+    respond.code_prompts = []
+    return respond
+
+async def converse(args: Namespace, llm_url: str) -> None:
+    """Runs the conversation and prints the latency of its turns."""
+    client = AsyncOpenAI(api_key='benchmark', base_url=f'{llm_url}/v1', max_retries=0)
+    agent = AsyncReactReActAgent(client=client, stream=False, background_github=args.run == 'background')
+
+    start = time.perf_counter()
+    await agent.run('My Github is johndoe')
+    github_turn = time.perf_counter() - start
+    await asyncio.sleep(args.think_seconds)
+    start = time.perf_counter()
+    await agent.run('Build my portfolio.')
+    build_turn = time.perf_counter() - start
+    await agent.shutdown()
+    await client.close()
+    print(
+        f"{args.run:>10}: github turn {github_turn:.2f}s, build turn {build_turn:.2f}s, "
+        f"summary added: {PROJECTS_SUMMARY in agent.additional_infos}"
+    )
+
+def run_child(args: Namespace) -> None:
+    """Runs the conversation in one mode, failing when the code was generated without the summary."""
+    responder = prefetch_responder()
+    with llm_stub(latency=args.llm_latency, responder=responder) as llm:
+        asyncio.run(converse(args, llm.url))
+    if not responder.code_prompts or not all(PROJECTS_SUMMARY in prompt for prompt in responder.code_prompts):
+        raise SystemExit("The code was generated without the summary of the Github projects.")
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the background Github search.')
+    parser.add_argument('--repos', type=int, default=30)
+    parser.add_argument('--think-seconds', type=float, default=1)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--github-latency', type=float, default=0.05)
+    # Used by the conversation processes.
+    parser.add_argument('--run', choices=('in-turn', 'background'), help=SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory, \
+            github_stub(repos=args.repos, latency=args.github_latency) as github:
+        # The agent reads its settings when imported, so each mode runs in its own process.
+        env = {
+            **os.environ,
+            'GH_API_URL': github.url,
+            'GH_TOKEN': 'benchmark',
+            'GH_CACHE': '0',
+            'SUMMARY_CACHE': '0',
+            'TEMPLATE_CACHE': '0',
+            'PROJECT_PATH': os.path.join(directory, 'projects'),
+        }
+        for mode in ('in-turn', 'background'):
+            subprocess.run(
+                [sys.executable, '-m', 'benchmarks.github_prefetch', '--run', mode, *sys.argv[1:]],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                env=env,
+                check=True
+            )
+
+if __name__ == '__main__':
+    main()
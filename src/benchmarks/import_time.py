@@ -0,0 +1,98 @@
+"""
+Benchmarks the startup of the CLI with `python -X importtime`.
+
+Each command runs `--repeat` times in a new interpreter, in a temporary folder
+with its own `.env.local`, and the fastest import time is kept. The import
+time is the sum of the top-level imports reported by `-X importtime`, minus
+the interpreter startup (`site` and the modules it loads), which is measured
+with an empty program. The run fails when a command that doesn't need the
+agent imports one of the heavy modules, or takes longer than `--max-ms`.
+
+Usage: python -m benchmarks.import_time [--repeat 5] [--max-ms 60]
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import List, Set, Tuple
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(SRC_DIR, 'main.py')
+HEAVY_MODULES = ('openai', 'pydantic', 'requests', 'httpx2', 'asyncio')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# The commands that don't need the agent, and must not import it.
+LIGHT_COMMANDS = {
+    'no arguments': [MAIN],
+    '--help': [MAIN, '--help'],
+    'write keys': [MAIN, '--llm_api_key', 'benchmark', '--github_access_token', 'benchmark'],
+}
+# For comparison, what the commands running the agent import.
+AGENT_COMMAND = ['-c', 'import python.agent.react_react_agent']
+
+def measure(args: List[str], directory: str) -> Tuple[float, float, Set[str]]:
+    """Runs a command, getting its import time and wall time in ms, and the modules it imported."""
+    env = {**os.environ, 'PYTHONPATH': SRC_DIR, 'PROJECT_PATH': directory}
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=directory,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    wall = (time.perf_counter() - start) * 1000
+    total = 0
+    modules = set()
+    for line in process.stderr.splitlines():
+        if match := IMPORT_LINE.match(line):
+            modules.add(match.group(4).split('.')[0])
+            # Only the top-level imports, whose cumulative time includes their dependencies.
+            if len(match.group(3)) == 1:
+                total += int(match.group(2))
+    return total / 1000, wall, modules
+
+def best(args: List[str], directory: str, repeat: int) -> Tuple[float, float, Set[str]]:
+    """Runs a command several times, keeping its fastest import and wall times."""
+    runs = [measure(args, directory) for _ in range(repeat)]
+    return min(run[0] for run in runs), min(run[1] for run in runs), runs[0][2]
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the import time of the CLI commands.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=60)
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, '.env.local'), 'w') as file:
+            file.write('PROJECT_PATH=.\n')
+        startup, startup_wall, _ = best(['-c', 'pass'], directory, args.repeat)
+        print(f"{'interpreter':>14}: {startup:6.1f}ms imports, {startup_wall:6.1f}ms wall")
+        for label, command in {**LIGHT_COMMANDS, 'agent import': AGENT_COMMAND}.items():
+            imports, wall, modules = best(command, directory, args.repeat)
+            imports -= startup
+            heavy = sorted(module for module in HEAVY_MODULES if module in modules)
+            print(
+                f"{label:>14}: {imports:6.1f}ms imports, {wall:6.1f}ms wall, "
+                f"heavy modules: {', '.join(heavy) or 'none'}"
+            )
+            if label not in LIGHT_COMMANDS:
+                continue
+            if heavy:
+                failures.append(f"{label} imports {', '.join(heavy)}")
+            if imports > args.max_ms:
+                failures.append(f"{label} imports take {imports:.1f}ms, over {args.max_ms:.0f}ms")
+
+    for failure in failures:
+        print(f"regression: {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmarks the LLM guard against a fake LLM failing part of the requests.
+
+Concurrent summarizations run against a stub answering `429 Retry-After` or
+`503` to a share of the requests, without retries, with backoff, and with
+backoff behind a token bucket. The failed calls and the requests sent show how
+much of the load gets through and how many extra requests it costs. A last run
+sends a burst of `429` to a guard with the default circuit breaker, which
+slows the calls down through the bucket without opening the circuit.
+
+Usage: python -m benchmarks.resilience [--calls 60] [--failure-rate 0.3] [--workers 8] [--rate 40] [--burst-rate 0.6]
+"""
+import asyncio
+import time
+from argparse import ArgumentParser, Namespace
+
+from openai import AsyncOpenAI
+
+from benchmarks.stubs import llm_stub
+from python.agent.async_react_react_agent import AsyncReactReActAgent
+from python.agent.prompt import README_SUMMARIZATION_PROMPT
+from python.utils.resilience import (
+    PROVIDER_DEFAULTS,
+    CircuitBreaker,
+    ProviderGuard,
+    RetryPolicy,
+    TokenBucket,
+    classify_openai_error,
+)
+
+def guards(args: Namespace) -> dict:
+    """Builds the guards to compare."""
+    def guard(max_retries: int, rate: float, breaker_failures: int | None = None) -> ProviderGuard:
+        return ProviderGuard(
+            'llm',
+            RetryPolicy(max_retries, base_delay=0.05, max_delay=2),
+            TokenBucket(rate, capacity=args.workers),
+            CircuitBreaker(failure_threshold=breaker_failures or args.calls),
+            classify=classify_openai_error
+        )
+
+    return {
+        'no retries': guard(0, 0),
+        'backoff': guard(5, 0),
+        'backoff + bucket': guard(5, args.rate),
+        '429 burst': guard(5, 0, PROVIDER_DEFAULTS['llm']['breaker_failures']),
+    }
+
+async def run_guard(args: Namespace, label: str, guard: ProviderGuard) -> None:
+    """Runs the summarizations with a guard."""
+    stub = llm_stub(
+        latency=args.latency,
+        failure_rate=args.burst_rate if label == '429 burst' else args.failure_rate,
+        retry_after=0.1,
+        throttle_share=1.0 if label == '429 burst' else 0.5
+    )
+    with stub:
+        client = AsyncOpenAI(api_key='benchmark', base_url=f'{stub.url}/v1', max_retries=0)
+        agent = AsyncReactReActAgent(client=client, summary_cache=None, stream=False, llm_guard=guard)
+        running = asyncio.Semaphore(args.workers)
+
+        async def summarize(index: int) -> str:
+            async with running:
+                return await agent.generate_bare_response(
+                    README_SUMMARIZATION_PROMPT,
+                    f'# repo{index}\nA sample project.',
+                    use_cache=False
+                )
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(summarize(i) for i in range(args.calls)), return_exceptions=True)
+        elapsed = time.perf_counter() - start
+        await client.close()
+        failed = sum(isinstance(result, Exception) for result in results)
+        print(
+            f"{label:>16}: {args.calls - failed}/{args.calls} succeeded in {elapsed:.2f}s "
+            f"with {stub.request_count} requests ({guard.retries} retries), circuit {guard.breaker.state}"
+        )
+
+async def run(args: Namespace) -> None:
+    """Runs the summarizations with each guard."""
+    for label, guard in guards(args).items():
+        await run_guard(args, label, guard)
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the retries and rate limit of the LLM calls.')
+    parser.add_argument('--calls', type=int, default=60)
+    parser.add_argument('--failure-rate', type=float, default=0.3)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=40)
+    parser.add_argument('--burst-rate', type=float, default=0.6)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+"""
+Replays scripted conversations with the whole agent offline, and checks them against a baseline.
+
+Each scenario is a conversation going through the Github search, the code
+generation, the project creation and the dev server, whose OpenAI, Github and
+yarn traffic is replayed from a cassette in `benchmarks/cassettes`. Each one
+runs in its own process, which measures its wall time, LLM calls, tokens and
+peak traced memory. The run fails when a scenario exceeds the tolerances of
+`benchmarks/baseline.json`. The replayed requests answer at once, so the wall
+time is the time spent in the agent itself.
+
+The cassettes are recorded with `--record` against scripted stub servers and
+a fake yarn, or with `--record --live` against the real services, using the
+keys of the environment. The dev server is a fake one that reports a
+compilation whenever a file of `src` changes.
+
+Usage: python -m benchmarks.scenarios [--scenario portfolio] [--record [--live]] [--update-baseline]
+"""
+import asyncio
+import json
+import os
+import re
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from argparse import SUPPRESS, ArgumentParser, Namespace
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from benchmarks.stubs import github_stub, llm_stub
+from benchmarks.template_cache import install_fake_yarn
+from python.agent.async_react_react_agent import AsyncReactReActAgent
+from python.agent.prompt import (
+    CODE_EDIT_PROMPT,
+    CODE_GENERATION_PROMPT,
+    CODE_REPAIR_PROMPT,
+    FILE_GENERATION_PROMPT,
+    PROJECT_PLANNING_PROMPT,
+    README_SUMMARIZATION_PROMPT,
+)
+from python.utils.replay import RECORD, REPLAY, Cassette
+from python.utils.search_tool import get_gh_session
+from python.utils.tracing import get_tracer
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+CASSETTE_DIR = os.path.join(BENCHMARKS_DIR, 'cassettes')
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+REPLAY_LLM_URL = 'http://llm.replay.invalid/v1'
+
+# A metric regresses when it exceeds its baseline by more than the relative tolerance plus the slack.
+CHECKS = (
+    ('llm_calls', 0.0, 0),
+    ('tokens', 0.02, 0),
+    ('seconds', 0.5, 0.5),
+    ('peak_kb', 0.25, 256),
+)
+
+FAKE_DEV_SERVER = '''import os, time
+def snapshot():
+    return {
+        os.path.join(folder, name): os.stat(os.path.join(folder, name)).st_mtime_ns
+        for folder, _, names in os.walk("src") for name in names
+    }
+last = snapshot()
+print("Compiled successfully!", flush=True)
+while True:
+    time.sleep(0.05)
+    current = snapshot()
+    if current != last:
+        last = current
+        print("Compiled successfully!", flush=True)
+'''
+
+@dataclass
+class Scenario:
+    """A scripted conversation and the answers of the fake model used to record it."""
+    messages: List[str]
+    steps: List[dict]
+    files: Dict[str, str]
+    broken: List[str] = field(default_factory=list)
+
+def tool_calls(*calls: tuple) -> dict:
+    """Builds an assistant message calling the tools, given as (name, arguments) pairs."""
+    return {'role': 'assistant', 'content': None, 'tool_calls': [
+        {
+            'id': f'call_{name}_{index}',
+            'type': 'function',
+            'function': {'name': name, 'arguments': json.dumps(arguments)},
+        }
+        for index, (name, arguments) in enumerate(calls)
+    ]}
+
+def answer(content: str) -> dict:
+    """Builds a plain assistant answer."""
+    return {'role': 'assistant', 'content': content}
+
+SCENARIOS: Dict[str, Scenario] = {
+    'portfolio': Scenario(
+        messages=['Quero um site portfólio para mostrar meus projetos. Meu github é johndoe.'],
+        steps=[
+            tool_calls(
+                ('store_info', {'info': 'O usuário quer um portfólio com os seus projetos.'}),
+                ('search_github_pages', {'username': 'johndoe'}),
+            ),
+            tool_calls(('make_code', {
+                'project_summary': 'Um portfólio com cabeçalho, projetos do Github e contato.',
+                'project_name': 'portfolio',
+            })),
+            tool_calls(('run_code', {})),
+            answer('Seu portfólio está no ar!'),
+        ],
+        files={
+            'src/App.js': 'The App component, rendering the Header, the Projects and the Contact.',
+            'src/components/Header.js': "The Header component, with the user's name.",
+            'src/components/Projects.js': 'The Projects component, listing the Github projects.',
+            'src/components/Contact.js': 'The Contact component, with the email.',
+            'src/App.css': 'The styles of the App.',
+        },
+    ),
+    'landing_page': Scenario(
+        messages=['Crie uma landing page para a minha padaria, a Pão Quente, com as cores azul e branco.'],
+        steps=[
+            tool_calls(('store_info', {'info': 'Padaria Pão Quente, cores azul e branco.'})),
+            tool_calls(('make_code', {
+                'project_summary': 'Uma landing page de padaria com destaque, cardápio e rodapé.',
+                'project_name': 'pao quente',
+            })),
+            tool_calls(('run_code', {})),
+            answer('A landing page da Pão Quente está no ar!'),
+        ],
+        files={
+            'src/App.js': 'The App component, rendering the Hero, the Menu and the Footer.',
+            'src/components/Hero.js': 'The Hero component, with the name of the bakery.',
+            'src/components/Menu.js': 'The Menu component, listing the breads.',
+            'src/components/Footer.js': 'The Footer component, with the address.',
+            'src/App.css': 'The blue and white styles of the App.',
+        },
+        broken=['src/components/Footer.js'],
+    ),
+    'edit_session': Scenario(
+        messages=[
+            'Faça um site simples com o meu nome, Maria Silva.',
+            "Mude o título para 'Maria Silva - Desenvolvedora'.",
+        ],
+        steps=[
+            tool_calls(('make_code', {'project_summary': 'Um site simples com o nome Maria Silva.', 'project_name': 'maria'})),
+            tool_calls(('run_code', {})),
+            answer('Seu site está no ar!'),
+            tool_calls(('edit_code', {'changes': "Mudar o título para 'Maria Silva - Desenvolvedora'."})),
+            answer('O título foi alterado.'),
+        ],
+        files={
+            'src/App.js': 'The App component, rendering the Profile.',
+            'src/components/Profile.js': 'The Profile component, with the name.',
+        },
+    ),
+}
+
+def component_code(path: str, description: str) -> str:
+    """Writes the code of a planned component."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return (
+        "import React from 'react';\n\n"
+        f"function {name}() {{\n"
+        f"  return <section className=\"{name.lower()}\"><p>{description}</p></section>;\n"
+        "}\n\n"
+        f"export default {name};\n"
+    )
+
+def app_code(files: Dict[str, str]) -> str:
+    """Writes the App component, importing every planned file."""
+    components = [os.path.splitext(os.path.relpath(path, 'src'))[0] for path in files if path.endswith('.js')]
+    components = [component for component in components if component != 'App']
+    imports = "import React from 'react';\n"
+    imports += "".join(f"import './{os.path.relpath(path, 'src')}';\n" for path in files if path.endswith('.css'))
+    imports += "".join(f"import {os.path.basename(c)} from './{c}';\n" for c in components)
+    children = "".join(f"      <{os.path.basename(component)} />\n" for component in components)
+    return (
+        f"{imports}\n"
+        "function App() {\n"
+        "  return (\n"
+        "    <div className=\"App\">\n"
+        "      <h1>Welcome</h1>\n"
+        f"{children}"
+        "    </div>\n"
+        "  );\n"
+        "}\n\n"
+        "export default App;\n"
+    )
+
+def file_code(files: Dict[str, str], path: str) -> str:
+    """Writes the code of a planned file."""
+    if path.endswith('.css'):
+        return ".App {\n  font-family: sans-serif;\n  color: #1d3557;\n}\n"
+    if path == 'src/App.js':
+        return app_code(files)
+    return component_code(path, files[path])
+
+def scenario_responder(scenario: Scenario) -> Callable[[dict], dict]:
+    """Builds the fake model of a scenario, following its steps in the tool-calling requests."""
+    steps = iter(scenario.steps)
+    broken = set(scenario.broken)
+    lock = threading.Lock()
+
+    def block(language: str, code: str) -> dict:
+        return answer(f'```{language}\n{code}```')
+
+    def respond(request: dict) -> dict:
+        if request.get('tools'):
+            with lock:
+                return next(steps, answer('Pronto.'))
+        system = request['messages'][0]['content']
+        message = request['messages'][-1]['content']
+        if system == README_SUMMARIZATION_PROMPT:
+            return answer(f"Resumo: {message.splitlines()[0].lstrip('# ')} é um projeto de exemplo.")
+        if system == PROJECT_PLANNING_PROMPT:
+            plan = {'files': [{'path': path, 'description': text} for path, text in scenario.files.items()]}
+            return block('json', json.dumps(plan) + '\n')
+        if system == FILE_GENERATION_PROMPT:
+            path = re.search(r'Gere o arquivo (\S+):', message).group(1)
+            code = file_code(scenario.files, path)
+            if path in broken:
+                # The first answer is cut short, so the validation has to repair it.
+                code = code[:code.index('</p>')]
+            return block('javascript', code)
+        if system == CODE_REPAIR_PROMPT:
+            path = re.search(r'O arquivo (\S+) tem', message).group(1)
+            return block('javascript', file_code(scenario.files, path))
+        if system == CODE_EDIT_PROMPT:
+            title = re.search(r"título para '([^']+)'", message).group(1)
+            return answer(f"<<<<<<< SEARCH\n      <h1>Welcome</h1>\n=======\n      <h1>{title}</h1>\n>>>>>>> REPLACE")
+        if system == CODE_GENERATION_PROMPT:
+            return block('javascript', app_code({}))
+        return answer('O usuário desenvolve projetos em Python e React.')
+
+    return respond
+
+async def run_scenario(scenario: Scenario, cassette: Cassette, llm_url: str | None) -> dict:
+    """Runs the conversation of a scenario and measures it."""
+    client = AsyncOpenAI(
+        api_key=os.getenv('LLM_API_KEY') or 'replay',
+        base_url=llm_url,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(transport=cassette.openai_transport())
+    )
+    cassette.install_github(get_gh_session())
+    agent = AsyncReactReActAgent(client=client)
+    statuses = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with cassette.patch_processes():
+            for message in scenario.messages:
+                statuses.append((await agent.run(message)).status)
+    finally:
+        await agent.shutdown()
+        await client.close()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    spans = get_tracer().spans
+    llm_spans = [span for span in spans if span.kind == 'llm' and not span.attributes.get('cache_hit')]
+    return {
+        'seconds': round(seconds, 3),
+        'llm_calls': len(llm_spans),
+        'tokens': sum(
+            span.attributes.get('prompt_tokens', 0) + span.attributes.get('completion_tokens', 0)
+            for span in llm_spans
+        ),
+        'peak_kb': round(peak / 1024),
+        'github_requests': sum(span.name == 'github.request' for span in spans),
+        'processes': sum(span.name == 'process' for span in spans),
+        'statuses': statuses,
+        'files': sorted(agent.code_data.files),
+        'unused': cassette.unused() if not cassette.recording else None,
+    }
+
+def run_child(args: Namespace) -> None:
+    """Runs a single scenario in this process and prints its metrics as JSON."""
+    path = os.path.join(CASSETTE_DIR, f'{args.run}.json')
+    cassette = Cassette(path, args.mode)
+    llm_url = REPLAY_LLM_URL if args.mode == REPLAY else args.llm_url
+    metrics = asyncio.run(run_scenario(SCENARIOS[args.run], cassette, llm_url))
+    if cassette.recording:
+        cassette.meta = {
+            'scenario': args.run,
+            'source': 'live' if args.llm_url is None else 'stubs',
+            'github_api_url': os.environ.get('GH_API_URL', 'https://api.github.com'),
+        }
+        cassette.save()
+    print(json.dumps(metrics))
+
+def free_port() -> int:
+    """Gets a free local port."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def scenario_env(directory: str, live: bool) -> dict:
+    """Gets the environment of a scenario process, isolated in `directory`."""
+    env = {
+        **os.environ,
+        'SUMMARY_CACHE': '0',
+        'GH_CACHE': '0',
+        'GH_CACHE_DIR': os.path.join(directory, 'github_cache'),
+        'GH_OFFLINE': '0',
+        'TEMPLATE_CACHE': '0',
+        'PROJECT_PATH': os.path.join(directory, 'projects'),
+        'PROCESS_LOG_DIR': os.path.join(directory, 'logs'),
+        'DEV_SERVER_PORT': str(free_port()),
+    }
+    if not live:
+        server = os.path.join(directory, 'fake_dev_server.py')
+        with open(server, 'w') as file:
+            file.write(FAKE_DEV_SERVER)
+        env['DEV_SERVER_COMMAND'] = shlex.join([sys.executable, server])
+        env.setdefault('GH_TOKEN', 'replay')
+    return env
+
+def spawn(name: str, mode: str, env: dict, llm_url: str | None = None) -> dict | None:
+    """Runs a scenario in a new process and gets its metrics, or None when it failed."""
+    command = [sys.executable, '-m', 'benchmarks.scenarios', '--run', name, '--mode', mode]
+    if llm_url:
+        command += ['--llm-url', llm_url]
+    process = subprocess.run(
+        command,
+        cwd=os.path.dirname(BENCHMARKS_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=600
+    )
+    if process.returncode:
+        print(f"{name}: failed with code {process.returncode}\n{process.stderr[-2000:]}")
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+def record(name: str, live: bool) -> dict | None:
+    """Records the cassette of a scenario."""
+    with tempfile.TemporaryDirectory() as directory:
+        env = scenario_env(directory, live)
+        if live:
+            return spawn(name, RECORD, env)
+        install_fake_yarn(directory, Namespace(
+            create_seconds=0.2, install_seconds=0.2, packages=5, files_per_package=2
+        ))
+        env['PATH'] = os.environ['PATH']
+        with llm_stub(latency=0.01, responder=scenario_responder(SCENARIOS[name])) as llm, \
+                github_stub(repos=12, latency=0.01) as github:
+            env['GH_API_URL'] = github.url
+            return spawn(name, RECORD, env, f'{llm.url}/v1')
+
+def replay(name: str) -> dict | None:
+    """Replays the cassette of a scenario."""
+    path = os.path.join(CASSETTE_DIR, f'{name}.json')
+    if not os.path.exists(path):
+        print(f"{name}: no cassette, record it with --record")
+        return None
+    with open(path) as file:
+        meta = json.load(file)['meta']
+    with tempfile.TemporaryDirectory() as directory:
+        env = scenario_env(directory, live=False)
+        env['GH_API_URL'] = meta['github_api_url']
+        return spawn(name, REPLAY, env)
+
+def regressions(metrics: dict, baseline: dict) -> List[str]:
+    """Lists the metrics of a scenario beyond the baseline tolerances."""
+    failed = []
+    for metric, tolerance, slack in CHECKS:
+        limit = baseline[metric] * (1 + tolerance) + slack
+        if metrics[metric] > limit:
+            failed.append(f"{metric} {metrics[metric]} > {limit:g} (baseline {baseline[metric]})")
+    return failed
+
+def main() -> None:
+    """Records or replays the scenarios, failing on errors and regressions."""
+    parser = ArgumentParser(description='Replays scripted conversations offline and checks them against a baseline.')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append')
+    parser.add_argument('--record', action='store_true', help='Record the cassettes instead of replaying them.')
+    parser.add_argument('--live', action='store_true', help='Record against the real OpenAI, Github and yarn.')
+    parser.add_argument('--update-baseline', action='store_true', help='Store the measured metrics as the baseline.')
+    # Used by the scenario processes.
+    parser.add_argument('--run', choices=sorted(SCENARIOS), help=SUPPRESS)
+    parser.add_argument('--mode', choices=(RECORD, REPLAY), default=REPLAY, help=SUPPRESS)
+    parser.add_argument('--llm-url', help=SUPPRESS)
+    args = parser.parse_args()
+    if args.run:
+        run_child(args)
+        return
+
+    names = args.scenario or sorted(SCENARIOS)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as file:
+            baseline = json.load(file)
+    failed = False
+    measured = {}
+    for name in names:
+        metrics = record(name, args.live) if args.record else replay(name)
+        if metrics is None:
+            failed = True
+            continue
+        measured[name] = metrics
+        print(
+            f"{name:>14}: {metrics['seconds']:.2f}s, {metrics['llm_calls']} LLM calls, "
+            f"{metrics['tokens']} tokens, {metrics['peak_kb']}KB peak, "
+            f"{metrics['github_requests']} github requests, {metrics['processes']} processes"
+        )
+        if any(status != 'completed' for status in metrics['statuses']):
+            print(f"{'':>14}  turns not completed: {metrics['statuses']}")
+            failed = True
+        if metrics['unused'] and any(metrics['unused'].values()):
+            print(f"{'':>14}  recorded interactions not replayed: {metrics['unused']}")
+        if args.record or args.update_baseline:
+            continue
+        if name not in baseline:
+            print(f"{'':>14}  no baseline, store one with --update-baseline")
+            continue
+        for regression in regressions(metrics, baseline[name]):
+            print(f"{'':>14}  regression: {regression}")
+            failed = True
+
+    if args.update_baseline and not args.record:
+        for name, metrics in measured.items():
+            baseline[name] = {metric: metrics[metric] for metric, _, _ in CHECKS}
+        with open(BASELINE_PATH, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baseline updated: {BASELINE_PATH}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
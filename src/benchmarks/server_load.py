@@ -0,0 +1,225 @@
+"""
+Load tests the agent server against a fake LLM and a fake Github.
+
+The server runs in its own process (`main.py --serve`), with the OpenAI and
+Github base urls pointing to the stub servers, a fake yarn and a fake dev
+server. Every simulated user opens a session and sends its turns one after
+the other, backing off when the server answers `429` or `503`. The first turn
+searches the user's Github, the next ones only store informations, and the
+first `--build-sessions` users also generate and run a project, whose builds
+share the server build slots. The turn latencies are reported per kind of
+turn, with the peak load reported by the server.
+
+Usage: python -m benchmarks.server_load [--sessions 50] [--turns 3] [--build-sessions 4] [--llm-latency 0.2]
+"""
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.scenarios import FAKE_DEV_SERVER, SCENARIOS, answer, free_port, scenario_responder, tool_calls
+from benchmarks.stubs import github_stub, llm_stub
+from benchmarks.template_cache import install_fake_yarn
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_responder() -> Callable[[dict], dict]:
+    """Builds the fake model, choosing the next tool call from the last messages of the session."""
+    project_responder = scenario_responder(SCENARIOS['portfolio'])
+
+    def respond(request: dict) -> dict:
+        if not request.get('tools'):
+            return project_responder(request)
+        messages = request['messages']
+        last = messages[-1]
+        if last['role'] == 'user':
+            content = last['content']
+            if content.startswith('Build'):
+                return tool_calls(('make_code', {
+                    'project_summary': 'Um portfólio com cabeçalho, projetos do Github e contato.',
+                    'project_name': 'portfolio',
+                }))
+            if content.startswith('My Github'):
+                return tool_calls(
+                    ('store_info', {'info': content}),
+                    ('search_github_pages', {'username': content.split()[-1]}),
+                )
+            return tool_calls(('store_info', {'info': content}))
+        called = next(
+            (message['tool_calls'][0]['function']['name'] for message in reversed(messages)
+             if message['role'] == 'assistant' and message.get('tool_calls')),
+            None
+        )
+        if called == 'make_code':
+            return tool_calls(('run_code', {}))
+        return answer('Pronto.')
+
+    return respond
+
+class Client:
+    """A simulated user, keeping one connection to the server."""
+    def __init__(self, port: int) -> None:
+        self.connection = HTTPConnection('127.0.0.1', port, timeout=600)
+        self.rejected = 0
+
+    def request(self, method: str, path: str, payload: dict | None = None) -> Tuple[int, dict]:
+        """Sends a request, retrying after the delay asked by a `429` or a `503`."""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        while True:
+            self.connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+            response = self.connection.getresponse()
+            data = json.loads(response.read() or b'{}')
+            if response.status not in (429, 503):
+                return response.status, data
+            self.rejected += 1
+            time.sleep(float(response.getheader('Retry-After', '1')))
+
+def run_user(args: Namespace, port: int, index: int) -> Tuple[List[Tuple[str, float, str]], int]:
+    """Runs the turns of a user, returning their kind, latency and status, and the rejected requests."""
+    client = Client(port)
+    _, session = client.request('POST', '/sessions', {})
+    path = f"/sessions/{session['session_id']}/messages"
+    messages = [('github', f'My Github is user{index}')]
+    if index < args.build_sessions:
+        messages.append(('build', 'Build my portfolio.'))
+    messages += [('chat', f'I also like the topic {turn}.') for turn in range(args.turns - 1)]
+    turns = []
+    for kind, message in messages:
+        start = time.perf_counter()
+        status, result = client.request('POST', path, {'message': message})
+        turns.append((kind, time.perf_counter() - start, result.get('status', str(status))))
+    client.request('DELETE', f"/sessions/{session['session_id']}")
+    client.connection.close()
+    return turns, client.rejected
+
+def server_env(args: Namespace, directory: str, llm_url: str, github_url: str) -> Dict[str, str]:
+    """Gets the environment of the server process, isolated in `directory`."""
+    install_fake_yarn(directory, args)
+    dev_server = os.path.join(directory, 'fake_dev_server.py')
+    with open(dev_server, 'w') as file:
+        file.write(FAKE_DEV_SERVER)
+    with open(os.path.join(directory, '.env.local'), 'w'):
+        pass
+    return {
+        **os.environ,
+        'OPENAI_BASE_URL': f'{llm_url}/v1',
+        'LLM_API_KEY': 'benchmark',
+        'GH_TOKEN': 'benchmark',
+        'GH_API_URL': github_url,
+        'GH_CACHE': '0',
+        'SUMMARY_CACHE': '0',
+        'TEMPLATE_CACHE': '0',
+        'SESSION_STORE': '0',
+        'PROJECT_PATH': os.path.join(directory, 'projects'),
+        'PROCESS_LOG_DIR': os.path.join(directory, 'logs'),
+        'DEV_SERVER_COMMAND': shlex.join([sys.executable, dev_server]),
+        'DEV_SERVER_PORT': str(free_port()),
+        'SERVER_BUILD_WORKERS': str(args.build_workers),
+        'SERVER_MAX_TURNS': str(args.max_turns),
+        'SERVER_MAX_SESSIONS': str(args.max_sessions),
+    }
+
+def wait_until_up(port: int, process: subprocess.Popen, timeout: float = 60) -> None:
+    """Waits for the server to answer its health check."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with code {process.returncode}.")
+        try:
+            connection = HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("The server didn't start.")
+
+def watch_load(port: int, stop: threading.Event, peaks: Dict[str, int]) -> None:
+    """Polls the health of the server, keeping the peak of each gauge."""
+    connection = HTTPConnection('127.0.0.1', port, timeout=10)
+    while not stop.wait(0.05):
+        connection.request('GET', '/health')
+        stats = json.loads(connection.getresponse().read())
+        for key in ('sessions', 'running_turns', 'queued_turns', 'running_builds', 'waiting_builds'):
+            peaks[key] = max(peaks.get(key, 0), stats[key])
+    connection.close()
+
+def report(kind: str, latencies: List[float]) -> None:
+    """Prints the latency percentiles of a kind of turn."""
+    if len(latencies) < 2:
+        return
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+    print(
+        f"{kind:>8}: {len(latencies):>4} turns, p50 {percentiles[49]:.2f}s, "
+        f"p99 {percentiles[98]:.2f}s, max {max(latencies):.2f}s"
+    )
+
+def main() -> None:
+    """Runs the load test."""
+    parser = ArgumentParser(description='Load tests the agent server against stub LLM and Github servers.')
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--build-sessions', type=int, default=4)
+    parser.add_argument('--build-workers', type=int, default=2)
+    parser.add_argument('--max-turns', type=int, default=32)
+    parser.add_argument('--max-sessions', type=int, default=100)
+    parser.add_argument('--llm-latency', type=float, default=0.2)
+    parser.add_argument('--github-latency', type=float, default=0.05)
+    parser.add_argument('--repos', type=int, default=5)
+    parser.add_argument('--create-seconds', type=float, default=1)
+    parser.add_argument('--install-seconds', type=float, default=0.5)
+    parser.set_defaults(packages=5, files_per_package=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, \
+            llm_stub(latency=args.llm_latency, responder=load_responder()) as llm, \
+            github_stub(repos=args.repos, latency=args.github_latency) as github:
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, 'main.py'), '--serve', '--port', str(port)],
+            cwd=directory,
+            env=server_env(args, directory, llm.url, github.url),
+            stdout=subprocess.DEVNULL
+        )
+        stop = threading.Event()
+        peaks: Dict[str, int] = {}
+        try:
+            wait_until_up(port, process)
+            watcher = threading.Thread(target=watch_load, args=(port, stop, peaks), daemon=True)
+            watcher.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+                users = list(pool.map(lambda index: run_user(args, port, index), range(args.sessions)))
+            elapsed = time.perf_counter() - start
+            stop.set()
+            watcher.join()
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    turns = [turn for user_turns, _ in users for turn in user_turns]
+    failed = [turn for turn in turns if turn[2] != 'completed']
+    print(
+        f"{args.sessions} sessions, {len(turns)} turns in {elapsed:.2f}s "
+        f"({len(turns) / elapsed:.1f} turns/s), {len(failed)} failed, "
+        f"{sum(rejected for _, rejected in users)} rejected, {llm.request_count} LLM requests"
+    )
+    for kind in ('github', 'chat', 'build'):
+        report(kind, [seconds for turn_kind, seconds, _ in turns if turn_kind == kind])
+    print("peaks: " + ", ".join(f"{key} {value}" for key, value in peaks.items()))
+    if failed:
+        print(f"failed: {sorted({status for _, _, status in failed})}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
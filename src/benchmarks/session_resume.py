@@ -0,0 +1,91 @@
+"""
+Benchmarks the resume of a long session from its log.
+
+A session of `turns` turns is logged through a context window, with the
+oldest messages compacted into the summary every `compact_every` turns like
+the agent does. Its resume, which only parses the messages still in the
+window, is compared with parsing every line of the log.
+
+A short session whose last message line is cut short, like by a crash, is
+then resumed and continued. The run fails unless the resumed session keeps
+the messages it would have kept without the cut line.
+
+Usage: python -m benchmarks.session_resume [--turns 2000] [--compact-every 20] [--message-chars 2000]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+from python.agent.context import ContextWindow
+from python.utils.session_store import SessionStore
+
+def write_session(args: Namespace, directory: str) -> SessionStore:
+    """Logs a long session with regular compactions."""
+    store = SessionStore.create(directory)
+    context = ContextWindow(token_budget=args.message_chars)
+    context.journal = store.append
+    for turn in range(args.turns):
+        context.append({'role': 'user', 'content': f'Message {turn}. ' + 'x' * args.message_chars})
+        context.append({'role': 'assistant', 'content': f'Answer {turn}. ' + 'y' * args.message_chars})
+        if turn % args.compact_every == args.compact_every - 1:
+            overflow, _ = context.overflow()
+            context.compact(len(overflow), f'Summary up to the turn {turn}.')
+    store.close()
+    return store
+
+def resume_cut_session(directory: str) -> list:
+    """Resumes a session whose last line is cut, truncates it after a new message, and gets its messages."""
+    store = SessionStore.create(directory)
+    context = ContextWindow()
+    context.journal = store.append
+    for content in ('first', 'cut'):
+        context.append({'role': 'user', 'content': content})
+    store.close()
+    with open(store.path, 'rb+') as file:
+        file.truncate(os.path.getsize(store.path) - 8)
+
+    store = SessionStore.open(store.session_id, directory)
+    state = store.load()
+    context = ContextWindow()
+    context.restore(state.entries, state.compacted, state.summary)
+    context.journal = store.append
+    context.append({'role': 'user', 'content': 'second'})
+    context.append({'role': 'user', 'content': 'dropped'})
+    context.truncate(2)
+    store.close()
+    return [message['content'] for message, _ in store.load().entries]
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the resume of a long session.')
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--compact-every', type=int, default=20)
+    parser.add_argument('--message-chars', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = write_session(args, directory)
+        print(f"log: {os.path.getsize(store.path) / 1024 / 1024:.1f}MB")
+
+        start = time.perf_counter()
+        with open(store.path) as file:
+            events = [json.loads(line) for line in file]
+        print(f"{'parse every line':>18}: {time.perf_counter() - start:.3f}s, {len(events)} events")
+
+        start = time.perf_counter()
+        state = SessionStore.open(store.session_id, directory).load()
+        print(
+            f"{'resume':>18}: {time.perf_counter() - start:.3f}s, {len(state.entries)} messages kept, "
+            f"{state.compacted} compacted"
+        )
+
+        messages = resume_cut_session(directory)
+        print(f"{'cut last line':>18}: resumed with {messages}")
+        if messages != ['first', 'second']:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+"""Local stub servers used by the benchmarks."""
+import base64
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qs, urlsplit
+
+from python.utils.batching import BATCH_HEADER_PATTERN
+
+class _QuietServer(ThreadingHTTPServer):
+    """Threading HTTP server that ignores the clients hanging up, like a cancelled request."""
+    def handle_error(self, request: object, client_address: tuple) -> None:
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """Runs a threading HTTP server in the background."""
+    def __init__(self, handler: type[BaseHTTPRequestHandler]) -> None:
+        self.server = _QuietServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.server.request_count = 0
+        self.server.count_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """The base url of the server."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        """The number of requests served so far."""
+        return self.server.request_count
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    """Base handler that answers with JSON and counts requests."""
+    protocol_version = 'HTTP/1.1'
+    # The headers and the body are written separately, which Nagle's algorithm
+    # would hold for the delayed ACK of the client on every kept-alive request.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *_args: object) -> None:
+        return
+
+    def count(self) -> None:
+        """Counts the current request."""
+        with self.server.count_lock:
+            self.server.request_count += 1
+
+    def send_json(self, payload: object, status: int = 200, headers: dict | None = None) -> None:
+        """Sends a JSON payload, answering `304` when the client ETag matches."""
+        body = json.dumps(payload).encode('utf-8')
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+def github_stub(repos: int = 100, latency: float = 0.05) -> StubServer:
+    """
+    Creates a github API stub.
+
+    Serves the paginated `/users/<name>/repos` listing, with `Link` headers,
+    and `/repos/<name>/<repo>/readme`, sleeping `latency` seconds on every
+    request to simulate the network round-trip.
+    """
+    class Handler(_JsonHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            self.count()
+            base = f"http://{self.headers['Host']}"
+            split = urlsplit(self.path)
+            path = split.path
+            query = parse_qs(split.query)
+            time.sleep(latency)
+            if path.endswith('/repos'):
+                user = path.split('/')[2]
+                per_page = int(query.get('per_page', ['30'])[0])
+                page = int(query.get('page', ['1'])[0])
+                start = (page - 1) * per_page
+                headers = {}
+                if start + per_page < repos:
+                    next_url = f'{base}{path}?per_page={per_page}&page={page + 1}'
+                    headers['Link'] = f'<{next_url}>; rel="next"'
+                self.send_json([
+                    {'name': f'repo{i}', 'url': f'{base}/repos/{user}/repo{i}'}
+                    for i in range(start, min(start + per_page, repos))
+                ], headers=headers)
+            elif path.endswith('/readme'):
+                name = path.split('/')[3]
+                content = base64.b64encode(f'# {name}\nA sample project.'.encode()).decode()
+                self.send_json({'content': content})
+            else:
+                self.send_json({'message': 'Not Found'}, status=404)
+
+    return StubServer(Handler)
+
+def echo_summaries(request: dict) -> dict:
+    """Answers with one summary per README found in the user message."""
+    message = request['messages'][-1]['content']
+    headers = BATCH_HEADER_PATTERN.findall(message)
+    if not headers:
+        return {'role': 'assistant', 'content': f'Summary of: {message[:20]}'}
+    sections = [f'### README {index}\nSummary of README {index}.' for index in headers]
+    return {'role': 'assistant', 'content': '\n\n'.join(sections)}
+
+def usage(request: dict, message: dict) -> dict:
+    """Estimates the usage of a request, roughly four characters per token."""
+    prompt_tokens = len(json.dumps(request['messages'])) // 4
+    completion_tokens = len(json.dumps(message)) // 4
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'prompt_tokens_details': {'cached_tokens': 0},
+    }
+
+def llm_stub(
+        latency: float = 0.2,
+        responder: Callable[[dict], dict] = echo_summaries,
+        failure_rate: float = 0.0,
+        retry_after: float = 0.1,
+        seed: int = 0,
+        throttle_share: float = 0.5
+        ) -> StubServer:
+    """
+    Creates an OpenAI-compatible chat completions stub.
+
+    Serves `POST /v1/chat/completions`, sleeping `latency` seconds and answering
+    with the assistant message built by `responder` from the request body.
+    Streamed requests get the message back as server-sent events, word by word.
+    A `failure_rate` share of the requests fail, a `throttle_share` of them
+    with a `429` asking to retry after `retry_after` seconds and the others
+    with a `503`.
+    """
+    failures = random.Random(seed)
+
+    class Handler(_JsonHandler):
+        def send_stream(self, request: dict, message: dict) -> None:
+            """Sends the message as a stream of chat completion chunks."""
+            deltas = [{'role': 'assistant'}]
+            words = re.findall(r'\s*\S+\s*|\s+', message.get('content') or '')
+            deltas += [{'content': word} for word in words]
+            for index, tool_call in enumerate(message.get('tool_calls') or []):
+                deltas.append({'tool_calls': [{
+                    'index': index,
+                    'id': tool_call['id'],
+                    'type': 'function',
+                    'function': {'name': tool_call['function']['name'], 'arguments': ''},
+                }]})
+                deltas.append({'tool_calls': [{
+                    'index': index,
+                    'function': {'arguments': tool_call['function']['arguments']},
+                }]})
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            for delta in deltas:
+                chunk = {
+                    'id': f'chatcmpl-{self.server.request_count}',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': request['model'],
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+                }
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+            if (request.get('stream_options') or {}).get('include_usage'):
+                usage_chunk = {
+                    'id': f'chatcmpl-{self.server.request_count}',
+                    'object': 'chat.completion.chunk',
+                    'created': int(time.time()),
+                    'model': request['model'],
+                    'choices': [],
+                    'usage': usage(request, message),
+                }
+                self.wfile.write(f'data: {json.dumps(usage_chunk)}\n\n'.encode('utf-8'))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+
+        def do_POST(self) -> None:  # noqa: N802
+            self.count()
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            time.sleep(latency)
+            with self.server.count_lock:
+                fail = failures.random() < failure_rate
+                status = 429 if failures.random() < throttle_share else 503
+            if fail:
+                self.send_json(
+                    {'error': {'message': 'Overloaded.', 'type': 'server_error'}},
+                    status=status,
+                    headers={'Retry-After': str(retry_after)} if status == 429 else None
+                )
+                return
+            message = responder(request)
+            if request.get('stream'):
+                self.send_stream(request, message)
+                return
+            self.send_json({
+                'id': f'chatcmpl-{self.server.request_count}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request['model'],
+                'choices': [{'index': 0, 'message': message, 'finish_reason': 'stop'}],
+                'usage': usage(request, message),
+            })
+
+    return StubServer(Handler)
@@ -0,0 +1,58 @@
+"""
+Benchmarks the README summarization modes and cache of search_github_pages.
+
+Usage: python -m benchmarks.summarization [--readmes 40] [--latency 0.2] [--workers 4]
+"""
+import asyncio
+import os
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+from openai import AsyncOpenAI
+
+from benchmarks.stubs import llm_stub
+from python.agent.async_react_react_agent import AsyncReactReActAgent
+from python.utils.summary_cache import SummaryCache
+
+async def run(args: Namespace) -> None:
+    """Runs every summarization mode against the fake LLM."""
+    readmes = [f'# repo{i}\n' + 'A sample project with a short README. ' * 20 for i in range(args.readmes)]
+    # The cached mode reruns the concurrent mode over its warm cache.
+    modes = (
+        ('serial', 1, 0, 'serial'),
+        ('concurrent', args.workers, 0, 'concurrent'),
+        ('batched', args.workers, args.batch_tokens, 'batched'),
+        ('cached', args.workers, 0, 'concurrent'),
+    )
+    with llm_stub(latency=args.latency) as stub, tempfile.TemporaryDirectory() as cache_dir:
+        client = AsyncOpenAI(api_key='benchmark', base_url=f'{stub.url}/v1', max_retries=0)
+        for label, workers, batch_tokens, cache_name in modes:
+            agent = AsyncReactReActAgent(
+                client=client,
+                summary_workers=workers,
+                summary_batch_tokens=batch_tokens,
+                summary_cache=SummaryCache(os.path.join(cache_dir, f'{cache_name}.sqlite3'))
+                )
+            requests_before = stub.request_count
+            start = time.perf_counter()
+            summaries = await agent.summarize_readmes(iter(readmes))
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label:>10}: {len(summaries)} summaries in {elapsed:.2f}s "
+                f"with {stub.request_count - requests_before} requests"
+                )
+        await client.close()
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the README summarization against a fake LLM.')
+    parser.add_argument('--readmes', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-tokens', type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
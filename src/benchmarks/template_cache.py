@@ -0,0 +1,88 @@
+"""
+Benchmarks the project creation of run_code, with and without the template store.
+
+A fake `yarn` is put first in the PATH, so the benchmark runs offline. It sleeps
+like a real install and writes a skeleton with a `node_modules` folder.
+
+Usage: python -m benchmarks.template_cache [--packages 200] [--create-seconds 2] [--install-seconds 1]
+"""
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, Namespace
+
+from python.utils.process_output import run_process
+from python.utils.templates import TemplateStore
+
+FAKE_YARN = '''#!{python}
+import os, sys, time
+args = sys.argv[1:]
+if args[:2] == ["create", "react-app"]:
+    time.sleep({create_seconds})
+    root = args[2]
+    for folder in ("src", "public"):
+        os.makedirs(os.path.join(root, folder))
+    with open(os.path.join(root, "package.json"), "w") as file:
+        file.write('{{"name": "%s", "dependencies": {{"react": "18.2.0"}}}}' % root)
+    with open(os.path.join(root, "src", "App.js"), "w") as file:
+        file.write("export default function App() {{ return null; }}\\n")
+    for package in range({packages}):
+        folder = os.path.join(root, "node_modules", "package%d" % package)
+        os.makedirs(folder)
+        for index in range({files_per_package}):
+            with open(os.path.join(folder, "file%d.js" % index), "w") as file:
+                file.write("module.exports = %d;\\n" % index * 50)
+elif args[:1] in (["install"], ["add"]):
+    time.sleep({install_seconds})
+'''
+
+def install_fake_yarn(directory: str, args: Namespace) -> None:
+    """Writes the fake yarn script and puts it first in the PATH."""
+    path = os.path.join(directory, 'yarn')
+    with open(path, 'w') as file:
+        file.write(FAKE_YARN.format(
+            python=sys.executable,
+            create_seconds=args.create_seconds,
+            install_seconds=args.install_seconds,
+            packages=args.packages,
+            files_per_package=args.files_per_package
+            ))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ['PATH'] = directory + os.pathsep + os.environ['PATH']
+
+async def run(args: Namespace) -> None:
+    """Creates a project without the store, then with a cold and a warm template."""
+    with tempfile.TemporaryDirectory() as directory:
+        install_fake_yarn(directory, args)
+        projects = os.path.join(directory, 'projects')
+        os.makedirs(projects)
+
+        start = time.perf_counter()
+        await run_process(['yarn', 'create', 'react-app', 'no_template'], cwd=projects, timeout=300)
+        await run_process(['yarn', 'install'], cwd=os.path.join(projects, 'no_template'), timeout=300)
+        print(f"{'no template':>12}: {time.perf_counter() - start:.2f}s")
+
+        store = TemplateStore(os.path.join(directory, 'templates'))
+        for label in ('cold', 'warm'):
+            start = time.perf_counter()
+            await store.create_project(os.path.join(projects, label))
+            print(f"{label + ' template':>12}: {time.perf_counter() - start:.2f}s")
+
+        linked = os.path.join(projects, 'warm', 'node_modules', 'package0', 'file0.js')
+        print(f"node_modules files hardlinked: {os.stat(linked).st_nlink > 1}")
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the project creation against a fake yarn.')
+    parser.add_argument('--packages', type=int, default=200)
+    parser.add_argument('--files-per-package', type=int, default=20)
+    parser.add_argument('--create-seconds', type=float, default=2)
+    parser.add_argument('--install-seconds', type=float, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmarks the parsing of the tool calls written in the text of large answers.
+
+The previous per-line regex scan is compared with the incremental parser, fed
+the whole answer at once or in small chunks like a stream, on a code-heavy
+answer without any call, and on the same answer ending with written calls,
+one of them with arguments spanning several lines. The calls found by both
+are checked to be the same, apart from the multi-line one that only the
+parser finds.
+
+Usage: python -m benchmarks.tool_call_parser [--kb 200] [--chunk-chars 8] [--repeat 20]
+"""
+import json
+import re
+import time
+from argparse import ArgumentParser, Namespace
+from typing import Callable, List, Tuple
+
+from python.utils.tool_call_parser import ToolCallParser, parse_tool_calls
+
+CODE_LINE = "  const items = data.map((item) => <Item key={item.id} {...item} />);\n"
+
+def legacy_parse(message: str) -> List[Tuple[str, str]]:
+    """The previous scan: an uncompiled regex searched on every line."""
+    calls = []
+    for text in message.split('\n'):
+        match = re.search(r'<function\s*=\s*([a-zA-Z0-9_]+)\s*(\{.*\})\s*>', text, re.DOTALL)
+        if not match:
+            continue
+        try:
+            json.loads(match.group(2))
+        except json.JSONDecodeError:
+            continue
+        calls.append((match.group(1), match.group(2)))
+    return calls
+
+def parse_whole(message: str) -> List[Tuple[str, str]]:
+    """Parses the whole answer at once."""
+    return [(call.function.name, call.function.arguments) for call in parse_tool_calls(message).tool_calls]
+
+def parse_streamed(chunks: List[str]) -> List[Tuple[str, str]]:
+    """Feeds the answer chunk by chunk."""
+    parser = ToolCallParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return [(call.function.name, call.function.arguments) for call in parser.close().tool_calls]
+
+def answers(args: Namespace) -> dict:
+    """Builds the answers to parse."""
+    code = "```javascript\n" + CODE_LINE * (args.kb * 1024 // len(CODE_LINE)) + "```\n"
+    calls = (
+        '<function=store_info{"info": "Gosta de {chaves} e de \\"aspas\\"."}>\n'
+        '<function=make_code{\n  "project_summary": "Um portfólio.",\n  "project_name": "portfolio"\n}>\n'
+    )
+    return {'no calls': code, 'with calls': code + calls}
+
+def timed(function: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    """Gets the best time of a function and its result."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main() -> None:
+    """Runs the benchmark."""
+    parser = ArgumentParser(description='Benchmarks the parsing of the tool calls written in the answers.')
+    parser.add_argument('--kb', type=int, default=200)
+    parser.add_argument('--chunk-chars', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for label, message in answers(args).items():
+        chunks = [message[i:i + args.chunk_chars] for i in range(0, len(message), args.chunk_chars)]
+        legacy_seconds, legacy_calls = timed(lambda message=message: legacy_parse(message), args.repeat)
+        whole_seconds, whole_calls = timed(lambda message=message: parse_whole(message), args.repeat)
+        streamed_seconds, streamed_calls = timed(lambda chunks=chunks: parse_streamed(chunks), args.repeat)
+        assert whole_calls == streamed_calls, (whole_calls, streamed_calls)
+        assert all(call in whole_calls for call in legacy_calls), (legacy_calls, whole_calls)
+        print(
+            f"{label:>10} ({len(message) // 1024}KB): per-line regex {legacy_seconds * 1000:.2f}ms "
+            f"({len(legacy_calls)} calls), parser {whole_seconds * 1000:.2f}ms ({len(whole_calls)} calls), "
+            f"streamed in {len(chunks)} chunks {streamed_seconds * 1000:.2f}ms"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Counts the LLM calls of a turn where the model calls several tools at once.
+
+The fake model calls `store_info` and `search_github_pages` at once, then
+calls again the tools whose result isn't in the conversation yet, and
+answers once both results are there. The same turn runs through the agent
+loop, which runs every tool call and makes a single follow-up completion,
+and through the previous recursive path, which ran the first tool call of
+each completion and sent its result back as an assistant message. The run
+fails unless the loop makes fewer LLM calls than the recursive path, and
+exactly two.
+
+Usage: python -m benchmarks.tool_calls
+"""
+import asyncio
+import json
+import sys
+import time
+
+from openai import AsyncOpenAI
+
+from benchmarks.stubs import llm_stub
+from python.agent.async_react_react_agent import MODEL, AsyncReactReActAgent
+from python.agent.tools import TOOLS
+
+EXPECTED_LLM_CALLS = 2
+# The result of each tool, which tells the fake model it ran.
+TOOL_RESULTS = {
+    'store_info': ('Info stored successfully.', {'info': 'Likes blue.'}),
+    'search_github_pages': ('Github pages searched successfully.', {'username': 'johndoe'}),
+}
+
+def responder(request: dict) -> dict:
+    """Calls the tools whose result isn't in the conversation, then answers."""
+    conversation = json.dumps(request['messages'])
+    pending = [name for name, (result, _) in TOOL_RESULTS.items() if result not in conversation]
+    if not pending:
+        return {'role': 'assistant', 'content': 'Both tools answered.'}
+    return {
+        'role': 'assistant',
+        'content': None,
+        'tool_calls': [
+            {
+                'id': f'call_{name}',
+                'type': 'function',
+                'function': {'name': name, 'arguments': json.dumps(TOOL_RESULTS[name][1])},
+            }
+            for name in pending
+        ],
+    }
+
+class StubbedGithubAgent(AsyncReactReActAgent):
+    """Agent with a github search that only waits, to stay offline."""
+    async def search_github_pages(self, username: str) -> str:
+        await asyncio.sleep(0.1)
+        self.additional_infos.append(f"{username} builds React apps.")
+        return "Github pages searched successfully."
+
+async def recursive_turn(agent: AsyncReactReActAgent, message: str, max_depth: int = 5) -> str:
+    """The previous recursive path: each completion ran its first tool call, answered as an assistant message."""
+    messages = [agent.get_system_prompt(), {'role': 'user', 'content': message}]
+    for _ in range(max_depth + 1):
+        response = await agent.client.chat.completions.create(messages=messages, model=MODEL, tools=TOOLS)
+        assistant_message = response.choices[0].message
+        if not assistant_message.tool_calls:
+            return assistant_message.content
+        tool_response = await agent.run_tool_call(assistant_message.tool_calls[0])
+        messages.append({
+            'role': 'assistant',
+            'content': f"This was the result of the tool call: {tool_response}. Generate a follow up response for the user."
+        })
+    return "Max recursion depth reached."
+
+async def count_calls(label: str, turn: str) -> int:
+    """Runs the turn through the loop or the recursive path, and returns its number of LLM calls."""
+    with llm_stub(latency=0.05, responder=responder) as stub:
+        client = AsyncOpenAI(api_key='benchmark', base_url=f'{stub.url}/v1', max_retries=0)
+        agent = StubbedGithubAgent(client=client, summary_cache=None, stream=False)
+        message = 'My github is johndoe and I like blue.'
+        start = time.perf_counter()
+        if turn == 'loop':
+            response = await agent.get_response(message)
+        else:
+            response = await recursive_turn(agent, message)
+        elapsed = time.perf_counter() - start
+        await client.close()
+        print(f"{label:>10}: {stub.request_count} LLM calls in {elapsed:.2f}s, infos {agent.additional_infos}, "
+              f"response: {response}")
+        return stub.request_count
+
+def main() -> None:
+    """Runs the benchmark, failing when the loop doesn't save LLM calls over the recursive path."""
+    recursive_calls = asyncio.run(count_calls('recursive', 'recursive'))
+    loop_calls = asyncio.run(count_calls('loop', 'loop'))
+    print(f"LLM calls: {loop_calls} (expected {EXPECTED_LLM_CALLS}), recursive path {recursive_calls}")
+    if loop_calls != EXPECTED_LLM_CALLS or loop_calls >= recursive_calls:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,54 @@
-"""Starts the React ReAct agent application."""
+"""
+Starts the React ReAct agent application.
+
+The agent, the server and their dependencies are only imported by the commands
+that use them, after the settings are loaded, so `--help` and the commands
+writing the keys start at once.
+"""
 import os
 import sys
-from argparse import ArgumentParser, RawDescriptionHelpFormatter
-from dotenv import load_dotenv
+from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter
+from typing import TYPE_CHECKING
 
-from python.agent.react_react_agent import ReactReActAgent
+from python.config import Settings, get_settings, save_env_variable
 from python.utils.colors import Colors as cl
 
-def load_env() -> None:
-    """Loads the environment variables."""
-    load_dotenv('.env.local')
-    if not os.getenv('PROJECT_PATH'):
-        raise ValueError('PROJECT_PATH environment variable not found.')
-    if not os.getenv('LLM_API_KEY'):
-        raise ValueError('LLM_API_KEY environment variable not found.')
-    if not os.getenv('GH_TOKEN'):
-        raise ValueError('GH_TOKEN environment variable not found.')
+if TYPE_CHECKING:
+    from python.utils.session_store import SessionStore
+
+def finish_tracing(args: Namespace) -> None:
+    """Exports the trace and prints its summary, as asked by the trace flags."""
+    from python.utils.tracing import get_tracer
+
+    tracer = get_tracer()
+    if args.trace_file and args.trace_format == 'otlp':
+        tracer.export_otlp(args.trace_file)
+    if args.trace:
+        # The headless result owns the stdout.
+        print(tracer.summary(), file=sys.stderr if args.headless else sys.stdout)
+
+def open_session(args: Namespace) -> "SessionStore | None":
+    """Opens the session to resume, or creates a new one unless `SESSION_STORE` is disabled."""
+    from python.utils.session_store import SessionStore
+
+    if args.resume:
+        session = SessionStore.open(args.resume)
+        message = f'Resuming the session {session.session_id}.'
+    elif os.getenv('SESSION_STORE', '1') == '1':
+        session = SessionStore.create()
+        message = f'Session {session.session_id}, resume it with --resume {session.session_id}'
+    else:
+        return None
+    # The headless result owns the stdout.
+    print(cl.colored(message, 'YELLOW'), file=sys.stderr if args.headless else sys.stdout)
+    return session
+
+def load_env() -> Settings:
+    """Loads the settings, once, checking that the required ones are set."""
+    settings = get_settings()
+    if missing := settings.missing():
+        raise ValueError(f'{missing[0]} environment variable not found.')
+    return settings
 
 if __name__=='__main__':
     parser = ArgumentParser(
@@ -32,6 +65,34 @@ if __name__=='__main__':
     parser.add_argument('--github_access_token', '-gh', type=str, help='The Github access token.')
     parser.add_argument('--starting_prompt', '-p', type=str, help='The starting prompt for the agent.')
     parser.add_argument('--verbose', '-v', action='store_true', help='The verbose mode for the agent.')
+    parser.add_argument(
+        '--no-stream', action='store_true', help='Waits for the whole answer instead of streaming it.'
+        )
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='Runs the starting prompt once without a terminal and prints the JSON result.'
+        )
+    parser.add_argument(
+        '--offline', action='store_true', help='Serves the Github requests only from the local cache.'
+        )
+    parser.add_argument(
+        '--trace', action='store_true', help='Prints a flame-style summary of the session spans at the end.'
+        )
+    parser.add_argument(
+        '--resume', type=str, metavar='SESSION_ID', help='Resumes a saved session, with its conversation and code.'
+        )
+    parser.add_argument(
+        '--serve', action='store_true', help='Serves many agent sessions over HTTP instead of the terminal chat.'
+        )
+    parser.add_argument('--host', type=str, help='The host the server listens on (default `SERVER_HOST`).')
+    parser.add_argument('--port', type=int, help='The port the server listens on (default `SERVER_PORT`).')
+    parser.add_argument('--trace-file', type=str, help='Writes the session spans to this file.')
+    parser.add_argument(
+        '--trace-format',
+        choices=['jsonl', 'otlp'],
+        help='The format of the trace file: JSON lines (default), or an OpenTelemetry OTLP/JSON export.'
+        )
     args = parser.parse_args()
 
     if not any(vars(args).values()):
@@ -39,17 +100,11 @@ if __name__=='__main__':
         sys.exit(0)
 
     if args.llm_api_key:
-        if not os.path.exists('.env.local'):
-            os.system('touch .env.local')
-
-        os.system(f'echo "LLM_API_KEY={args.llm_api_key}" >> .env.local')
+        save_env_variable('LLM_API_KEY', args.llm_api_key)
         print(cl.colored('LLM_API_KEY environment variable added to .env.local.', 'GREEN'))
 
     if args.github_access_token:
-        if not os.path.exists('.env.local'):
-            os.system('touch .env.local')
-
-        os.system(f'echo "GH_TOKEN={args.github_access_token}" >> .env.local')
+        save_env_variable('GH_TOKEN', args.github_access_token)
         print(cl.colored('GH_TOKEN environment variable added to .env.local.', 'GREEN'))
 
     if not os.path.exists('.env.local'):
@@ -59,13 +114,54 @@ if __name__=='__main__':
     else:
         load_env()
 
-    if args.starting_prompt:
+    if args.serve:
+        import asyncio
+
+        from python.agent.server import SERVER_HOST, SERVER_PORT, serve
+        from python.utils.tracing import configure_tracing
+
+        if args.offline:
+            os.environ['GH_OFFLINE'] = '1'
+        if args.trace_file and args.trace_format != 'otlp':
+            configure_tracing(args.trace_file)
+        try:
+            asyncio.run(serve(args.host or SERVER_HOST, args.port or SERVER_PORT, verbose=args.verbose))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            finish_tracing(args)
+        sys.exit(0)
+
+    if args.starting_prompt or args.resume:
+        from python.agent.react_react_agent import ReactReActAgent
+        from python.utils.tracing import configure_tracing
+
         verbose = False
         if args.verbose:
             verbose = True
-        load_env()
-        developer = ReactReActAgent(verbose=verbose)
-        developer.chat(args.starting_prompt)
+        if args.offline:
+            os.environ['GH_OFFLINE'] = '1'
+        if args.trace_file and args.trace_format != 'otlp':
+            configure_tracing(args.trace_file)
+        if args.headless and not args.starting_prompt:
+            parser.error('--headless needs a --starting_prompt.')
+        try:
+            session = open_session(args)
+        except (FileNotFoundError, ValueError) as e:
+            parser.error(str(e))
+        if args.headless:
+            developer = ReactReActAgent(verbose=verbose, stream=False, on_token=None, session=session)
+            result = developer.run(args.starting_prompt)
+            print(result.model_dump_json(indent=2))
+            developer.close()
+            finish_tracing(args)
+            sys.exit(0 if result.status == 'completed' else 1)
+        developer = ReactReActAgent(verbose=verbose, stream=not args.no_stream, session=session)
+        try:
+            developer.chat(args.starting_prompt)
+        finally:
+            developer.close()
+            finish_tracing(args)
 
     else:
         print(cl.colored('Your environment is ready to start the React ReAct agent.', 'GREEN'))
@@ -0,0 +1,1128 @@
+"""Module responsible for the AsyncReactReActAgent class."""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import shlex
+import subprocess
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Tuple
+
+from openai import APIError, AsyncOpenAI, BadRequestError
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+)
+from pydantic import ValidationError
+
+from python.agent.context import ContextWindow
+from python.agent.prompt import (
+    BATCHED_README_SUMMARIZATION_PROMPT,
+    CODE_EDIT_PROMPT,
+    CODE_GENERATION_PROMPT,
+    CODE_REPAIR_PROMPT,
+    CONTEXT_SUMMARIZATION_PROMPT,
+    FILE_GENERATION_PROMPT,
+    PROJECT_PLANNING_PROMPT,
+    PROJECTS_SUMMARIZATION_PROMPT,
+    REACT_REACT_AGENT_PROMPT,
+    README_SUMMARIZATION_PROMPT,
+)
+from python.agent.streaming import StreamResult, collect_stream
+from python.agent.tools import SEQUENTIAL_TOOLS, TOOL_NAMES, TOOLS
+from python.config import get_settings
+from python.models.code import APP_PATH, CodeData, CodeStatus, PlannedFile, ProjectPlan
+from python.models.run import AgentBudget, AgentResult, StepRecord
+from python.utils.batching import format_batch, pack_batches, split_batch
+from python.utils.code_validation import validate_files
+from python.utils.concurrency import iterate_in_thread
+from python.utils.patching import PatchError, apply_hunks, extract_code, parse_hunks
+from python.utils.process_output import run_process
+from python.utils.printer import end_assistant_stream, print_assistant_message, print_function_message
+from python.utils.resilience import ProviderGuard, ResilienceError, get_guard
+from python.utils.search_tool import GH_API_URL, get_gh_cache, iter_github_readmes
+from python.utils.session_store import SessionStore
+from python.utils.summary_cache import SummaryCache
+from python.utils.supervisor import DevServerSupervisor
+from python.utils.templates import TemplateStore
+from python.utils.tool_call_parser import ToolCallParser, parse_tool_calls
+from python.utils.tracing import Span, get_tracer, usage_attributes
+
+os.environ["PYDEVD_WARN_EVALUATION_TIMEOUT"] = "60"
+
+LLM_API_KEY = get_settings().llm_api_key
+PROJECT_PATH = get_settings().project_path
+SUMMARY_MAX_WORKERS = int(os.getenv('SUMMARY_MAX_WORKERS', '4'))
+SUMMARY_BATCH_TOKENS = int(os.getenv('SUMMARY_BATCH_TOKENS', '0'))
+SUMMARY_CACHE = os.getenv('SUMMARY_CACHE', '1') == '1'
+SUMMARY_CACHE_PATH = os.getenv('SUMMARY_CACHE_PATH', '.cache/summaries.sqlite3')
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv('SUMMARY_CACHE_MAX_BYTES', str(20 * 1024 * 1024)))
+LLM_STREAM = os.getenv('LLM_STREAM', '1') == '1'
+AGENT_MAX_STEPS = int(os.getenv('AGENT_MAX_STEPS', '7'))
+AGENT_MAX_TOKENS = int(os.getenv('AGENT_MAX_TOKENS', '0'))
+AGENT_MAX_SECONDS = float(os.getenv('AGENT_MAX_SECONDS', '0'))
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '8000'))
+CONTEXT_MAX_TOOL_TOKENS = int(os.getenv('CONTEXT_MAX_TOOL_TOKENS', '1000'))
+CODE_MULTI_FILE = os.getenv('CODE_MULTI_FILE', '1') == '1'
+CODE_MAX_WORKERS = int(os.getenv('CODE_MAX_WORKERS', '4'))
+CODE_MAX_REPAIRS = int(os.getenv('CODE_MAX_REPAIRS', '2'))
+CODE_RUN_SECONDS_ESTIMATE = float(os.getenv('CODE_RUN_SECONDS_ESTIMATE', '90'))
+TEMPLATE_CACHE = os.getenv('TEMPLATE_CACHE', '1') == '1'
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR', '~/.cache/react_react_agent/templates')
+TEMPLATE_VERSION = os.getenv('TEMPLATE_VERSION', 'cra-5')
+GH_BACKGROUND = os.getenv('GH_BACKGROUND', '1') == '1'
+GH_BACKGROUND_WAIT = float(os.getenv('GH_BACKGROUND_WAIT', '120'))
+DEV_SERVER_COMMAND = shlex.split(os.getenv('DEV_SERVER_COMMAND', 'yarn start'))
+DEV_SERVER_PORT = int(os.getenv('DEV_SERVER_PORT', '3000'))
+DEV_SERVER_READY_TIMEOUT = float(os.getenv('DEV_SERVER_READY_TIMEOUT', '60'))
+DEV_SERVER_RELOAD_TIMEOUT = float(os.getenv('DEV_SERVER_RELOAD_TIMEOUT', '20'))
+TEMPLATE_DEPENDENCIES = [
+    dependency for dependency in os.getenv('TEMPLATE_DEPENDENCIES', '').split(',') if dependency
+]
+
+SYSTEM_PROMPT = {
+    "role": "system",
+    "content": REACT_REACT_AGENT_PROMPT
+}
+MODEL = 'gpt-4o-mini'
+
+def cached_prompt_tokens(usage: CompletionUsage | None) -> int:
+    """Gets the prompt tokens served from the provider prompt cache."""
+    if usage is None or usage.prompt_tokens_details is None:
+        return 0
+    return usage.prompt_tokens_details.cached_tokens or 0
+
+class AsyncReactReActAgent:
+    """
+    Agent responsible for building React projects with ReAct, on asyncio.
+
+    LLM calls, tools and subprocesses never block the event loop, so a single
+    loop can drive many concurrent sessions sharing one `AsyncOpenAI` client.
+    """
+    def __init__(
+            self,
+            verbose: bool = False,
+            client: AsyncOpenAI | None = None,
+            summary_workers: int = SUMMARY_MAX_WORKERS,
+            summary_batch_tokens: int = SUMMARY_BATCH_TOKENS,
+            summary_cache: SummaryCache | None = None,
+            stream: bool = LLM_STREAM,
+            on_token: Callable[[str], None] | None = None,
+            budget: AgentBudget | None = None,
+            multi_file: bool = CODE_MULTI_FILE,
+            code_workers: int = CODE_MAX_WORKERS,
+            template_store: TemplateStore | None = None,
+            llm_guard: ProviderGuard | None = None,
+            session: SessionStore | None = None,
+            dev_server_port: int = DEV_SERVER_PORT,
+            build_slots: asyncio.Semaphore | None = None,
+            background_github: bool = GH_BACKGROUND
+            ) -> None:
+        # The retries are made by the guard, which shares its backoff and limits with the other sessions.
+        self.client = client or AsyncOpenAI(
+            api_key=LLM_API_KEY,
+            max_retries=0
+        )
+        self.llm_guard = llm_guard or get_guard('llm')
+        self.verbose = verbose
+        self.stream = stream
+        self.on_token = on_token
+        self.time_to_first_token: List[float] = []
+        self.budget = budget or AgentBudget(
+            max_steps=AGENT_MAX_STEPS or None,
+            max_tokens=AGENT_MAX_TOKENS or None,
+            max_seconds=AGENT_MAX_SECONDS or None
+        )
+        self.summary_workers = summary_workers
+        self.summary_batch_tokens = summary_batch_tokens
+        if summary_cache is None and SUMMARY_CACHE:
+            summary_cache = SummaryCache(SUMMARY_CACHE_PATH, max_bytes=SUMMARY_CACHE_MAX_BYTES)
+        self.summary_cache = summary_cache
+        self.multi_file = multi_file
+        self.code_workers = code_workers
+        if template_store is None and TEMPLATE_CACHE:
+            template_store = TemplateStore(
+                TEMPLATE_CACHE_DIR,
+                version=TEMPLATE_VERSION,
+                dependencies=TEMPLATE_DEPENDENCIES
+            )
+        self.template_store = template_store
+        self.dev_server: DevServerSupervisor | None = None
+        self.dev_server_port = dev_server_port
+        # Shared by the sessions of a server, so only a few builds run at once.
+        self.build_slots = build_slots
+        self.additional_infos = []
+        self.code_data = CodeData(path=PROJECT_PATH)
+        self.code_status = CodeStatus()
+        self._infos_prompt: dict | None = None
+        self._infos_prompt_count = 0
+        self.context = ContextWindow(
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            max_tool_tokens=CONTEXT_MAX_TOOL_TOKENS
+        )
+        self._summary_task: asyncio.Task | None = None
+        self.background_github = background_github
+        self._enrichment_tasks: Dict[str, asyncio.Task] = {}
+        self.tools = list(TOOLS)
+        self.session = session
+        self._saved_code: dict = {}
+        self._saved_files: Dict[str, str] = {}
+        self._saved_status: dict = {}
+        if session is not None:
+            self.restore_session()
+            self.context.journal = session.append
+
+    @property
+    def messages(self) -> List[dict]:
+        """
+        The messages list, laid out to keep the longest stable prefix for prompt caching.
+
+        The fixed system prompt comes first, then the append-only block of
+        gathered informations, the summary of older turns and the context window.
+        """
+        messages_list = [self.get_system_prompt()]
+        if infos_prompt := self.get_infos_prompt():
+            messages_list.append(infos_prompt)
+        if self.context.summary:
+            messages_list.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{self.context.summary}"
+            })
+        return messages_list + self.context.window()
+
+    def restore_session(self) -> None:
+        """
+        Restores the conversation, the gathered informations and the code of the session log.
+
+        Nothing is generated again, so no LLM call is made. The dev server
+        isn't restored, the next `run_code` starts it.
+        """
+        state = self.session.load()
+        self.context.restore(state.entries, state.compacted, state.summary)
+        self.additional_infos = list(state.infos)
+        if state.code:
+            self.code_data = CodeData(**state.code)
+            self.code_data.set_files(state.files)
+        if state.status:
+            self.code_status = CodeStatus(**state.status)
+        self._saved_code = dict(state.code)
+        self._saved_files = dict(state.files)
+        self._saved_status = self.code_status.model_dump()
+
+    def save_state(self) -> None:
+        """Logs the changes of the code and of its status to the session, if any."""
+        if self.session is None:
+            return
+        files = self.code_data.files
+        code = {"name": self.code_data.name, "path": self.code_data.path}
+        changed = {path: content for path, content in files.items() if self._saved_files.get(path) != content}
+        removed = [path for path in self._saved_files if path not in files]
+        if changed or removed or code != self._saved_code:
+            self.session.append("code", code=code, files=changed, removed=removed)
+            self._saved_code = code
+            self._saved_files = dict(files)
+        status = self.code_status.model_dump()
+        if status != self._saved_status:
+            self.session.append("status", status=status)
+            self._saved_status = status
+
+    def add_info(self, info: str) -> None:
+        """Adds an information gathered about the user, logging it to the session."""
+        self.additional_infos.append(info)
+        if self.session is not None:
+            self.session.append("info", info=info)
+
+    def pop_message(self) -> None:
+        """Pops the last message from the messages list."""
+        self.context.pop()
+
+    def get_system_prompt(self) -> dict:
+        """Gets the system prompt, which never changes."""
+        return SYSTEM_PROMPT
+
+    def get_infos_prompt(self) -> dict | None:
+        """
+        Gets the block of informations gathered about the user.
+
+        The informations are appended one per line, so a new one only extends
+        the previous block. The block is only rebuilt when an information is
+        added, since `additional_infos` only grows.
+        """
+        if not self.additional_infos:
+            return None
+        if self._infos_prompt is None or self._infos_prompt_count != len(self.additional_infos):
+            infos = "\n".join(f"- {info}" for info in self.additional_infos)
+            self._infos_prompt = {
+                "role": "system",
+                "content": f"Informations gathered about the user and the project:\n{infos}"
+            }
+            self._infos_prompt_count = len(self.additional_infos)
+        return self._infos_prompt
+
+    def schedule_context_summary(self) -> None:
+        """
+        Rolls the messages that fell out of the context window into its summary.
+
+        The summary runs in the background, once enough tokens fell out of the
+        window, so the next turn doesn't wait for it.
+        """
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        overflow, tokens = self.context.overflow()
+        if not overflow or tokens < self.context.token_budget // 4:
+            return
+        self._summary_task = asyncio.create_task(self.summarize_context(overflow))
+
+    async def summarize_context(self, overflow: List[dict]) -> None:
+        """
+        Summarizes the messages that fell out of the context window.
+
+        :param List[dict] overflow: The oldest messages of the context.
+        """
+        conversation = "\n".join(
+            f"{message['role']}: {message.get('content') or json.dumps(message.get('tool_calls'))}"
+            for message in overflow
+        )
+        if self.context.summary:
+            conversation = f"Previous summary:\n{self.context.summary}\n\nConversation:\n{conversation}"
+        try:
+            summary = await self.generate_bare_response(CONTEXT_SUMMARIZATION_PROMPT, conversation)
+        except Exception as e:
+            print_function_message(f"Could not summarize the context: {e}", verbose=self.verbose)
+            return
+        if summary:
+            self.context.compact(len(overflow), summary)
+
+    async def collect_stream(
+            self,
+            stream: AsyncIterator[ChatCompletionChunk],
+            parser: ToolCallParser | None = None
+            ) -> StreamResult:
+        """Consumes a streamed completion, handing its tokens to `on_token` and to `parser`."""
+        # The previous streamed message ends, so this one starts on its own line.
+        end_assistant_stream()
+        result = await collect_stream(stream, on_token=self.on_token, parser=parser)
+        if result.time_to_first_token is not None:
+            self.time_to_first_token.append(result.time_to_first_token)
+            print_function_message(
+                f"Time to first token: {result.time_to_first_token:.2f}s",
+                verbose=self.verbose
+                )
+        return result
+
+    async def generate_bare_response(
+            self,
+            system: str,
+            message: str,
+            use_cache: bool = True,
+            stream: bool = False
+            ) -> str:
+        """
+        Generates a bare response from the LLM API.
+
+        Responses are memoized in the summary cache, since the model, the system
+        prompt and the message fully determine the request. Streamed responses
+        are handed to `on_token` as they arrive.
+        """
+        with get_tracer().span("llm.bare", "llm", model=MODEL, stream=stream) as span:
+            cache_key = None
+            if use_cache and self.summary_cache is not None:
+                cache_key = SummaryCache.key(MODEL, system, message)
+                if (cached := self.summary_cache.get(cache_key)) is not None:
+                    span.set(cache_hit=True, response_chars=len(cached))
+                    return cached
+            response = await self.create_completion(
+                span,
+                messages=[{
+                    "role": "system",
+                    "content": system
+                }, {
+                    "role": "user",
+                    "content": message
+                }],
+                model=MODEL,
+                stream=stream,
+                **({"stream_options": {"include_usage": True}} if stream else {})
+            )
+            if stream:
+                stream_result = await self.collect_stream(response)
+                content, usage = stream_result.message.content, stream_result.usage
+                span.set(time_to_first_token=stream_result.time_to_first_token)
+            else:
+                content, usage = response.choices[0].message.content, response.usage
+            span.set(response_chars=len(content or ""), **usage_attributes(MODEL, usage))
+            if cache_key is not None and content:
+                self.summary_cache.put(cache_key, content)
+            return content
+
+    async def create_completion(self, span: Span, **kwargs: object) -> object:
+        """
+        Creates a chat completion, recording its payload size and retries in the span.
+
+        The request goes through the LLM guard, which retries the rate limits,
+        timeouts and server errors with backoff. A streamed answer is only
+        retried until its first chunk arrives.
+        Accepts the keyword arguments of `chat.completions.create`.
+        """
+        span.set(request_bytes=len(json.dumps(kwargs["messages"], default=str)))
+        raw_response = await self.llm_guard.call_async(
+            lambda: self.client.chat.completions.with_raw_response.create(**kwargs)
+        )
+        span.set(
+            retries=max(raw_response.retries_taken, span.attributes.get('retries', 0)),
+            status_code=raw_response.status_code
+        )
+        return raw_response.parse()
+
+    async def get_response(
+            self,
+            message: str,
+            role: str = "user",
+            tool_choice: str = 'auto'
+            ) -> str:
+        """Gets the response from the LLM API."""
+        result = await self.run(message, role=role, tool_choice=tool_choice)
+        if result.status == "budget_exceeded":
+            return f"The agent stopped before answering: {result.reason}"
+        return result.content or "No response from the LLM API."
+
+    async def run(
+            self,
+            message: str,
+            role: str = "user",
+            tool_choice: str = 'auto',
+            budget: AgentBudget | None = None
+            ) -> AgentResult:
+        """
+        Runs a ReAct turn: completions and tool calls alternate until the model answers.
+
+        The loop stops with a `budget_exceeded` result as soon as the steps,
+        tokens or wall time of the budget run out. It never reads from the
+        terminal, so it can run headless.
+        """
+        with get_tracer().span("agent.run", "agent", role=role, message_chars=len(message)) as span:
+            budget = budget or self.budget
+            start = time.perf_counter()
+            steps: List[StepRecord] = []
+            total_tokens = 0
+            turn_start = len(self.context)
+            self.context.append({
+                "role": role,
+                "content": message
+            })
+
+            def result(status: str, content: str | None = None, reason: str | None = None) -> AgentResult:
+                self.schedule_context_summary()
+                span.set(status=status, steps=len(steps), total_tokens=total_tokens, reason=reason)
+                return AgentResult(
+                    status=status,
+                    content=content,
+                    reason=reason,
+                    steps=steps,
+                    total_tokens=total_tokens,
+                    cached_tokens=sum(step.cached_tokens for step in steps),
+                    seconds=time.perf_counter() - start
+                )
+
+            llm_steps = 0
+            while True:
+                if budget.max_steps is not None and llm_steps >= budget.max_steps:
+                    return result("budget_exceeded", reason=f"Reached the limit of {budget.max_steps} steps.")
+                if budget.max_tokens is not None and total_tokens >= budget.max_tokens:
+                    return result("budget_exceeded", reason=f"Reached the limit of {budget.max_tokens} tokens.")
+                if budget.max_seconds is not None and time.perf_counter() - start >= budget.max_seconds:
+                    return result("budget_exceeded", reason=f"Reached the limit of {budget.max_seconds}s.")
+
+                step_start = time.perf_counter()
+                try:
+                    assistant_message, usage = await self.request_completion(tool_choice=tool_choice)
+                except BadRequestError as e:
+                    print_function_message(f"Generation error: {e}", verbose=self.verbose)
+                    # The whole turn is dropped and the caller asks the user again.
+                    self.context.truncate(turn_start)
+                    return result("error", content="A generation error occurred, please try again.", reason=str(e))
+                except (APIError, ResilienceError) as e:
+                    # Raised once the retries ran out or while the circuit is open.
+                    print_function_message(f"LLM API error: {e}", verbose=self.verbose)
+                    self.context.truncate(turn_start)
+                    return result(
+                        "error",
+                        content="The LLM API is unavailable right now, please try again in a moment.",
+                        reason=f"{type(e).__name__}: {e}"
+                    )
+                tokens = usage.total_tokens if usage else 0
+                total_tokens += tokens
+                llm_steps += 1
+                steps.append(StepRecord(
+                    index=len(steps),
+                    kind="llm",
+                    seconds=time.perf_counter() - step_start,
+                    tokens=tokens,
+                    prompt_tokens=usage.prompt_tokens if usage else 0,
+                    cached_tokens=cached_prompt_tokens(usage)
+                ))
+                print_function_message(
+                    f"Prompt cache: {steps[-1].cached_tokens}/{steps[-1].prompt_tokens} tokens cached.",
+                    verbose=self.verbose
+                    )
+
+                tool_calls = assistant_message.tool_calls
+                if not tool_calls:
+                    self.context.append({
+                        "role": "assistant",
+                        "content": assistant_message.content
+                        })
+                    return result("completed", content=assistant_message.content)
+
+                step_start = time.perf_counter()
+                await self.process_tool_call(tool_calls, content=assistant_message.content)
+                steps.append(StepRecord(
+                    index=len(steps),
+                    kind="tools",
+                    seconds=time.perf_counter() - step_start,
+                    tool_names=[tool_call.function.name for tool_call in tool_calls]
+                ))
+
+    async def request_completion(
+            self,
+            tool_choice: str = 'auto'
+            ) -> Tuple[ChatCompletionMessage, CompletionUsage | None]:
+        """Requests a completion of the current messages."""
+        messages = self.messages
+        with get_tracer().span(
+                "llm.chat", "llm", model=MODEL, stream=self.stream, messages=len(messages)
+                ) as span:
+            response = await self.create_completion(
+                span,
+                messages=messages,
+                model=MODEL,
+                tools=self.tools,
+                tool_choice=tool_choice,
+                stream=self.stream,
+                **({"stream_options": {"include_usage": True}} if self.stream else {})
+            )
+            parser = None
+            if self.stream:
+                parser = ToolCallParser()
+                stream_result = await self.collect_stream(response, parser=parser)
+                assistant_message, usage = stream_result.message, stream_result.usage
+                span.set(time_to_first_token=stream_result.time_to_first_token)
+            else:
+                assistant_message, usage = response.choices[0].message, response.usage
+            if not assistant_message.tool_calls and assistant_message.content:
+                if implicit_tool_calls := self.check_for_implicit_tool_call(assistant_message.content, parser):
+                    assistant_message = assistant_message.model_copy(update={"tool_calls": implicit_tool_calls})
+                    span.set(implicit_tool_calls=len(implicit_tool_calls))
+            span.set(
+                response_chars=len(assistant_message.content or ""),
+                tool_calls=len(assistant_message.tool_calls or []),
+                **usage_attributes(MODEL, usage)
+            )
+        return assistant_message, usage
+
+    def check_for_implicit_tool_call(
+            self,
+            message: str,
+            parser: ToolCallParser | None = None
+            ) -> List[ChatCompletionMessageToolCall] | None:
+        """
+        Checks for the tool calls written in the text of the assistant message.
+
+        :param str message: The content of the assistant message.
+        :param ToolCallParser parser: A parser already fed with the streamed message, parsed at once when None.
+        """
+        parsed = parser.close() if parser is not None else parse_tool_calls(message)
+        # A streamed message was already handed to `on_token` as it arrived.
+        streamed = parser is not None and self.on_token is not None
+        if parsed.tool_calls and not streamed:
+            print_assistant_message(parsed.text.strip())
+        return parsed.tool_calls
+
+    async def process_tool_call(
+            self,
+            tool_calls: List[ChatCompletionMessageToolCall],
+            content: str | None = None
+            ) -> None:
+        """
+        Processes the tool calls from the LLM API.
+
+        Every tool call of the turn runs, independent ones concurrently. Each
+        result is appended as a `tool` message answering its call, ready for
+        a single follow-up completion.
+        """
+        self.context.append({
+            "role": "assistant",
+            "content": content,
+            "tool_calls": [tool_call.model_dump() for tool_call in tool_calls]
+        })
+        with get_tracer().span("tools", "agent", tool_calls=len(tool_calls)):
+            tool_responses = await self.run_tool_calls(tool_calls)
+        for tool_call, tool_response in zip(tool_calls, tool_responses, strict=True):
+            self.context.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": tool_response
+            })
+
+    async def run_tool_calls(self, tool_calls: List[ChatCompletionMessageToolCall]) -> List[str]:
+        """
+        Runs the tool calls of a turn, keeping their order in the results.
+
+        The tools that touch the project files run one after the other, in the
+        order they were called, while every other tool runs concurrently.
+        """
+        responses: List[str] = [""] * len(tool_calls)
+
+        async def run(indexes: List[int]) -> None:
+            for index in indexes:
+                responses[index] = await self.run_tool_call(tool_calls[index])
+
+        sequential = [
+            index for index, tool_call in enumerate(tool_calls)
+            if tool_call.function.name in SEQUENTIAL_TOOLS
+        ]
+        independent = [
+            [index] for index, tool_call in enumerate(tool_calls)
+            if tool_call.function.name not in SEQUENTIAL_TOOLS
+        ]
+        await asyncio.gather(run(sequential), *(run(indexes) for indexes in independent))
+        return responses
+
+    async def run_tool_call(self, tool_call: ChatCompletionMessageToolCall) -> str:
+        """Runs a single tool call, returning its response or the error."""
+        tool_name = tool_call.function.name
+        print_function_message(f"Processing tool call: {tool_name}", verbose=self.verbose)
+        with get_tracer().span(
+                f"tool.{tool_name}", "tool", arguments_bytes=len(tool_call.function.arguments or "")
+                ) as span:
+            if tool_name not in TOOL_NAMES:
+                span.fail("Unknown tool.")
+                return f"Error: The tool {tool_name} is not available."
+            try:
+                tool_args = json.loads(tool_call.function.arguments or "{}")
+            except json.JSONDecodeError as e:
+                span.fail(e)
+                return f"Error: The arguments of {tool_name} are not valid JSON."
+            try:
+                tool_response = getattr(self, tool_name)(**tool_args)
+                if inspect.isawaitable(tool_response):
+                    tool_response = await tool_response
+            except Exception as e:
+                # Every call of the turn must be answered, so failures become responses.
+                span.fail(e)
+                tool_response = f"Error: {tool_name} failed with {type(e).__name__}: {e}"
+            self.save_state()
+            span.set(response_chars=len(str(tool_response)))
+        print_function_message(f"Tool response: {tool_response}", verbose=self.verbose)
+        return str(tool_response)
+
+    async def search_github_pages(self, username: str) -> str:
+        """
+        Searches the user's github pages.
+
+        In background mode the search returns at once, so the conversation
+        goes on while the READMEs are fetched and summarized, and the summary
+        is added to the informations once ready.
+
+        :param str username: The user's github username. Must be only a string value!
+        """
+        if not self.background_github:
+            return await self.enrich_from_github(username)
+        task = self._enrichment_tasks.get(username)
+        if task is not None and not task.done():
+            return f"The github pages of {username} are already being searched."
+        self._enrichment_tasks[username] = task = asyncio.create_task(self.enrich_from_github(username))
+        task.add_done_callback(functools.partial(self._on_enrichment_done, username))
+        return (
+            f"The github pages of {username} are being searched in the background. "
+            "Their summary will be added to the informations about the user, go on with the conversation."
+        )
+
+    def _on_enrichment_done(self, username: str, task: asyncio.Task) -> None:
+        """
+        Logs the end of a background Github search.
+
+        A failure is added to the informations, so the next turns know the
+        summary won't come instead of going on as if it had been gathered.
+        """
+        if task.cancelled():
+            return
+        if (error := task.exception()) is not None:
+            failure = f"{type(error).__name__}: {error}"
+        elif task.result().startswith("Error:"):
+            failure = task.result().removeprefix("Error:").strip()
+        else:
+            print_function_message(f"Github search: {task.result()}", verbose=self.verbose)
+            return
+        print_function_message(f"Github search failed: {failure}", verbose=self.verbose)
+        self.add_info(f"The search of the github pages of {username} failed: {failure}")
+
+    async def wait_for_enrichment(self, timeout: float = GH_BACKGROUND_WAIT) -> None:
+        """
+        Waits for the background Github searches still running, if any.
+
+        :param float timeout: Seconds to wait before going on without them.
+        """
+        pending = [task for task in self._enrichment_tasks.values() if not task.done()]
+        if not pending:
+            return
+        with get_tracer().span("github.wait", "internal", pending=len(pending)) as span:
+            _, still_pending = await asyncio.wait(pending, timeout=timeout)
+            span.set(timed_out=len(still_pending))
+        if still_pending:
+            print_function_message(
+                f"Going on without {len(still_pending)} Github searches after {timeout:.0f}s.",
+                verbose=self.verbose
+            )
+
+    async def enrich_from_github(self, username: str) -> str:
+        """
+        Fetches and summarizes the user's github pages, adding the summary to the informations.
+
+        :param str username: The user's github username.
+        """
+        url = f"{GH_API_URL}/users/{username}/repos"
+
+        # READMEs are summarized as they arrive, while later pages are still downloading.
+        summarizations = await self.summarize_readmes(iter_github_readmes(url, verbose=self.verbose))
+        if cache := get_gh_cache():
+            print_function_message(f"Github cache: {cache.stats()}", verbose=self.verbose)
+        if summarizations is None:
+            return "Error: Could not find the user's github pages."
+        summarizations = [summarization for summarization in summarizations if summarization]
+        final_summary = await self.generate_bare_response(
+            PROJECTS_SUMMARIZATION_PROMPT,
+            "\n\n".join(summarizations)
+            )
+        if self.summary_cache is not None:
+            print_function_message(f"Summary cache: {self.summary_cache.stats()}", verbose=self.verbose)
+        self.add_info(final_summary)
+
+        return "Github pages searched successfully."
+
+    async def summarize_readmes(self, readmes: Iterable[str]) -> List[str] | None:
+        """
+        Summarizes the READMEs concurrently, keeping their order.
+
+        Up to `summary_workers` requests run at once. When `summary_batch_tokens`
+        is set, small READMEs are packed into a single request up to that
+        token budget. Returns None when there are no READMEs.
+
+        :param Iterable[str] readmes: The README contents, possibly still being downloaded.
+        """
+        if self.summary_batch_tokens > 0:
+            jobs = pack_batches(readmes, self.summary_batch_tokens)
+            summarize = self.summarize_readme_batch
+        else:
+            jobs = readmes
+            summarize = self.summarize_readme
+
+        # Bounds the running requests, which also bounds the READMEs held in memory.
+        running = asyncio.Semaphore(self.summary_workers)
+        tasks: List[asyncio.Task] = []
+        # The READMEs are downloaded by blocking requests, pulled in a worker thread.
+        async for job in iterate_in_thread(jobs):
+            await running.acquire()
+            task = asyncio.create_task(summarize(job))
+            task.add_done_callback(lambda _task: running.release())
+            tasks.append(task)
+        if not tasks:
+            return None
+
+        summaries = []
+        for result in await asyncio.gather(*tasks):
+            summaries.extend(result if isinstance(result, list) else [result])
+        return summaries
+
+    async def summarize_readme(self, readme: str) -> str:
+        """
+        Summarizes a single README.
+
+        :param str readme: The README content.
+        """
+        return await self.generate_bare_response(README_SUMMARIZATION_PROMPT, readme)
+
+    async def summarize_readme_batch(self, readmes: List[str]) -> List[str]:
+        """
+        Summarizes several READMEs in a single request.
+
+        Falls back to one request per README when the answer can't be split back.
+
+        :param List[str] readmes: The README contents of the batch.
+        """
+        if len(readmes) == 1:
+            return [await self.summarize_readme(readmes[0])]
+        response = await self.generate_bare_response(
+            BATCHED_README_SUMMARIZATION_PROMPT,
+            format_batch(readmes)
+            )
+        if (summaries := split_batch(response or "", len(readmes))) is not None:
+            return summaries
+        print_function_message("Could not split the batched summary, retrying one by one.", verbose=self.verbose)
+        return list(await asyncio.gather(*(self.summarize_readme(readme) for readme in readmes)))
+
+    def store_info(self, info: str) -> str:
+        """
+        Stores the user's information.
+
+        :param str info: The information to store.
+        """
+        if info not in self.additional_infos:
+            self.add_info(info)
+        return "Info stored successfully."
+
+    async def make_code(self, project_summary: str, project_name: str) -> str:
+        """
+        Generates the code for the project.
+
+        :param str project_summary: The summary of the project.
+        :param str project_name: The name of the project.
+        """
+        # The summary of the user's projects is only needed from here on.
+        await self.wait_for_enrichment()
+        coding_prompt = f"\nO projeto é: {project_summary}"
+        coding_prompt += f"\nAs informações específicas do projeto são: {self.additional_infos}"
+        self.code_data.name = '_'.join(project_name.lower().split(' '))
+        # The new files must be written by the next run, even if older ones were saved.
+        self.code_status.code_saved = False
+        if self.template_store is not None and not self.code_status.project_created:
+            # The template is built while the code is generated.
+            self.template_store.warm()
+
+        plan = await self.plan_project(coding_prompt) if self.multi_file else None
+        if plan is None:
+            response = await self.generate_bare_response(
+                system=CODE_GENERATION_PROMPT,
+                message=coding_prompt,
+                use_cache=False,
+                stream=self.stream
+                )
+            files, report = await self.validate_code({APP_PATH: extract_code(response or "")})
+            self.code_data.set_files(files)
+            return self.code_data.code + report
+
+        files, report = await self.validate_code(await self.generate_files(coding_prompt, plan))
+        self.code_data.set_files(files)
+        return f"Code generated successfully in {len(files)} files:\n{plan.describe()}{report}"
+
+    async def validate_code(
+            self,
+            files: Dict[str, str],
+            paths: List[str] | None = None
+            ) -> Tuple[Dict[str, str], str]:
+        """
+        Validates the generated files before they are written, repairing the invalid ones.
+
+        Each round asks the model to fix the invalid files concurrently, up to
+        `CODE_MAX_REPAIRS` rounds. Returns the files and a report of the
+        repairs and of the errors left, empty when the files were valid.
+
+        :param Dict[str, str] files: Every file of the project, keyed by their path.
+        :param List[str] | None paths: The files to validate, or every file when None.
+        """
+        files = dict(files)
+        start = time.perf_counter()
+        with get_tracer().span("code.validate", "internal", files=len(paths or files)):
+            errors = await validate_files(files, paths)
+        iterations = 0
+        while errors and iterations < CODE_MAX_REPAIRS:
+            iterations += 1
+            print_function_message(
+                f"Repairing {', '.join(errors)} (round {iterations}): {errors}",
+                verbose=self.verbose
+            )
+            repaired = await asyncio.gather(*(
+                self.repair_file(files, path, file_errors) for path, file_errors in errors.items()
+            ))
+            files.update(zip(errors, repaired, strict=True))
+            errors = await validate_files(files, list(errors))
+
+        report = ""
+        if iterations:
+            seconds = time.perf_counter() - start
+            status = self.code_status
+            # Without the validation, each round of errors would only show up after a whole run.
+            saved = max(iterations * (status.last_run_seconds or CODE_RUN_SECONDS_ESTIMATE) - seconds, 0)
+            status.repair_iterations += iterations
+            status.repair_seconds += seconds
+            status.seconds_saved += saved
+            report += f"\nValidation: {iterations} repair rounds in {seconds:.1f}s, about {saved:.0f}s saved."
+            print_function_message(report.strip(), verbose=self.verbose)
+        if errors:
+            report += "\nThese errors could not be repaired:\n" + "\n".join(
+                f"{path}: {error}" for path, file_errors in errors.items() for error in file_errors
+            )
+        return files, report
+
+    async def repair_file(self, files: Dict[str, str], path: str, errors: List[str]) -> str:
+        """
+        Asks the model to fix the errors of a file.
+
+        :param Dict[str, str] files: Every file of the project, keyed by their path.
+        :param str path: The file to repair.
+        :param List[str] errors: The errors found in the file.
+        """
+        repair_prompt = f"Os arquivos do projeto são: {', '.join(files)}"
+        repair_prompt += f"\nO arquivo {path} tem os seguintes erros:\n" + "\n".join(errors)
+        repair_prompt += f"\nEsse é o código do arquivo {path}: {files[path]}"
+        response = await self.generate_bare_response(
+            system=CODE_REPAIR_PROMPT,
+            message=repair_prompt,
+            use_cache=False
+            )
+        return extract_code(response or "") or files[path]
+
+    async def plan_project(self, coding_prompt: str) -> ProjectPlan | None:
+        """
+        Splits the project into the files to generate.
+
+        Returns None when the answer isn't a valid plan, so the code is
+        generated in a single file instead.
+
+        :param str coding_prompt: The description of the project.
+        """
+        response = await self.generate_bare_response(
+            system=PROJECT_PLANNING_PROMPT,
+            message=coding_prompt,
+            use_cache=False
+            )
+        try:
+            plan = ProjectPlan.model_validate_json(extract_code(response or ""))
+        except ValidationError as e:
+            print_function_message(f"Could not plan the project, generating a single file: {e}", verbose=self.verbose)
+            return None
+        print_function_message(f"Project plan:\n{plan.describe()}", verbose=self.verbose)
+        return plan
+
+    async def generate_files(self, coding_prompt: str, plan: ProjectPlan) -> Dict[str, str]:
+        """
+        Generates the planned files concurrently, keyed by their path.
+
+        Up to `code_workers` requests run at once, so the generation takes
+        about as long as the slowest file when the plan is small.
+
+        :param str coding_prompt: The description of the project.
+        :param ProjectPlan plan: The files to generate.
+        """
+        running = asyncio.Semaphore(self.code_workers)
+
+        async def generate(file: PlannedFile) -> str:
+            async with running:
+                return await self.generate_file(coding_prompt, plan, file)
+
+        contents = await asyncio.gather(*(generate(file) for file in plan.files))
+        return {file.path: content for file, content in zip(plan.files, contents, strict=True)}
+
+    async def generate_file(self, coding_prompt: str, plan: ProjectPlan, file: PlannedFile) -> str:
+        """
+        Generates the code of a single planned file.
+
+        :param str coding_prompt: The description of the project.
+        :param ProjectPlan plan: The files of the project.
+        :param PlannedFile file: The file to generate.
+        """
+        file_prompt = coding_prompt
+        file_prompt += f"\nOs arquivos do projeto são:\n{plan.describe()}"
+        file_prompt += f"\nGere o arquivo {file.path}: {file.description}"
+        # The files are generated at the same time, so their answers aren't streamed.
+        response = await self.generate_bare_response(
+            system=FILE_GENERATION_PROMPT,
+            message=file_prompt,
+            use_cache=False
+            )
+        print_function_message(f"Generated {file.path}.", verbose=self.verbose)
+        return extract_code(response or "")
+
+    async def run_code(self) -> str:
+        """
+        Runs the generated code to start the project.
+        """
+        if not self.code_data.is_complete():
+            return "Attention: The assistant must save the code before running it."
+        if self.build_slots is None:
+            return await self.build_project()
+
+        with get_tracer().span("build.wait", "internal"):
+            await self.build_slots.acquire()
+        try:
+            return await self.build_project()
+        finally:
+            self.build_slots.release()
+
+    async def build_project(self) -> str:
+        """Creates the project, writes the code, installs the dependencies and starts the dev server."""
+        start = time.perf_counter()
+        full_run = not self.code_status.code_saved
+        code_path = self.code_data.path
+        project_name = self.code_data.name
+        project_path = os.path.join(code_path, project_name)
+
+        if not self.code_status.project_created:
+            print_function_message(f"Creating project: {project_name}", verbose=self.verbose)
+            if not os.path.exists(code_path):
+                os.makedirs(code_path)
+            try:
+                if self.template_store is not None:
+                    creation_result = await self.template_store.create_project(project_path)
+                else:
+                    creation_result = (await run_process(
+                        ["yarn", "create", "react-app", project_name],
+                        cwd=code_path,
+                        timeout=300
+                    )).describe()
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                return f"Error: The project could not be created.\n{e.output}"
+            self.code_status.project_created = True
+        else:
+            creation_result = "Project already created."
+
+        if not self.code_status.code_saved:
+            print_function_message(
+                f"Writing the generated code: {', '.join(self.code_data.files)}",
+                verbose=self.verbose
+            )
+            self.code_data.write_files(project_path)
+
+            if self.template_store is not None:
+                installation_result = "Dependencies installed from the template."
+            else:
+                print_function_message("Installing dependencies.", verbose=self.verbose)
+                try:
+                    installation_result = (await run_process(
+                        ["yarn", "install"],
+                        cwd=project_path,
+                        timeout=300
+                    )).describe()
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                    return f"Error: The dependencies could not be installed.\n{e.output}"
+            self.code_status.code_saved = True
+        else:
+            installation_result = "Dependencies already installed."
+
+        starting_result = await self.start_dev_server(project_path)
+        if full_run:
+            self.code_status.last_run_seconds = time.perf_counter() - start
+
+        result = f"""
+Creation result: {creation_result}\n
+Installation result: {installation_result}\n
+Starting result: {starting_result}\n
+"""
+        return result
+
+    async def start_dev_server(self, project_path: str) -> str:
+        """
+        Starts the dev server of the project in the background.
+
+        Returns as soon as the server is ready. A server already running for
+        the project is kept, since it hot reloads the written files.
+
+        :param str project_path: The folder of the project.
+        """
+        dev_server = self.dev_server
+        if dev_server is not None and dev_server.running and dev_server.cwd == project_path:
+            return f"The code is already up at {dev_server.url}, the changes are reloaded automatically."
+        if dev_server is not None:
+            await dev_server.stop()
+
+        print_function_message("Starting the project.", verbose=self.verbose)
+        self.dev_server = dev_server = DevServerSupervisor(
+            DEV_SERVER_COMMAND,
+            cwd=project_path,
+            port=self.dev_server_port
+        )
+        with get_tracer().span("dev_server.start", "process", port=self.dev_server_port) as span:
+            ready = await dev_server.start(timeout=DEV_SERVER_READY_TIMEOUT)
+            span.set(ready=ready, returncode=dev_server.returncode)
+        if ready:
+            return f"The code is up at {dev_server.url}!"
+        if dev_server.running:
+            return (
+                f"The server is still starting after {DEV_SERVER_READY_TIMEOUT:.0f}s. "
+                f"Last output:\n{dev_server.tail()}"
+            )
+        return f"The server exited with code {dev_server.returncode}. Last output:\n{dev_server.tail()}"
+
+    async def shutdown(self) -> None:
+        """Cancels the background Github searches and stops the dev server, if it is running."""
+        tasks = list(self._enrichment_tasks.values())
+        for task in tasks:
+            task.cancel()
+        # The searches use the client, so they must be done before it is closed.
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.dev_server is not None:
+            await self.dev_server.stop()
+
+    async def edit_code(self, changes: str, path: str = APP_PATH) -> str:
+        """
+        Edits the generated code.
+
+        :param str changes: The changes to be made in the code.
+        :param str path: The file to edit, relative to the project root.
+        """
+        if not self.code_status.code_saved:
+            return "Attention: The assistant must make and run the code before editing it."
+        if path not in self.code_data.files:
+            return f"Error: The file {path} doesn't exist. The files are: {', '.join(self.code_data.files)}"
+        code = self.code_data.files[path]
+
+        editions_prompt = f"O usuário deseja fazer as seguintes alterações no código: {changes}"
+        editions_prompt += f"\nAs informações específicas do projeto são: {self.additional_infos}"
+        if len(self.code_data.files) > 1:
+            editions_prompt += f"\nOs arquivos do projeto são: {', '.join(self.code_data.files)}"
+        editions_prompt += f"\nEsse é o código do arquivo {path} que deverá ser editado: {code}"
+
+        # The model answers with search/replace hunks, so the answer scales with the change.
+        response = await self.generate_bare_response(
+            system=CODE_EDIT_PROMPT,
+            message=editions_prompt,
+            use_cache=False,
+            stream=self.stream
+            )
+        hunks = parse_hunks(response or "")
+        try:
+            if not hunks:
+                raise PatchError("The answer has no search/replace blocks.")
+            new_code = apply_hunks(code, hunks)
+            result = f"Code edited successfully with {len(hunks)} changes."
+        except PatchError as e:
+            print_function_message(f"Could not apply the patch, rewriting the code: {e}", verbose=self.verbose)
+            new_code = extract_code(await self.generate_bare_response(
+                system=CODE_GENERATION_PROMPT if len(self.code_data.files) == 1 else FILE_GENERATION_PROMPT,
+                message=editions_prompt,
+                use_cache=False,
+                stream=self.stream
+                ) or "")
+            if not new_code.strip():
+                return (
+                    f"Error: Could not edit {path}, the patch failed ({e}) and the rewrite came back empty. "
+                    "The code wasn't changed."
+                )
+            result = "Code rewritten successfully."
+
+        files, report = await self.validate_code({**self.code_data.files, path: new_code}, [path])
+        new_code = files[path]
+        result += report
+
+        code_path = self.code_data.path
+        project_name = self.code_data.name
+
+        project_path = os.path.join(code_path, project_name)
+        dev_server = self.dev_server
+        compilations = dev_server.compilations if dev_server is not None else 0
+        self.code_data.set_file(path, new_code)
+        self.code_data.write_files(project_path, [path])
+
+        # The running dev server hot reloads the file, so there is nothing to restart.
+        if dev_server is not None and dev_server.running and dev_server.cwd == project_path:
+            compilation = await dev_server.wait_for_reload(compilations, timeout=DEV_SERVER_RELOAD_TIMEOUT)
+            if compilation is None:
+                result += f"\nThe dev server didn't report the reload. Last output:\n{dev_server.tail()}"
+            elif "failed" in compilation.lower():
+                result += f"\nHot reload failed:\n{dev_server.tail()}"
+            else:
+                result += f"\nHot reloaded: {compilation}"
+
+        return result
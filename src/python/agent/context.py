@@ -0,0 +1,138 @@
+"""Module for the token-budgeted context window of the agent."""
+import json
+from typing import Callable, List, Tuple
+
+from python.utils.batching import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARKER = "\n[... {omitted} characters omitted ...]\n"
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens of a text with tiktoken, if installed, or estimates them."""
+    global _encoding
+    if tiktoken is None:
+        return estimate_tokens(text)
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+def count_message_tokens(message: dict) -> int:
+    """Counts the tokens of a chat message, including its tool calls."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + count_tokens(message.get("content") or "")
+    if tool_calls := message.get("tool_calls"):
+        tokens += count_tokens(json.dumps(tool_calls))
+    return tokens
+
+def truncate_middle(text: str, max_tokens: int) -> str:
+    """
+    Keeps the head and the tail of a text that goes over a token limit.
+
+    The characters kept follow the measured characters per token of the text,
+    so dense text like JSON or minified code is cut shorter than prose.
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = len(text) * max_tokens // tokens // 2
+    if len(text) <= 2 * keep:
+        return text
+    omitted = len(text) - 2 * keep
+    return text[:keep] + TRUNCATION_MARKER.format(omitted=omitted) + text[len(text) - keep:]
+
+class ContextWindow:
+    """
+    The conversation of the agent, sent to the model within a token budget.
+
+    The token count of each message is computed once, when it is appended,
+    and long tool outputs are capped at `max_tool_tokens`. The window holds
+    the newest messages that fit in `token_budget`. The older messages fall
+    out of it until `compact` rolls them into the running summary and drops
+    them from memory. Lengths and indexes count the compacted messages too,
+    so they stay valid across a compaction. Every change is passed to the
+    `journal`, when set, so a session store can log it.
+    """
+    def __init__(self, token_budget: int = 8000, max_tool_tokens: int = 1000) -> None:
+        self.token_budget = token_budget
+        self.max_tool_tokens = max_tool_tokens
+        self.summary: str | None = None
+        self.compacted = 0
+        self._summary_tokens = 0
+        self._entries: List[Tuple[dict, int]] = []
+        self.journal: Callable[..., None] | None = None
+
+    @property
+    def messages(self) -> List[dict]:
+        """Every message kept in memory, oldest first."""
+        return [message for message, _ in self._entries]
+
+    def __len__(self) -> int:
+        return self.compacted + len(self._entries)
+
+    def append(self, message: dict) -> None:
+        """Appends a message, capping long tool outputs."""
+        if message.get("role") == "tool" and message.get("content"):
+            message = {**message, "content": truncate_middle(message["content"], self.max_tool_tokens)}
+        tokens = count_message_tokens(message)
+        self._entries.append((message, tokens))
+        self._record("message", message=message, tokens=tokens)
+
+    def pop(self) -> dict:
+        """Pops the last message."""
+        message = self._entries.pop()[0]
+        self._record("pop")
+        return message
+
+    def truncate(self, length: int) -> None:
+        """Drops every message after the first `length` ones."""
+        del self._entries[max(length - self.compacted, 0):]
+        self._record("truncate", length=length)
+
+    def restore(self, entries: List[Tuple[dict, int]], compacted: int, summary: str | None) -> None:
+        """Restores the messages with their token counts, the compacted count and the summary of a session."""
+        self._entries = list(entries)
+        self.compacted = compacted
+        self.summary = summary
+        self._summary_tokens = count_tokens(summary) if summary else 0
+
+    def _record(self, event_type: str, **fields: object) -> None:
+        if self.journal is not None:
+            self.journal(event_type, **fields)
+
+    def window_start(self) -> int:
+        """Gets the index of the oldest message that fits in the budget."""
+        budget = self.token_budget - self._summary_tokens
+        start = len(self._entries)
+        used = 0
+        while start > 0 and used + self._entries[start - 1][1] <= budget:
+            start -= 1
+            used += self._entries[start][1]
+        # The newest message is always sent, even over the budget.
+        start = min(start, len(self._entries) - 1) if self._entries else 0
+        # A tool message can't be sent without the assistant message that called it.
+        while start > 0 and self._entries[start][0].get("role") == "tool":
+            start -= 1
+        return start
+
+    def window(self) -> List[dict]:
+        """Gets the newest messages that fit in the token budget."""
+        return [message for message, _ in self._entries[self.window_start():]]
+
+    def overflow(self) -> Tuple[List[dict], int]:
+        """Gets the messages that fell out of the window and their token count."""
+        entries = self._entries[:self.window_start()]
+        return [message for message, _ in entries], sum(tokens for _, tokens in entries)
+
+    def compact(self, count: int, summary: str) -> None:
+        """Replaces the oldest `count` messages by the summary of the conversation so far."""
+        del self._entries[:count]
+        self.compacted += count
+        self.summary = summary
+        self._summary_tokens = count_tokens(summary)
+        self._record("compact", count=count, summary=summary)
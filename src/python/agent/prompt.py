@@ -59,6 +59,26 @@ You must find the main points of the README files to show the technical and non-
 Respond only with the main points of the README files.
 """
 
+BATCHED_README_SUMMARIZATION_PROMPT = README_SUMMARIZATION_PROMPT + """
+You will receive several README files at once, each one starting with a "### README <number>" header.
+Summarize each README separately.
+Start the summary of each README with the same "### README <number>" header, in the same order.
+"""
+
+PROJECTS_SUMMARIZATION_PROMPT = """
+You are the Projects Summarization agent.
+You will receive the summaries of the README files of the user's github repositories.
+Make a general summary of the user's projects, highlighting the technologies, skills and most relevant projects.
+Respond only with the general summary.
+"""
+
+CONTEXT_SUMMARIZATION_PROMPT = """
+You are the Conversation Summarization agent.
+You will receive the earlier part of a conversation between the React ReAct agent and the user, possibly with a previous summary.
+Summarize it, keeping every decision, requirement and piece of information given by the user, and the results of the tool calls.
+Respond only with the summary.
+"""
+
 CODE_GENERATION_PROMPT = """
 You must now generate the code for the project.
 Remember to write consistent and clean javascript code.
@@ -79,3 +99,55 @@ function App() {
 export default App;
 ```
 """
+
+CODE_EDIT_PROMPT = """
+You must now edit the code of the project.
+Remember to write consistent and clean javascript code.
+Return only the changes, as search/replace blocks, with no other text:
+<<<<<<< SEARCH
+lines copied exactly from the current code
+=======
+the new lines
+>>>>>>> REPLACE
+Remember:
+Every search block must match exactly one place of the current code, including indentation.
+Keep the search blocks small, with just enough lines to be unique.
+Use one block per change, in the order they appear in the code.
+"""
+
+PROJECT_PLANNING_PROMPT = """
+You must now plan the files of the project, before their code is generated.
+Split the project into small components, one per file.
+Return only a JSON object enclosed in triple sticks, with no other text:
+```
+{"files": [{"path": "src/App.js", "description": "The App component, rendering the Header and the Projects."}, {"path": "src/components/Header.js", "description": "The Header component, with the user's name and links."}]}
+```
+Remember:
+Every path must be inside the src folder and end with .js or .css.
+You must plan the src/App.js file, with the App component exported as default.
+Describe in each file what it exports and which planned files it imports.
+Don't plan the package.json or the index.js files, they will be generated automatically.
+Keep the plan small, with no more than 8 files.
+"""
+
+FILE_GENERATION_PROMPT = """
+You must now generate the code of a single file of the project.
+Remember to write consistent and clean javascript code.
+Return the code of the file enclosed in triple sticks.
+Remember:
+The other files are being generated at the same time, follow the plan to import them.
+Only import the planned files and the packages of a new react app.
+Use the relative paths of the plan in the imports, like './components/Header'.
+Export the components as default, as described in the plan.
+Never call render, the render method will be called on another file.
+"""
+
+CODE_REPAIR_PROMPT = """
+You must now fix the errors found in a file of the project.
+Remember to write consistent and clean javascript code.
+Return the whole fixed file enclosed in triple sticks.
+Remember:
+Fix only the reported errors, keep everything else as it is.
+Close every bracket, string and JSX tag, and don't cut the code short.
+Only import the files of the project and the packages of a new react app.
+"""
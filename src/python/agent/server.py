@@ -0,0 +1,561 @@
+"""Module for the HTTP server hosting many agent sessions on one event loop."""
+import asyncio
+import json
+import os
+import socket
+import time
+import traceback
+from typing import Callable, Dict, NamedTuple, Set
+from urllib.parse import parse_qs, urlsplit
+
+import httpx2
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from python.agent.async_react_react_agent import (
+    DEV_SERVER_PORT,
+    SUMMARY_CACHE,
+    SUMMARY_CACHE_MAX_BYTES,
+    SUMMARY_CACHE_PATH,
+    TEMPLATE_CACHE,
+    TEMPLATE_CACHE_DIR,
+    TEMPLATE_DEPENDENCIES,
+    TEMPLATE_VERSION,
+    AsyncReactReActAgent,
+)
+from python.config import get_settings
+from python.models.run import AgentResult
+from python.utils.colors import Colors as cl
+from python.utils.printer import print_function_message
+from python.utils.session_store import SessionStore
+from python.utils.summary_cache import SummaryCache
+from python.utils.templates import TemplateStore
+from python.utils.tracing import get_tracer
+
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '8765'))
+SERVER_MAX_SESSIONS = int(os.getenv('SERVER_MAX_SESSIONS', '100'))
+SERVER_QUEUE_SIZE = int(os.getenv('SERVER_QUEUE_SIZE', '4'))
+SERVER_MAX_TURNS = int(os.getenv('SERVER_MAX_TURNS', '32'))
+SERVER_BUILD_WORKERS = int(os.getenv('SERVER_BUILD_WORKERS', '2'))
+SERVER_LLM_CONNECTIONS = int(os.getenv('SERVER_LLM_CONNECTIONS', '64'))
+SERVER_SESSION_TTL = float(os.getenv('SERVER_SESSION_TTL', '1800'))
+SESSION_STORE = os.getenv('SESSION_STORE', '1') == '1'
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+STATUS_REASONS = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 429: 'Too Many Requests', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+class HttpError(Exception):
+    """An error answered to the client with its status."""
+    def __init__(self, status: int, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class Request(NamedTuple):
+    """A parsed HTTP request."""
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]
+    body: bytes
+
+    def json(self) -> dict:
+        """Parses the JSON body, an empty body being an empty object."""
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            raise HttpError(400, f"Invalid JSON body: {e}") from e
+        if not isinstance(payload, dict):
+            raise HttpError(400, "The JSON body must be an object.")
+        return payload
+
+async def read_request(reader: asyncio.StreamReader) -> Request | None:
+    """Reads a request from the connection, or None once the client closed it."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _version = line.decode('latin-1').split()
+    except ValueError as e:
+        raise HttpError(400, "Malformed request line.") from e
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(400, "Too many headers.")
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError as e:
+        raise HttpError(400, "Invalid Content-Length header.") from e
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length header.")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"The body is limited to {MAX_BODY_BYTES} bytes.")
+    body = await reader.readexactly(length) if length else b''
+    split = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(split.query).items()}
+    return Request(method.upper(), split.path.rstrip('/') or '/', query, headers, body)
+
+def response_head(status: int, headers: Dict[str, str]) -> bytes:
+    """Builds the status line and the headers of a response."""
+    lines = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+
+async def send_json(
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: object,
+        keep_alive: bool = True,
+        headers: Dict[str, str] | None = None
+        ) -> None:
+    """Sends a JSON response."""
+    body = json.dumps(payload, default=str).encode('utf-8')
+    writer.write(response_head(status, {
+        'Content-Type': 'application/json',
+        'Content-Length': str(len(body)),
+        'Connection': 'keep-alive' if keep_alive else 'close',
+        **(headers or {}),
+    }) + body)
+    await writer.drain()
+
+def port_is_free(port: int) -> bool:
+    """Checks if a local port can be bound."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        try:
+            probe.bind(('127.0.0.1', port))
+        except OSError:
+            return False
+        return True
+
+class BuildSlots(asyncio.Semaphore):
+    """Semaphore bounding the concurrent builds, counting the running and waiting ones."""
+    def __init__(self, workers: int) -> None:
+        super().__init__(workers)
+        self.running = 0
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        self.waiting += 1
+        try:
+            await super().acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return True
+
+    def release(self) -> None:
+        self.running -= 1
+        super().release()
+
+class Turn(NamedTuple):
+    """A message waiting in the queue of a session."""
+    message: str
+    on_token: Callable[[str], None] | None
+    future: asyncio.Future
+
+class HostedSession:
+    """
+    An agent session hosted by the server.
+
+    The messages of a session are queued and run one at a time by its worker,
+    since a turn depends on the previous ones. The queue is bounded, so a
+    client sending faster than its turns complete is pushed back.
+    """
+    def __init__(
+            self,
+            session_id: str,
+            agent: AsyncReactReActAgent,
+            turn_slots: asyncio.Semaphore,
+            queue_size: int = SERVER_QUEUE_SIZE
+            ) -> None:
+        self.session_id = session_id
+        self.agent = agent
+        self.turn_slots = turn_slots
+        self.queue: asyncio.Queue[Turn] = asyncio.Queue(maxsize=queue_size)
+        self.busy = False
+        self.running = False
+        self.turns = 0
+        self.last_active = time.monotonic()
+        self.worker = asyncio.create_task(self.work())
+
+    @property
+    def waiting(self) -> int:
+        """The number of turns waiting for the queue or for a turn slot."""
+        return self.queue.qsize() + (self.busy and not self.running)
+
+    @property
+    def idle(self) -> bool:
+        """Checks if the session has no turn running or waiting."""
+        return not self.busy and self.queue.empty()
+
+    def submit(self, message: str, on_token: Callable[[str], None] | None = None) -> asyncio.Future:
+        """Queues a message, raising `asyncio.QueueFull` when the session is too far behind."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(Turn(message, on_token, future))
+        self.last_active = time.monotonic()
+        return future
+
+    async def work(self) -> None:
+        """Runs the queued turns in order."""
+        while True:
+            turn = await self.queue.get()
+            if turn.future.cancelled():
+                continue
+            self.busy = True
+            try:
+                async with self.turn_slots:
+                    self.running = True
+                    turn.future.set_result(await self.run_turn(turn))
+            except asyncio.CancelledError:
+                if not turn.future.done():
+                    turn.future.set_exception(HttpError(503, "The session was closed."))
+                raise
+            except Exception as e:  # noqa: BLE001
+                if not turn.future.done():
+                    turn.future.set_exception(e)
+            finally:
+                self.busy = self.running = False
+                self.turns += 1
+                self.last_active = time.monotonic()
+
+    async def run_turn(self, turn: Turn) -> AgentResult:
+        """Runs a turn, streaming its tokens to the client that sent it."""
+        self.agent.on_token = turn.on_token
+        self.agent.stream = turn.on_token is not None
+        try:
+            with get_tracer().span("server.turn", "agent", session=self.session_id):
+                return await self.agent.run(turn.message)
+        finally:
+            self.agent.on_token = None
+
+    def describe(self) -> dict:
+        """Gets the state of the session."""
+        dev_server = self.agent.dev_server
+        return {
+            "session_id": self.session_id,
+            "turns": self.turns,
+            "running": self.running,
+            "queued": self.waiting,
+            "project": self.agent.code_data.name,
+            "dev_server": dev_server.url if dev_server is not None and dev_server.running else None,
+        }
+
+    async def close(self) -> None:
+        """Stops the worker and the dev server, failing the turns still queued."""
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        while not self.queue.empty():
+            turn = self.queue.get_nowait()
+            if not turn.future.done():
+                turn.future.set_exception(HttpError(503, "The session was closed."))
+        await self.agent.shutdown()
+        if self.agent.session is not None:
+            self.agent.session.close()
+
+class AgentServer:
+    """
+    HTTP server hosting many agent sessions on one event loop.
+
+    The sessions share one `AsyncOpenAI` client and its connection pool, the
+    summary cache and the project template. At most `max_turns` turns run at
+    once, and the project builds of `run_code` take one of `build_workers`
+    slots, so a few builds can't starve the sessions waiting on the LLM.
+    A full session queue answers `429` and a full server `503`, both with a
+    `Retry-After` header.
+
+    Endpoints:
+        GET /health: the load of the server.
+        POST /sessions: creates a session, or resumes the logged session `{"resume": id}`.
+        GET /sessions/{id}: the state of a session.
+        DELETE /sessions/{id}: closes a session and stops its dev server.
+        POST /sessions/{id}/messages: runs `{"message": ...}` and answers the
+            agent result. With `?stream=1` the tokens are sent as server-sent
+            events, then the result as a `result` event.
+    """
+    def __init__(
+            self,
+            host: str = SERVER_HOST,
+            port: int = SERVER_PORT,
+            client: AsyncOpenAI | None = None,
+            max_sessions: int = SERVER_MAX_SESSIONS,
+            queue_size: int = SERVER_QUEUE_SIZE,
+            max_turns: int = SERVER_MAX_TURNS,
+            build_workers: int = SERVER_BUILD_WORKERS,
+            session_ttl: float = SERVER_SESSION_TTL,
+            session_store: bool = SESSION_STORE,
+            verbose: bool = False,
+            **agent_kwargs: object
+            ) -> None:
+        self.host = host
+        self.port = port
+        self.client = client or AsyncOpenAI(
+            api_key=get_settings().llm_api_key,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=httpx2.Limits(
+                max_connections=SERVER_LLM_CONNECTIONS,
+                max_keepalive_connections=SERVER_LLM_CONNECTIONS
+            ))
+        )
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.session_ttl = session_ttl
+        self.session_store = session_store
+        self.verbose = verbose
+        if 'summary_cache' not in agent_kwargs and SUMMARY_CACHE:
+            agent_kwargs['summary_cache'] = SummaryCache(SUMMARY_CACHE_PATH, max_bytes=SUMMARY_CACHE_MAX_BYTES)
+        if 'template_store' not in agent_kwargs and TEMPLATE_CACHE:
+            agent_kwargs['template_store'] = TemplateStore(
+                TEMPLATE_CACHE_DIR,
+                version=TEMPLATE_VERSION,
+                dependencies=TEMPLATE_DEPENDENCIES
+            )
+        self.agent_kwargs = agent_kwargs
+        self.sessions: Dict[str, HostedSession] = {}
+        self.turn_slots = asyncio.Semaphore(max_turns)
+        self.build_slots = BuildSlots(build_workers)
+        self.rejected = 0
+        self._ports: Set[int] = set()
+        self._server: asyncio.Server | None = None
+        self._reaper: asyncio.Task | None = None
+
+    @property
+    def url(self) -> str:
+        """The base url of the server."""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        """Starts listening, port 0 picking a free port."""
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.session_ttl:
+            self._reaper = asyncio.create_task(self.reap_idle_sessions())
+
+    async def serve_forever(self) -> None:
+        """Serves until cancelled, starting the server if needed and closing every session on the way out."""
+        if self._server is None:
+            await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Stops listening and closes the sessions and the LLM client."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._server is not None:
+            self._server.close()
+        for session_id in list(self.sessions):
+            await self.close_session(session_id)
+        await self.client.close()
+
+    def stats(self) -> dict:
+        """Gets the load of the server."""
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "running_turns": sum(session.running for session in self.sessions.values()),
+            "queued_turns": sum(session.waiting for session in self.sessions.values()),
+            "running_builds": self.build_slots.running,
+            "waiting_builds": self.build_slots.waiting,
+            "rejected": self.rejected,
+        }
+
+    def allocate_port(self) -> int:
+        """Picks a free dev server port, so the sessions' dev servers don't collide."""
+        port = DEV_SERVER_PORT
+        while port in self._ports or not port_is_free(port):
+            port += 1
+        self._ports.add(port)
+        return port
+
+    def open_session(self, resume: str | None = None) -> HostedSession:
+        """Creates a session, or resumes a logged one."""
+        if resume is not None and resume in self.sessions:
+            return self.sessions[resume]
+        if len(self.sessions) >= self.max_sessions:
+            self.rejected += 1
+            raise HttpError(503, "The server hosts too many sessions.", retry_after=5)
+        try:
+            store = SessionStore.open(resume) if resume is not None else (
+                SessionStore.create() if self.session_store else None
+            )
+        except (FileNotFoundError, ValueError) as e:
+            raise HttpError(404, str(e)) from e
+        session_id = store.session_id if store is not None else os.urandom(8).hex()
+        agent = AsyncReactReActAgent(
+            verbose=self.verbose,
+            client=self.client,
+            session=store,
+            dev_server_port=self.allocate_port(),
+            build_slots=self.build_slots,
+            **self.agent_kwargs
+        )
+        if store is None or not agent.code_data.name:
+            # Every session builds its project in its own folder.
+            agent.code_data.path = os.path.join(agent.code_data.path or '.', session_id)
+        session = HostedSession(session_id, agent, self.turn_slots, self.queue_size)
+        self.sessions[session_id] = session
+        return session
+
+    async def close_session(self, session_id: str) -> None:
+        """Closes a session and frees its dev server port, unless it is already closed."""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        self._ports.discard(session.agent.dev_server_port)
+        await session.close()
+
+    async def reap_idle_sessions(self) -> None:
+        """Closes the sessions idle for longer than the TTL, logging the sessions that fail to close."""
+        while True:
+            await asyncio.sleep(min(self.session_ttl, 60))
+            now = time.monotonic()
+            for session_id, session in list(self.sessions.items()):
+                if session.idle and now - session.last_active > self.session_ttl:
+                    print_function_message(f"Closing the idle session {session_id}.", verbose=self.verbose)
+                    try:
+                        await self.close_session(session_id)
+                    except Exception as e:  # noqa: BLE001
+                        print_function_message(f"Error closing the idle session {session_id}: {e}", verbose=True)
+
+    def get_session(self, session_id: str) -> HostedSession:
+        """Gets a hosted session, answering `404` when there is none."""
+        if session_id not in self.sessions:
+            raise HttpError(404, f"No session {session_id}.")
+        return self.sessions[session_id]
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves the requests of a connection, kept alive between them."""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = request.headers.get('connection', '').lower() != 'close'
+                    if not await self.dispatch(request, writer, keep_alive):
+                        break
+                except HttpError as e:
+                    headers = {'Retry-After': f"{e.retry_after:g}"} if e.retry_after else None
+                    await send_json(writer, e.status, {"error": str(e)}, keep_alive=False, headers=headers)
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:  # noqa: BLE001
+            # A bug must not go unanswered, nor kill the connection callback silently.
+            print_function_message(
+                f"Error serving a request: {type(e).__name__}: {e}\n{traceback.format_exc()}",
+                verbose=True
+            )
+            try:
+                await send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive=False)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Request, writer: asyncio.StreamWriter, keep_alive: bool) -> bool:
+        """Routes a request, returning whether the connection stays open."""
+        parts = request.path.strip('/').split('/')
+        # The second part of the path is the session id.
+        route = (request.method, *('{id}' if index == 1 else part for index, part in enumerate(parts)))
+        try:
+            if route == ('GET', 'health'):
+                status, payload = 200, self.stats()
+            elif route == ('POST', 'sessions'):
+                session = self.open_session(request.json().get('resume'))
+                status, payload = 201, session.describe()
+            elif route == ('GET', 'sessions', '{id}'):
+                status, payload = 200, self.get_session(parts[1]).describe()
+            elif route == ('DELETE', 'sessions', '{id}'):
+                self.get_session(parts[1])
+                await self.close_session(parts[1])
+                status, payload = 200, {"session_id": parts[1], "closed": True}
+            elif route == ('POST', 'sessions', '{id}', 'messages'):
+                return await self.post_message(request, writer, parts[1], keep_alive)
+            else:
+                raise HttpError(404, f"No route for {request.method} {request.path}.")
+        except HttpError as e:
+            headers = {'Retry-After': f"{e.retry_after:g}"} if e.retry_after else None
+            await send_json(writer, e.status, {"error": str(e)}, keep_alive=keep_alive, headers=headers)
+            return keep_alive
+        await send_json(writer, status, payload, keep_alive=keep_alive)
+        return keep_alive
+
+    async def post_message(
+            self,
+            request: Request,
+            writer: asyncio.StreamWriter,
+            session_id: str,
+            keep_alive: bool
+            ) -> bool:
+        """Runs a message in a session, answering its result or streaming its tokens."""
+        session = self.get_session(session_id)
+        message = request.json().get('message')
+        if not isinstance(message, str) or not message:
+            raise HttpError(400, "The body must have a non-empty `message`.")
+        stream = request.query.get('stream') == '1'
+        tokens: asyncio.Queue[str] | None = asyncio.Queue() if stream else None
+        try:
+            future = session.submit(message, on_token=tokens.put_nowait if tokens is not None else None)
+        except asyncio.QueueFull as e:
+            self.rejected += 1
+            raise HttpError(429, "The session has too many messages waiting.", retry_after=1) from e
+
+        if tokens is None:
+            try:
+                result = await future
+            except HttpError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                raise HttpError(500, f"{type(e).__name__}: {e}") from e
+            await send_json(writer, 200, result.model_dump(), keep_alive=keep_alive)
+            return keep_alive
+
+        # The events are streamed until the result, and the connection is closed after it.
+        writer.write(response_head(200, {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Connection': 'close',
+        }))
+        await writer.drain()
+        waiter = asyncio.ensure_future(tokens.get())
+        while True:
+            done, _ = await asyncio.wait({waiter, future}, return_when=asyncio.FIRST_COMPLETED)
+            if waiter in done:
+                writer.write(f"data: {json.dumps({'token': waiter.result()})}\n\n".encode('utf-8'))
+                await writer.drain()
+                waiter = asyncio.ensure_future(tokens.get())
+            elif tokens.empty():
+                break
+        waiter.cancel()
+        if future.exception() is not None:
+            event = {"error": f"{type(future.exception()).__name__}: {future.exception()}"}
+        else:
+            event = future.result().model_dump()
+        writer.write(f"event: result\ndata: {json.dumps(event, default=str)}\n\n".encode('utf-8'))
+        await writer.drain()
+        return False
+
+async def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, verbose: bool = False) -> None:
+    """Serves the agent sessions until interrupted."""
+    server = AgentServer(host, port, verbose=verbose)
+    await server.start()
+    print(cl.colored(f"Serving the agent sessions on {server.url}", 'GREEN'), flush=True)
+    await server.serve_forever()
@@ -0,0 +1,76 @@
+"""Module for assembling streamed chat completions."""
+import time
+from typing import AsyncIterator, Callable, Dict, NamedTuple
+
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+from python.utils.tool_call_parser import ToolCallParser
+
+class StreamResult(NamedTuple):
+    """The assembled streamed completion."""
+    message: ChatCompletionMessage
+    usage: CompletionUsage | None
+    time_to_first_token: float | None
+
+async def collect_stream(
+        stream: AsyncIterator[ChatCompletionChunk],
+        on_token: Callable[[str], None] | None = None,
+        parser: ToolCallParser | None = None
+        ) -> StreamResult:
+    """
+    Consumes a streamed chat completion.
+
+    The content deltas are handed to `on_token` as they arrive, and the tool
+    call deltas are joined back by their index. The content is also fed to
+    `parser`, which picks up the tool calls written in the text as they
+    complete. The usage is read from the last chunk when the request asked
+    for it with `stream_options`.
+    """
+    start = time.perf_counter()
+    time_to_first_token = None
+    usage = None
+    content_parts = []
+    tool_calls: Dict[int, dict] = {}
+    async for chunk in stream:
+        if chunk.usage:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if time_to_first_token is None and (delta.content or delta.tool_calls):
+            time_to_first_token = time.perf_counter() - start
+        if delta.content:
+            content_parts.append(delta.content)
+            if on_token:
+                on_token(delta.content)
+            if parser is not None:
+                parser.feed(delta.content)
+        for tool_call_delta in delta.tool_calls or []:
+            tool_call = tool_calls.setdefault(
+                tool_call_delta.index,
+                {"id": None, "name": "", "arguments": ""}
+            )
+            if tool_call_delta.id:
+                tool_call["id"] = tool_call_delta.id
+            if function := tool_call_delta.function:
+                tool_call["name"] += function.name or ""
+                tool_call["arguments"] += function.arguments or ""
+
+    message = ChatCompletionMessage(
+        role="assistant",
+        content="".join(content_parts) or None,
+        tool_calls=[
+            ChatCompletionMessageToolCall(
+                id=tool_call["id"] or f"call_{index}",
+                type="function",
+                function=Function(name=tool_call["name"], arguments=tool_call["arguments"] or "{}")
+            )
+            for index, tool_call in sorted(tool_calls.items())
+        ] or None
+    )
+    return StreamResult(message, usage, time_to_first_token)
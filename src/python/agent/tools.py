@@ -65,22 +65,33 @@ TOOLS = [
                 "required": []
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "edit_code",
+            "description": "Edits the generated code. Only available after the code runs.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "changes": {
+                        "type": "string",
+                        "description": "The changes to be made in the code."
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "The file to edit, like src/App.js or src/components/Header.js."
+                    }
+                },
+            }
+        }
     }
 ]
 
-EDIT_CODE_TOOL = {
-    "type": "function",
-    "function": {
-        "name": "edit_code",
-        "description": "Edits the generated code.",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "changes": {
-                    "type": "string",
-                    "description": "The changes to be made in the code."
-                }
-            },
-        }
-    }
-}
\ No newline at end of file
+# Every tool is always sent, in this order, so the tool schemas stay a stable prompt prefix.
+EDIT_CODE_TOOL = TOOLS[-1]
+
+TOOL_NAMES = {tool["function"]["name"] for tool in TOOLS}
+
+# Tools that touch the project files, run in order when called in the same turn.
+SEQUENTIAL_TOOLS = {"make_code", "run_code", "edit_code"}
@@ -0,0 +1,55 @@
+"""Module for the settings of the agent, read once from the environment and `.env.local`."""
+import os
+from functools import lru_cache
+from typing import List, NamedTuple
+
+ENV_FILE = '.env.local'
+
+class Settings(NamedTuple):
+    """The settings needed to run the agent."""
+    project_path: str | None
+    llm_api_key: str | None
+    gh_token: str | None
+
+    def missing(self) -> List[str]:
+        """Gets the environment variables of the required settings that aren't set."""
+        required = {'PROJECT_PATH': self.project_path, 'LLM_API_KEY': self.llm_api_key, 'GH_TOKEN': self.gh_token}
+        return [name for name, value in required.items() if not value]
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Gets the settings, loading `.env.local` into the environment on the first call.
+
+    The variables already in the environment take precedence over the file.
+    The modules reading their own variables when imported see the file too,
+    once this ran before they are imported.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv(ENV_FILE)
+    return Settings(
+        project_path=os.getenv('PROJECT_PATH'),
+        llm_api_key=os.getenv('LLM_API_KEY'),
+        gh_token=os.getenv('GH_TOKEN')
+    )
+
+def save_env_variable(name: str, value: str, path: str = ENV_FILE) -> None:
+    """
+    Appends a variable to the env file, creating it if needed.
+
+    Parameters:
+        name (str): The name of the variable.
+        value (str): Its value, written as is on a single line.
+        path (str): The env file.
+    """
+    if '\n' in value or '\r' in value:
+        raise ValueError(f'The value of {name} must be a single line.')
+    with open(path, 'a+', encoding='utf-8') as file:
+        # A file not ending with a newline would merge its last line with the new one.
+        file.seek(0, os.SEEK_END)
+        if file.tell():
+            file.seek(file.tell() - 1)
+            if file.read(1) != '\n':
+                file.write('\n')
+        file.write(f'{name}={value}\n')
@@ -1,11 +1,59 @@
 """Module for the code data model."""
-from pydantic import BaseModel
+import os
+import posixpath
+from typing import Dict, List
+
+from pydantic import BaseModel, field_validator
+
+APP_PATH = "src/App.js"
+PLANNED_FILE_EXTENSIONS = (".js", ".jsx", ".css")
+
+class PlannedFile(BaseModel):
+    """A file of the project plan."""
+    path: str
+    description: str = ""
+
+    @field_validator("path")
+    @classmethod
+    def check_path(cls, path: str) -> str:
+        """Keeps the planned files inside the `src` folder of the project."""
+        path = posixpath.normpath(path.strip().removeprefix("./"))
+        if not path.startswith("src/") or ".." in path.split("/"):
+            raise ValueError(f"The file {path} is not inside the src folder.")
+        if not path.endswith(PLANNED_FILE_EXTENSIONS):
+            raise ValueError(f"The file {path} is not a javascript or css file.")
+        return path
+
+class ProjectPlan(BaseModel):
+    """The files of the project, planned before generating them."""
+    files: List[PlannedFile]
+
+    @field_validator("files")
+    @classmethod
+    def check_files(cls, files: List[PlannedFile]) -> List[PlannedFile]:
+        """Checks the plan has an App component and no duplicated files."""
+        paths = [file.path for file in files]
+        if APP_PATH not in paths:
+            raise ValueError(f"The plan has no {APP_PATH} file.")
+        if len(set(paths)) != len(paths):
+            raise ValueError("The plan has duplicated files.")
+        return files
+
+    def describe(self) -> str:
+        """Lists the planned files, one per line."""
+        return "\n".join(f"- {file.path}: {file.description}" for file in self.files)
 
 class CodeData(BaseModel):
-    """The code data model."""
+    """
+    The code data model.
+
+    `files` maps the paths relative to the project root to their contents,
+    and `code` mirrors the content of `src/App.js`.
+    """
     code: str | None = None
     name: str | None = None
     path: str | None = None
+    files: Dict[str, str] = {}
 
     def is_complete(self) -> bool:
         """Checks if the code data is complete."""
@@ -13,7 +61,36 @@ class CodeData(BaseModel):
             return True
         return False
 
+    def set_files(self, files: Dict[str, str]) -> None:
+        """Replaces the files of the project."""
+        self.files = dict(files)
+        self.code = self.files.get(APP_PATH)
+
+    def set_file(self, path: str, content: str) -> None:
+        """Sets the content of a single file."""
+        self.files[path] = content
+        if path == APP_PATH:
+            self.code = content
+
+    def write_files(self, project_path: str, paths: List[str] | None = None) -> None:
+        """Writes the given files, or every file, under the project folder."""
+        for path in self.files if paths is None else paths:
+            file_path = os.path.join(project_path, *path.split("/"))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w') as file:
+                file.write(self.files[path])
+
 class CodeStatus(BaseModel):
-    """The code status model."""
+    """
+    The code status model.
+
+    The repair fields add up the validations of the generated code: the
+    repair requests made, the seconds they took, and the seconds saved by
+    not running a broken project, estimated from the last run.
+    """
     project_created: bool = False
     code_saved: bool = False
+    repair_iterations: int = 0
+    repair_seconds: float = 0.0
+    seconds_saved: float = 0.0
+    last_run_seconds: float | None = None
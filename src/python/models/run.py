@@ -0,0 +1,30 @@
+"""Module for the agent run models."""
+from typing import List, Literal
+
+from pydantic import BaseModel
+
+class AgentBudget(BaseModel):
+    """The budget of a single agent run. A limit of None is unbounded."""
+    max_steps: int | None = 7
+    max_tokens: int | None = None
+    max_seconds: float | None = None
+
+class StepRecord(BaseModel):
+    """The record of a single step of an agent run."""
+    index: int
+    kind: Literal["llm", "tools"]
+    seconds: float
+    tokens: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    tool_names: List[str] = []
+
+class AgentResult(BaseModel):
+    """The result of an agent run."""
+    status: Literal["completed", "budget_exceeded", "error"]
+    content: str | None = None
+    reason: str | None = None
+    steps: List[StepRecord] = []
+    total_tokens: int = 0
+    cached_tokens: int = 0
+    seconds: float = 0.0
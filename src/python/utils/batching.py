@@ -0,0 +1,54 @@
+"""Module for packing several prompts into a single LLM request."""
+import re
+from typing import Iterable, Iterator, List
+
+BATCH_HEADER = "### README {index}"
+BATCH_HEADER_PATTERN = re.compile(r'^#+\s*README\s+(\d+)\s*$', re.MULTILINE)
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text, roughly four characters per token."""
+    return len(text) // 4 + 1
+
+def pack_batches(items: Iterable[str], token_budget: int) -> Iterator[List[str]]:
+    """
+    Packs the items into batches that fit in a token budget.
+
+    Items are kept in order, and an item larger than the budget is sent in a
+    batch of its own.
+
+    Parameters:
+        items (Iterable[str]): The texts to pack.
+        token_budget (int): The maximum estimated tokens of a batch.
+    Returns:
+        Iterator[List[str]]: The batches, yielded as soon as they are full.
+    """
+    batch: List[str] = []
+    batch_tokens = 0
+    for item in items:
+        tokens = estimate_tokens(item)
+        if batch and batch_tokens + tokens > token_budget:
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def format_batch(items: List[str]) -> str:
+    """Joins the batch items under numbered headers."""
+    return "\n\n".join(
+        f"{BATCH_HEADER.format(index=index)}\n{item}" for index, item in enumerate(items, start=1)
+    )
+
+def split_batch(response: str, count: int) -> List[str] | None:
+    """
+    Splits a batched response back into one answer per item.
+
+    Returns None when the response doesn't have exactly one section per item,
+    so the caller can fall back to one request per item.
+    """
+    matches = list(BATCH_HEADER_PATTERN.finditer(response))
+    if [int(match.group(1)) for match in matches] != list(range(1, count + 1)):
+        return None
+    ends = [match.start() for match in matches[1:]] + [len(response)]
+    return [response[match.end():end].strip() for match, end in zip(matches, ends, strict=True)]
@@ -0,0 +1,363 @@
+"""Module for validating the generated code before it is written to disk."""
+import asyncio
+import os
+import posixpath
+import re
+import shutil
+from typing import Dict, List, Tuple
+
+ESBUILD_PATH = os.getenv('ESBUILD_PATH') or shutil.which('esbuild')
+ESBUILD_TIMEOUT = 10
+MAX_ERROR_CHARS = 2000
+
+IMPORT_PATTERN = re.compile(r'''^\s*import\s+(?:[^'"]*?\s+from\s+)?['"](\.{1,2}/[^'"]+)['"]''', re.MULTILINE)
+IMPORT_EXTENSIONS = ('', '.js', '.jsx', '/index.js', '/index.jsx')
+# The files of the create-react-app skeleton, which the generated files may import.
+SKELETON_FILES = ('src/App.css', 'src/index.css', 'src/logo.svg')
+TAG_NAME_PATTERN = re.compile(r'[A-Za-z0-9_$.:-]*')
+WORD_PATTERN = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*')
+SPACES_PATTERN = re.compile(r'\s+')
+JSX_TEXT_PATTERN = re.compile(r'[^<{]+')
+TEMPLATE_TEXT_PATTERN = re.compile(r'[^`\\$]+')
+# After these tokens a `<` opens a JSX element and a `/` opens a regex, instead of operators.
+EXPRESSION_START_CHARS = set('([{,;=:?!&|+-*%~^<>')
+EXPRESSION_START_WORDS = {
+    'return', 'yield', 'case', 'default', 'typeof', 'void', 'delete',
+    'in', 'of', 'new', 'else', 'do', 'await', 'export'
+}
+CLOSING_BRACKETS = {')': '(', ']': '[', '}': '{'}
+
+class SyntaxCheckError(Exception):
+    """A syntax error found by the Python checker."""
+    def __init__(self, line: int, message: str) -> None:
+        super().__init__(f"line {line}: {message}")
+
+class _Scanner:
+    """
+    Minimal JSX scanner checking brackets, strings, comments and tags.
+
+    It is not a parser: it only tracks what has to be balanced, which
+    covers the usual ways generated code is broken, like cut completions,
+    missing closing tags and unterminated strings.
+    """
+    def __init__(self, code: str) -> None:
+        self.code = code
+        self.index = 0
+        self.line = 1
+        self.previous: str | None = None
+        # Entries are (kind, name, line), with kind one of ( [ { ${ ` tag element.
+        self.stack: List[Tuple[str, str, int]] = []
+
+    def error(self, message: str) -> SyntaxCheckError:
+        """Builds an error at the current line."""
+        return SyntaxCheckError(self.line, message)
+
+    def peek(self, offset: int = 0) -> str:
+        """Gets the character at an offset of the current one, or '' at the end."""
+        position = self.index + offset
+        return self.code[position] if position < len(self.code) else ''
+
+    def advance(self, count: int = 1) -> str:
+        """Moves past `count` characters, counting the lines."""
+        text = self.code[self.index:self.index + count]
+        self.line += text.count('\n')
+        self.index += count
+        return text
+
+    def skip(self, pattern: re.Pattern) -> bool:
+        """Moves past the text matching a pattern at the current character."""
+        match = pattern.match(self.code, self.index)
+        if match:
+            self.advance(match.end() - self.index)
+        return match is not None
+
+    def expression_start(self) -> bool:
+        """Checks if an expression can start after the previous token."""
+        previous = self.previous
+        return previous is None or previous in EXPRESSION_START_CHARS or previous in EXPRESSION_START_WORDS
+
+    def check(self) -> None:
+        """Scans the whole code, raising `SyntaxCheckError` on the first error."""
+        while self.index < len(self.code):
+            kind = self.stack[-1][0] if self.stack else None
+            if kind == 'tag':
+                self.scan_tag()
+            elif kind == 'element':
+                self.scan_children()
+            elif kind == '`':
+                self.scan_template()
+            else:
+                self.scan_code()
+        if self.stack:
+            kind, name, line = self.stack[-1]
+            opened = f"<{name}>" if kind in ('tag', 'element') else kind
+            raise SyntaxCheckError(line, f"{opened} is never closed.")
+
+    def scan_code(self) -> None:
+        """Scans the next token of javascript code."""
+        char = self.peek()
+        if char.isspace():
+            self.skip(SPACES_PATTERN)
+        elif self.code.startswith('//', self.index):
+            end = self.code.find('\n', self.index)
+            self.advance((end if end != -1 else len(self.code)) - self.index)
+        elif self.code.startswith('/*', self.index):
+            self.skip_block_comment()
+        elif char in '\'"':
+            self.skip_string(char)
+            self.previous = 'value'
+        elif char == '`':
+            self.stack.append(('`', '', self.line))
+            self.advance()
+        elif char == '/' and self.expression_start():
+            self.skip_regex()
+            self.previous = 'value'
+        elif char == '<' and self.expression_start() and (self.peek(1).isalpha() or self.peek(1) == '>'):
+            self.open_tag()
+        elif char in '([{':
+            self.stack.append((char, '', self.line))
+            self.advance()
+            self.previous = char
+        elif char in ')]}':
+            self.close_bracket(char)
+            self.previous = 'value'
+        elif match := WORD_PATTERN.match(self.code, self.index):
+            self.advance(match.end() - self.index)
+            self.previous = match.group()
+        elif char.isdigit():
+            while self.peek().isalnum() or self.peek() in '._':
+                self.advance()
+            self.previous = 'value'
+        else:
+            self.advance()
+            self.previous = char
+
+    def close_bracket(self, char: str) -> None:
+        """Closes the innermost bracket, which must match `char`."""
+        if not self.stack:
+            raise self.error(f"Unexpected {char!r}.")
+        kind, name, line = self.stack[-1]
+        if kind == '${' and char == '}':
+            self.stack.pop()
+            self.advance()
+            return
+        if kind != CLOSING_BRACKETS[char]:
+            expected = f"</{name}>" if kind in ('tag', 'element') else f"the closing of {kind!r} from line {line}"
+            raise self.error(f"Unexpected {char!r}, expected {expected}.")
+        self.stack.pop()
+        self.advance()
+
+    def skip_block_comment(self) -> None:
+        """Moves past a block comment."""
+        end = self.code.find('*/', self.index + 2)
+        if end == -1:
+            raise self.error("Unterminated comment.")
+        self.advance(end + 2 - self.index)
+
+    def skip_string(self, quote: str) -> None:
+        """Moves past a quoted string."""
+        start = self.line
+        self.advance()
+        while (char := self.peek()) != quote:
+            if not char or char == '\n':
+                raise SyntaxCheckError(start, "Unterminated string.")
+            self.advance(2 if char == '\\' else 1)
+        self.advance()
+
+    def skip_regex(self) -> None:
+        """Moves past a regular expression literal and its flags."""
+        self.advance()
+        in_class = False
+        while (char := self.peek()) != '/' or in_class:
+            if not char or char == '\n':
+                raise self.error("Unterminated regular expression.")
+            if char == '[':
+                in_class = True
+            elif char == ']':
+                in_class = False
+            self.advance(2 if char == '\\' else 1)
+        self.advance()
+        while self.peek().isalpha():
+            self.advance()
+
+    def scan_template(self) -> None:
+        """Scans the next part of a template literal."""
+        if self.skip(TEMPLATE_TEXT_PATTERN):
+            return
+        char = self.peek()
+        if char == '`':
+            self.stack.pop()
+            self.advance()
+            self.previous = 'value'
+        elif char == '\\':
+            self.advance(2)
+        elif self.code.startswith('${', self.index):
+            self.stack.append(('${', '', self.line))
+            self.advance(2)
+            self.previous = '{'
+        else:
+            self.advance()
+
+    def open_tag(self) -> None:
+        """Opens a JSX tag, or a fragment."""
+        self.advance()
+        name = TAG_NAME_PATTERN.match(self.code, self.index).group()
+        self.advance(len(name))
+        if not name:
+            # A fragment, `<>`, has no attributes.
+            self.advance()
+            self.stack.append(('element', '', self.line))
+        else:
+            self.stack.append(('tag', name, self.line))
+
+    def scan_tag(self) -> None:
+        """Scans the next part of an opening JSX tag."""
+        char = self.peek()
+        if char.isspace():
+            self.advance()
+        elif char in '\'"':
+            self.skip_string(char)
+        elif char == '{':
+            self.stack.append(('{', '', self.line))
+            self.advance()
+            self.previous = '{'
+        elif self.code.startswith('/>', self.index):
+            self.stack.pop()
+            self.advance(2)
+            self.previous = 'value'
+        elif char == '>':
+            _, name, line = self.stack.pop()
+            self.stack.append(('element', name, line))
+            self.advance()
+        elif char == '<':
+            raise self.error(f"Unexpected '<' inside the <{self.stack[-1][1]}> tag.")
+        else:
+            self.advance()
+
+    def scan_children(self) -> None:
+        """Scans the next part of the children of a JSX element."""
+        if self.skip(JSX_TEXT_PATTERN):
+            return
+        char = self.peek()
+        if char == '{':
+            self.stack.append(('{', '', self.line))
+            self.advance()
+            self.previous = '{'
+        elif self.code.startswith('</', self.index):
+            self.advance(2)
+            name = TAG_NAME_PATTERN.match(self.code, self.index).group()
+            self.advance(len(name))
+            while self.peek().isspace():
+                self.advance()
+            if self.peek() != '>':
+                raise self.error(f"Malformed closing tag </{name}.")
+            self.advance()
+            _, opened, line = self.stack.pop()
+            if name != opened:
+                raise self.error(f"</{name}> closes <{opened}> opened on line {line}.")
+            self.previous = 'value'
+        elif char == '<':
+            self.open_tag()
+        else:
+            self.advance()
+
+def check_jsx_syntax(code: str) -> List[str]:
+    """Checks the brackets, strings, comments and JSX tags of javascript code."""
+    try:
+        _Scanner(code).check()
+    except SyntaxCheckError as e:
+        return [str(e)]
+    return []
+
+def check_css_syntax(code: str) -> List[str]:
+    """Checks the braces, strings and comments of css code."""
+    depth = 0
+    line = 1
+    index = 0
+    while index < len(code):
+        char = code[index]
+        if code.startswith('/*', index):
+            end = code.find('*/', index + 2)
+            if end == -1:
+                return [f"line {line}: Unterminated comment."]
+            line += code.count('\n', index, end)
+            index = end + 2
+            continue
+        if char in '\'"':
+            end = code.find(char, index + 1)
+            if end == -1 or '\n' in code[index:end]:
+                return [f"line {line}: Unterminated string."]
+            index = end + 1
+            continue
+        if char == '\n':
+            line += 1
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth < 0:
+                return [f"line {line}: Unexpected '}}'."]
+        index += 1
+    return [f"line {line}: {depth} '{{' never closed."] if depth else []
+
+def check_imports(path: str, code: str, paths: List[str]) -> List[str]:
+    """Checks the relative imports of a file point to files of the project."""
+    errors = []
+    paths = [*paths, *SKELETON_FILES]
+    directory = posixpath.dirname(path)
+    for match in IMPORT_PATTERN.finditer(code):
+        target = posixpath.normpath(posixpath.join(directory, match.group(1)))
+        if not any(target + extension in paths for extension in IMPORT_EXTENSIONS):
+            errors.append(f"The import '{match.group(1)}' doesn't match any file of the project.")
+    return errors
+
+async def check_with_esbuild(code: str, path: str) -> List[str]:
+    """Checks the syntax of a file with esbuild, which parses it without writing anything."""
+    loader = 'css' if path.endswith('.css') else 'jsx'
+    process = await asyncio.create_subprocess_exec(
+        ESBUILD_PATH,
+        f'--loader={loader}',
+        '--log-level=error',
+        '--log-limit=5',
+        '--color=false',
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await asyncio.wait_for(process.communicate(code.encode('utf-8')), ESBUILD_TIMEOUT)
+    if not process.returncode:
+        return []
+    return [stderr.decode('utf-8', errors='replace').strip()[:MAX_ERROR_CHARS]]
+
+async def validate_file(path: str, code: str, paths: List[str]) -> List[str]:
+    """
+    Validates a single file of the project.
+
+    The syntax is checked with esbuild when it is installed, or with the Python checkers.
+
+    Parameters:
+        path (str): The path of the file, relative to the project root.
+        code (str): The content of the file.
+        paths (List[str]): The paths of every file of the project.
+    Returns:
+        List[str]: The errors found, empty when the file is valid.
+    """
+    if not code.strip():
+        return ["The file is empty."]
+    if ESBUILD_PATH:
+        errors = await check_with_esbuild(code, path)
+    elif path.endswith('.css'):
+        errors = check_css_syntax(code)
+    else:
+        errors = check_jsx_syntax(code)
+    if path.endswith(('.js', '.jsx')):
+        errors += check_imports(path, code, paths)
+        if path == 'src/App.js' and 'export default' not in code:
+            errors.append("The App component is not exported as default.")
+    return errors
+
+async def validate_files(files: Dict[str, str], paths: List[str] | None = None) -> Dict[str, List[str]]:
+    """Validates the given files, or every file, of the project, getting the errors of the invalid ones."""
+    paths = list(files) if paths is None else paths
+    results = await asyncio.gather(*(validate_file(path, files[path], list(files)) for path in paths))
+    return {path: errors for path, errors in zip(paths, results, strict=True) if errors}
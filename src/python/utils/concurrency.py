@@ -0,0 +1,16 @@
+"""Module for asyncio helpers."""
+import asyncio
+from typing import AsyncIterator, Iterable, TypeVar
+
+T = TypeVar('T')
+
+async def iterate_in_thread(iterable: Iterable[T]) -> AsyncIterator[T]:
+    """
+    Iterates over a blocking iterable without blocking the event loop.
+
+    Each item is pulled from the iterable in a worker thread.
+    """
+    iterator = iter(iterable)
+    sentinel = object()
+    while (item := await asyncio.to_thread(next, iterator, sentinel)) is not sentinel:
+        yield item
@@ -0,0 +1,223 @@
+"""Module for the on-disk HTTP response cache."""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from .tracing import annotate
+
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Link', 'Content-Type')
+# Share of `max_bytes` left after evicting over the bound.
+EVICTION_TARGET = 0.9
+
+class HttpCache:
+    """
+    Persistent HTTP response cache keyed by URL.
+
+    Every cached response is stored as a JSON file with its ETag and
+    Last-Modified headers. Cached URLs are revalidated with conditional
+    requests and `304 Not Modified` answers are served from disk, however old
+    the entry is. Entries not used for `ttl` seconds are evicted, and the least
+    recently used entries are evicted once the cache grows over `max_bytes`.
+    In offline mode the cache is the only source, and misses are answered with
+    `504 Gateway Timeout`.
+    """
+    def __init__(
+            self,
+            path: str,
+            ttl: float = 24 * 60 * 60,
+            max_bytes: int = 50 * 1024 * 1024,
+            offline: bool = False
+            ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Reentrant, since the eviction scan holds it while removing entries.
+        self._lock = threading.RLock()
+        # Running size of the entries, counted by the first eviction scan.
+        self._size: int | None = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def stats(self) -> dict:
+        """Gets the hit/miss counters of the cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _entry_path(self, url: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def load(self, url: str) -> dict | None:
+        """Loads the cached entry of an URL, stale or not, since it is revalidated before use."""
+        try:
+            with open(self._entry_path(url), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save(self, url: str, response: requests.Response) -> None:
+        """Stores a response on disk."""
+        entry = {
+            "url": url,
+            "status": response.status_code,
+            "headers": {
+                key: response.headers[key] for key in CACHED_HEADERS if key in response.headers
+            },
+            "body": base64.b64encode(response.content).decode('ascii'),
+            "stored_at": time.time(),
+        }
+        self._write(self._entry_path(url), entry)
+        with self._lock:
+            if self._size is None or self._size > self.max_bytes:
+                self.evict()
+
+    def touch(self, url: str) -> None:
+        """Refreshes an entry after a successful revalidation."""
+        entry_path = self._entry_path(url)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as file:
+                entry = json.load(file)
+            entry['stored_at'] = time.time()
+            self._write(entry_path, entry)
+        except (OSError, json.JSONDecodeError):
+            return
+
+    def _mark_used(self, url: str) -> None:
+        """Updates the modification time of an entry served as is, for the LRU order."""
+        try:
+            os.utime(self._entry_path(url))
+        except OSError:
+            return
+
+    def _write(self, entry_path: str, entry: dict) -> None:
+        """Writes an entry atomically, keeping the running size of the cache."""
+        tmp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        size = os.path.getsize(tmp_path)
+        try:
+            previous = os.path.getsize(entry_path)
+        except FileNotFoundError:
+            previous = 0
+        os.replace(tmp_path, entry_path)
+        with self._lock:
+            if self._size is not None:
+                self._size += size - previous
+
+    def _remove(self, entry_path: str) -> None:
+        try:
+            size = os.path.getsize(entry_path)
+            os.remove(entry_path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._size is not None:
+                self._size -= size
+
+    def evict(self) -> None:
+        """
+        Evicts the expired entries and the least recently used ones over the size bound.
+
+        Lists the whole cache, so `save` only calls it to count the cache the
+        first time, then once the running size goes over the bound. It evicts
+        down to 90% of the bound, so the next scan waits for more writes. The
+        scan holds the lock, so concurrent saves don't scan the cache together.
+        """
+        with self._lock:
+            entries = []
+            now = time.time()
+            for name in os.listdir(self.path):
+                if not name.endswith('.json'):
+                    continue
+                entry_path = os.path.join(self.path, name)
+                try:
+                    stat = os.stat(entry_path)
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    self._remove(entry_path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total = sum(size for _, size, _ in entries)
+            limit = self.max_bytes if total <= self.max_bytes else self.max_bytes * EVICTION_TARGET
+            for _, size, entry_path in sorted(entries):
+                if total <= limit:
+                    break
+                self._remove(entry_path)
+                total -= size
+            self._size = total
+
+    @staticmethod
+    def to_response(entry: dict, url: str) -> requests.Response:
+        """Builds a response from a cached entry."""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.url = url
+        response.headers.update(entry['headers'])
+        response._content = base64.b64decode(entry['body'])
+        response.encoding = 'utf-8'
+        return response
+
+    def get(self, session: requests.Session, url: str, **kwargs: object) -> requests.Response:
+        """
+        Makes a GET request through the cache.
+
+        Accepts the same keyword arguments as `requests.Session.get`.
+        """
+        params = kwargs.pop('params', None)
+        url = requests.Request('GET', url, params=params).prepare().url
+        entry = self.load(url)
+
+        if self.offline:
+            if entry is None:
+                self._count('misses')
+                annotate(cache='offline-miss')
+                response = requests.Response()
+                response.status_code = 504
+                response.url = url
+                response._content = b'{"message": "Offline cache miss."}'
+                return response
+            self._count('hits')
+            annotate(cache='offline-hit')
+            self._mark_used(url)
+            return self.to_response(entry, url)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if etag := entry['headers'].get('ETag'):
+                headers['If-None-Match'] = etag
+            if last_modified := entry['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = last_modified
+
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self._count('hits')
+            annotate(cache='revalidated')
+            self.touch(url)
+            return self.to_response(entry, url)
+
+        self._count('misses')
+        annotate(cache='miss')
+        if response.status_code == 200 and (
+            'ETag' in response.headers or 'Last-Modified' in response.headers
+            ):
+            self.save(url, response)
+        return response
@@ -0,0 +1,71 @@
+"""Module for applying search/replace patches to generated code."""
+import re
+from typing import List, NamedTuple
+
+HUNK_PATTERN = re.compile(
+    r'<{5,}\s*SEARCH[^\n]*\n(.*?)\n?={5,}[^\n]*\n(.*?)\n?>{5,}\s*REPLACE',
+    re.DOTALL
+)
+CODE_BLOCK_PATTERN = re.compile(r'```(.*?)```', re.DOTALL)
+CODE_BLOCK_LANGUAGES = ('javascript', 'jsx', 'js', 'css', 'json')
+
+class PatchError(ValueError):
+    """Raised when a hunk doesn't apply to the code."""
+
+class Hunk(NamedTuple):
+    """A search/replace hunk."""
+    search: str
+    replace: str
+
+def extract_code(response: str) -> str:
+    """Extracts the first code block of a response, or the whole response when there is none."""
+    match = CODE_BLOCK_PATTERN.search(response)
+    if not match:
+        return response
+    code = match.group(1)
+    for language in CODE_BLOCK_LANGUAGES:
+        if code.startswith(f'{language}\n'):
+            return code.removeprefix(f'{language}\n')
+    return code.removeprefix('\n')
+
+def parse_hunks(response: str) -> List[Hunk]:
+    """Parses the search/replace hunks of a response."""
+    return [Hunk(search, replace) for search, replace in HUNK_PATTERN.findall(response)]
+
+def _find_unique(code: str, search: str) -> int:
+    """Finds the single occurrence of a search text, or returns -1 when missing or ambiguous."""
+    index = code.find(search)
+    if index == -1 or code.find(search, index + 1) != -1:
+        return -1
+    return index
+
+def _rstrip_lines(text: str) -> str:
+    return '\n'.join(line.rstrip() for line in text.split('\n'))
+
+def apply_hunks(code: str, hunks: List[Hunk]) -> str:
+    """
+    Applies the hunks to the code, in order.
+
+    Each search text must appear exactly once in the code; trailing whitespace
+    is ignored when the exact text isn't found.
+
+    Raises:
+        PatchError: When a hunk doesn't apply.
+    """
+    for number, hunk in enumerate(hunks, start=1):
+        if not hunk.search.strip():
+            raise PatchError(f"Hunk {number} has an empty search block.")
+        index = _find_unique(code, hunk.search)
+        if index != -1:
+            code = code[:index] + hunk.replace + code[index + len(hunk.search):]
+            continue
+        stripped_code = _rstrip_lines(code)
+        index = _find_unique(stripped_code, _rstrip_lines(hunk.search))
+        if index == -1:
+            raise PatchError(f"Hunk {number} doesn't match the code exactly once.")
+        code = (
+            stripped_code[:index]
+            + hunk.replace
+            + stripped_code[index + len(_rstrip_lines(hunk.search)):]
+        )
+    return code
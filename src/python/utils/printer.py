@@ -1,11 +1,43 @@
 """Class for printing utilities"""
 from .colors import Colors as cl
 
+_streaming = False
+# The chunks of the last streamed message, kept after it ended.
+_streamed_chunks = []
+
+def end_assistant_stream() -> bool:
+    """Ends the streamed assistant message line. Returns whether a message was being streamed."""
+    global _streaming
+    if not _streaming:
+        return False
+    print(flush=True)
+    _streaming = False
+    return True
+
+def take_streamed_message() -> str:
+    """Ends the streamed assistant message and gets the text of the last one streamed, forgetting it."""
+    end_assistant_stream()
+    text = "".join(_streamed_chunks)
+    _streamed_chunks.clear()
+    return text
+
+def print_assistant_chunk(chunk: str) -> None:
+    """Prints a chunk of a streamed assistant message."""
+    global _streaming
+    prefix = "" if _streaming else "Assistant: "
+    if not _streaming:
+        _streamed_chunks.clear()
+    _streaming = True
+    _streamed_chunks.append(chunk)
+    print(cl.colored(f"{prefix}{chunk}", 'BLUE'), end='', flush=True)
+
 def print_assistant_message(message: str) -> None:
     """Prints the assistant message."""
+    end_assistant_stream()
     print(cl.colored(f"Assistant: {message}", 'BLUE'))
 
 def print_function_message(message: str, verbose: bool = False) -> None:
     """Prints the function message."""
     if verbose:
+        end_assistant_stream()
         print(cl.colored(f"Function: {message}", 'YELLOW'))
@@ -0,0 +1,259 @@
+"""Module for running subprocesses with bounded output capture."""
+import asyncio
+import itertools
+import os
+import re
+import signal
+import subprocess
+import time
+from typing import BinaryIO, List
+
+from python.utils.tracing import get_tracer
+
+PROCESS_HEAD_BYTES = int(os.getenv('PROCESS_HEAD_BYTES', '2048'))
+PROCESS_TAIL_BYTES = int(os.getenv('PROCESS_TAIL_BYTES', '4096'))
+PROCESS_MAX_ERROR_LINES = int(os.getenv('PROCESS_MAX_ERROR_LINES', '20'))
+PROCESS_LOG_DIR = os.getenv('PROCESS_LOG_DIR', '.cache/logs')
+PROCESS_MAX_LOGS = int(os.getenv('PROCESS_MAX_LOGS', '50'))
+
+ERROR_LINE_PATTERN = re.compile(rb'\berror\b|ERR!', re.IGNORECASE)
+MAX_LINE_BYTES = 500
+READ_CHUNK_BYTES = 64 * 1024
+TRUNCATION_MARKER = "\n[... {omitted} bytes omitted ...]\n"
+
+_log_numbers = itertools.count(1)
+
+class OutputCapture:
+    """
+    Bounded capture of an output stream.
+
+    Keeps the first `head_bytes` and the last `tail_bytes` of the stream,
+    and up to `max_error_lines` lines matching `error` or `ERR!`, so the
+    memory used stays the same however long the output grows.
+    """
+    def __init__(
+            self,
+            head_bytes: int = PROCESS_HEAD_BYTES,
+            tail_bytes: int = PROCESS_TAIL_BYTES,
+            max_error_lines: int = PROCESS_MAX_ERROR_LINES
+            ) -> None:
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.max_error_lines = max_error_lines
+        self.total_bytes = 0
+        self.error_lines: List[str] = []
+        self.omitted_error_lines = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._pending = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """Captures the next chunk of the stream."""
+        self.total_bytes += len(chunk)
+        self._scan_lines(chunk)
+        if len(self._head) < self.head_bytes:
+            taken = self.head_bytes - len(self._head)
+            self._head += chunk[:taken]
+            chunk = chunk[taken:]
+        self._tail += chunk
+        del self._tail[:-self.tail_bytes or len(self._tail)]
+
+    def close(self) -> None:
+        """Captures the last line of the stream, when it has no line break."""
+        self._scan_line(self._pending)
+        self._pending = b""
+
+    def _scan_lines(self, chunk: bytes) -> None:
+        """Collects the error lines of a chunk, keeping its last partial line."""
+        *lines, self._pending = (self._pending + chunk).split(b"\n")
+        for line in lines:
+            self._scan_line(line)
+        # A line with no end is scanned and dropped once it is too long to be read.
+        if len(self._pending) > MAX_LINE_BYTES * 8:
+            self._scan_line(self._pending)
+            self._pending = b""
+
+    def _scan_line(self, line: bytes) -> None:
+        """Keeps a line when it reports an error."""
+        if not ERROR_LINE_PATTERN.search(line):
+            return
+        if len(self.error_lines) >= self.max_error_lines:
+            self.omitted_error_lines += 1
+            return
+        self.error_lines.append(line[:MAX_LINE_BYTES].decode('utf-8', errors='replace').strip())
+
+    @property
+    def truncated(self) -> bool:
+        """Checks if part of the stream was dropped."""
+        return self.total_bytes > len(self._head) + len(self._tail)
+
+    def text(self) -> str:
+        """Gets the head and the tail of the stream, with the size of the dropped part."""
+        head = self._head.decode('utf-8', errors='replace')
+        tail = self._tail.decode('utf-8', errors='replace')
+        if not self.truncated:
+            return head + tail
+        omitted = self.total_bytes - len(self._head) - len(self._tail)
+        return head + TRUNCATION_MARKER.format(omitted=omitted) + tail
+
+class ProcessOutput:
+    """The exit code and the bounded output of a finished subprocess."""
+    def __init__(
+            self,
+            args: List[str],
+            returncode: int | None,
+            stdout: OutputCapture,
+            stderr: OutputCapture,
+            log_path: str | None,
+            seconds: float
+            ) -> None:
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.log_path = log_path
+        self.seconds = seconds
+
+    @property
+    def error_lines(self) -> List[str]:
+        """Gets the error lines of both streams."""
+        return self.stdout.error_lines + self.stderr.error_lines
+
+    def describe(self) -> str:
+        """Describes the run for the LLM, within the capture bounds."""
+        description = f"Command `{' '.join(self.args)}` exited with code {self.returncode} in {self.seconds:.1f}s."
+        if stdout := self.stdout.text().strip():
+            description += f"\nOutput:\n{stdout}"
+        if stderr := self.stderr.text().strip():
+            description += f"\nErrors:\n{stderr}"
+        if self.error_lines:
+            description += "\nError lines:\n" + "\n".join(self.error_lines)
+            omitted = self.stdout.omitted_error_lines + self.stderr.omitted_error_lines
+            if omitted:
+                description += f"\n[... {omitted} more error lines ...]"
+        if self.log_path and (self.stdout.truncated or self.stderr.truncated):
+            description += f"\nThe full log is in {self.log_path}."
+        return description
+
+def log_path_for(args: List[str], log_dir: str) -> str:
+    """
+    Gets a new log file path named after the command.
+
+    The number of the log within the process keeps the runs of the same
+    command in the same second, like the sessions of the server, apart.
+    """
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', ' '.join(args[:3])).strip('-')[:40]
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_log_numbers)}-{slug}.log"
+    return os.path.join(log_dir, name)
+
+def prune_logs(log_dir: str, max_logs: int = PROCESS_MAX_LOGS) -> None:
+    """Removes the oldest log files, keeping the newest `max_logs` ones."""
+    logs = sorted(
+        (entry for entry in os.scandir(log_dir) if entry.name.endswith('.log')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in logs[:max(len(logs) - max_logs, 0)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+async def _pump(stream: asyncio.StreamReader, capture: OutputCapture, log: BinaryIO | None) -> None:
+    """Streams an output into its capture and the log file."""
+    while chunk := await stream.read(READ_CHUNK_BYTES):
+        capture.feed(chunk)
+        if log is not None:
+            log.write(chunk)
+    capture.close()
+
+async def run_process(
+        args: List[str],
+        cwd: str,
+        timeout: float,
+        check: bool = True,
+        log_dir: str | None = PROCESS_LOG_DIR
+        ) -> ProcessOutput:
+    """
+    Runs a subprocess without blocking the event loop, with bounded output capture.
+
+    The stdout and stderr are streamed into `OutputCapture`s and the raw
+    output of both is written to a log file in `log_dir`, when set. Like
+    `subprocess.run`, the process and its children are killed and
+    `subprocess.TimeoutExpired` is raised on timeout, and `subprocess.CalledProcessError` is raised on a
+    non-zero exit when `check`. Their output is the bounded description of the run.
+
+    Parameters:
+        args (List[str]): The command to run.
+        cwd (str): The working directory of the command.
+        timeout (float): The maximum seconds the command can run.
+        check (bool): Whether to raise on a non-zero exit code.
+        log_dir (str | None): The folder of the log files, or None to keep no log.
+    Returns:
+        ProcessOutput: The exit code and the captured output.
+    """
+    with get_tracer().span("process", "process", command=" ".join(args[:3]), timeout=timeout) as span:
+        output = await _run_process(args, cwd, timeout, log_dir)
+        span.set(
+            returncode=output.returncode,
+            stdout_bytes=output.stdout.total_bytes,
+            stderr_bytes=output.stderr.total_bytes,
+            error_lines=len(output.error_lines),
+            log_path=output.log_path
+        )
+        if output.returncode:
+            span.fail(f"Exited with code {output.returncode}.")
+    if check and output.returncode:
+        raise subprocess.CalledProcessError(output.returncode, args, output=output.describe())
+    return output
+
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """Kills a process and the children it spawned, which share its process group."""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+async def _run_process(args: List[str], cwd: str, timeout: float, log_dir: str | None) -> ProcessOutput:
+    """Runs a subprocess with bounded output capture, raising `subprocess.TimeoutExpired` on timeout."""
+    start = time.perf_counter()
+    log_path = None
+    log = None
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        prune_logs(log_dir, PROCESS_MAX_LOGS - 1)
+        log_path = log_path_for(args, log_dir)
+        log = open(log_path, 'wb')
+    stdout, stderr = OutputCapture(), OutputCapture()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=cwd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # Its own process group, so a timeout also kills the children of yarn and node.
+            start_new_session=hasattr(os, 'killpg')
+        )
+        pumps = asyncio.gather(
+            _pump(process.stdout, stdout, log),
+            _pump(process.stderr, stderr, log),
+            process.wait()
+        )
+        try:
+            await asyncio.wait_for(pumps, timeout)
+        except asyncio.CancelledError:
+            _kill_process_group(process)
+            raise
+        except asyncio.TimeoutError:
+            _kill_process_group(process)
+            await process.wait()
+            output = ProcessOutput(args, process.returncode, stdout, stderr, log_path, time.perf_counter() - start)
+            raise subprocess.TimeoutExpired(args, timeout, output=output.describe()) from None
+    finally:
+        if log is not None:
+            log.close()
+
+    return ProcessOutput(args, process.returncode, stdout, stderr, log_path, time.perf_counter() - start)
@@ -0,0 +1,218 @@
+"""Module for recording and replaying the LLM, Github and subprocess traffic of a session."""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+from urllib.parse import urlsplit
+
+import httpx2
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from python.utils import process_output
+from python.utils.process_output import OutputCapture, ProcessOutput
+
+RECORD = "record"
+REPLAY = "replay"
+CHANNELS = ("llm", "github", "process")
+# Only the headers the agent reads are kept, so no credentials reach the cassette.
+LLM_HEADERS = ("content-type",)
+GITHUB_HEADERS = ("content-type", "link", "etag", "last-modified", "retry-after")
+
+class CassetteMiss(LookupError):
+    """Raised when a replayed request has no recorded interaction left."""
+
+def request_key(*parts: object) -> str:
+    """Hashes the parts of a request into a short key."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:24]
+
+class Cassette:
+    """
+    Recorded interactions of a session, replayed in place of OpenAI, Github and yarn.
+
+    Each interaction is stored with a key hashing the whole request, and a
+    route hashing its stable part: the endpoint, and for the LLM the model,
+    the system prompt and whether tools are offered. A replayed request gets
+    the first unused interaction with its key or, when none is left, the next
+    unused one of its route in recording order. So the requests carrying
+    run-specific text, like durations or ports in the tool results, still
+    replay in order, while concurrent requests are matched by their content.
+    """
+    def __init__(self, path: str, mode: str = REPLAY) -> None:
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.meta: dict = {}
+        self.interactions: Dict[str, List[dict]] = {channel: [] for channel in CHANNELS}
+        self.replayed: Dict[str, int] = dict.fromkeys(CHANNELS, 0)
+        self._used: set = set()
+        self._lock = threading.Lock()
+        if mode == REPLAY:
+            with open(path) as file:
+                data = json.load(file)
+            self.meta = data.get('meta', {})
+            for channel in CHANNELS:
+                self.interactions[channel] = data.get(channel, [])
+
+    @property
+    def recording(self) -> bool:
+        """Checks if the cassette records the real traffic."""
+        return self.mode == RECORD
+
+    def record(self, channel: str, key: str, route: str, request: dict, response: dict) -> None:
+        """Stores an interaction."""
+        with self._lock:
+            self.interactions[channel].append({
+                'key': key,
+                'route': route,
+                'request': request,
+                'response': response,
+            })
+
+    def replay(self, channel: str, key: str, route: str) -> dict:
+        """Gets the recorded response of a request, raising `CassetteMiss` when there is none."""
+        with self._lock:
+            interactions = self.interactions[channel]
+            unused = [index for index in range(len(interactions)) if (channel, index) not in self._used]
+            for field, value in (('key', key), ('route', route)):
+                for index in unused:
+                    if interactions[index][field] == value:
+                        self._used.add((channel, index))
+                        self.replayed[channel] += 1
+                        return interactions[index]['response']
+        raise CassetteMiss(f"No recorded {channel} interaction left for the route {route} in {self.path}.")
+
+    def unused(self) -> Dict[str, int]:
+        """Counts the recorded interactions that were not replayed, per channel."""
+        return {
+            channel: len(self.interactions[channel]) - self.replayed[channel]
+            for channel in CHANNELS
+        }
+
+    def save(self) -> None:
+        """Writes the recorded interactions."""
+        if directory := os.path.dirname(self.path):
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, open(self.path, 'w') as file:
+            json.dump({'meta': self.meta, **self.interactions}, file, indent=1)
+            file.write("\n")
+
+    def openai_transport(self, transport: httpx2.AsyncBaseTransport | None = None) -> "OpenAIReplayTransport":
+        """Gets a transport for the `http_client` of `AsyncOpenAI`, recording through `transport`."""
+        if self.recording and transport is None:
+            transport = httpx2.AsyncHTTPTransport()
+        return OpenAIReplayTransport(self, transport)
+
+    def install_github(self, session: requests.Session) -> None:
+        """Mounts the record/replay adapter on the github session."""
+        adapter = GithubReplayAdapter(self)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    @contextmanager
+    def patch_processes(self) -> Iterator[None]:
+        """Records or replays the subprocesses of `run_process` within the block."""
+        run = process_output._run_process
+
+        async def run_or_replay(args: List[str], cwd: str, timeout: float, log_dir: str | None) -> ProcessOutput:
+            key, route = request_key(args), request_key(args[:2])
+            if self.recording:
+                output = await run(args, cwd, timeout, log_dir)
+                self.record('process', key, route, {'args': args}, {
+                    'returncode': output.returncode,
+                    'stdout': output.stdout.text(),
+                    'stderr': output.stderr.text(),
+                    'seconds': round(output.seconds, 3),
+                })
+                return output
+            recorded = self.replay('process', key, route)
+            stdout, stderr = OutputCapture(), OutputCapture()
+            for capture, text in ((stdout, recorded['stdout']), (stderr, recorded['stderr'])):
+                capture.feed(text.encode('utf-8'))
+                capture.close()
+            return ProcessOutput(args, recorded['returncode'], stdout, stderr, None, recorded['seconds'])
+
+        process_output._run_process = run_or_replay
+        try:
+            yield
+        finally:
+            process_output._run_process = run
+
+class OpenAIReplayTransport(httpx2.AsyncBaseTransport):
+    """HTTP transport recording or replaying the OpenAI requests, streamed ones included."""
+    def __init__(self, cassette: Cassette, transport: httpx2.AsyncBaseTransport | None = None) -> None:
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx2.Request) -> httpx2.Response:
+        body = json.loads(await request.aread() or b'{}')
+        messages = body.get('messages') or [{}]
+        system = messages[0].get('content') if messages[0].get('role') == 'system' else None
+        key = request_key(request.method, request.url.path, body)
+        route = request_key(request.method, request.url.path, body.get('model'), system, bool(body.get('tools')))
+        if not self.cassette.recording:
+            recorded = self.cassette.replay('llm', key, route)
+            return httpx2.Response(
+                recorded['status'],
+                headers=recorded['headers'],
+                content=recorded['body'].encode('utf-8'),
+                request=request
+            )
+
+        response = await self.transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        headers = {name: response.headers[name] for name in LLM_HEADERS if name in response.headers}
+        self.cassette.record('llm', key, route, {
+            'method': request.method,
+            'path': request.url.path,
+            'model': body.get('model'),
+            'stream': bool(body.get('stream')),
+            'last_message': str(messages[-1].get('content'))[:200],
+        }, {
+            'status': response.status_code,
+            'headers': headers,
+            'body': content.decode('utf-8'),
+        })
+        return httpx2.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        if self.transport is not None:
+            await self.transport.aclose()
+
+class GithubReplayAdapter(HTTPAdapter):
+    """Requests adapter recording or replaying the github API requests."""
+    def __init__(self, cassette: Cassette, **kwargs: object) -> None:
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request: requests.PreparedRequest, **kwargs: object) -> requests.Response:
+        split = urlsplit(request.url)
+        key = request_key(request.method, request.url)
+        route = request_key(request.method, split.netloc, split.path)
+        if self.cassette.recording:
+            response = super().send(request, **kwargs)
+            self.cassette.record('github', key, route, {'method': request.method, 'url': request.url}, {
+                'status': response.status_code,
+                'headers': {name: response.headers[name] for name in GITHUB_HEADERS if name in response.headers},
+                'body': response.content.decode('utf-8', errors='replace'),
+            })
+            return response
+
+        recorded = self.cassette.replay('github', key, route)
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response._content = recorded['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
@@ -0,0 +1,398 @@
+"""Module for the retries, rate limits and circuit breakers of the LLM and Github calls."""
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, TypeVar
+
+import openai
+import requests
+
+from .tracing import annotate
+
+T = TypeVar('T')
+
+# Defaults of the guard of each provider, overridden by the `<PROVIDER>_<SETTING>` environment variables.
+PROVIDER_DEFAULTS: Dict[str, dict] = {
+    'llm': {
+        'max_retries': 5,
+        'retry_base_delay': 1.0,
+        'retry_max_delay': 30.0,
+        'rate_limit': 0.0,
+        'rate_burst': 10,
+        'breaker_failures': 5,
+        'breaker_reset': 30.0,
+    },
+    'gh': {
+        'max_retries': 3,
+        'retry_base_delay': 0.5,
+        'retry_max_delay': 30.0,
+        'rate_limit': 0.0,
+        'rate_burst': 20,
+        'breaker_failures': 10,
+        'breaker_reset': 30.0,
+    },
+}
+
+class ResilienceError(Exception):
+    """Base error of the resilience layer."""
+
+class CircuitOpenError(ResilienceError):
+    """Raised instead of calling a provider that keeps failing."""
+
+class RateLimitedError(ResilienceError):
+    """Raised when a call would wait longer than allowed for the rate limit."""
+
+class RetryableError(ResilienceError):
+    """
+    Raised by a guarded call to have it retried.
+
+    Carries the `Retry-After` delay asked by the provider, if any, and the
+    response that caused it, so the caller can still use it once the retries
+    run out. A `throttled` error is a provider asking to slow down, like a
+    `429`, rather than failing.
+    """
+    def __init__(
+            self,
+            message: str,
+            retry_after: float | None = None,
+            response: object = None,
+            throttled: bool = False
+            ) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.response = response
+        self.throttled = throttled
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parses a `Retry-After` header, in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    The n-th retry waits a random time up to `base_delay * 2**n`, capped at
+    `max_delay`, so concurrent clients spread their retries instead of
+    retrying in lockstep. A `Retry-After` asked by the provider is honoured,
+    with a little jitter, unless it is longer than `max_delay`.
+    """
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry: int, retry_after: float | None = None) -> float | None:
+        """Gets the seconds to wait before the `retry`-th retry, or None to give up."""
+        if retry > self.max_retries:
+            return None
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                return None
+            return retry_after + random.uniform(0, min(retry_after * 0.1, 1.0))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of calls.
+
+    Refills `rate` tokens per second up to `capacity`, and each call takes one.
+    Waiting callers reserve their token, so they are served in order. The
+    bucket can also be paused until a provider quota resets. A `rate` of 0
+    only applies the pauses.
+    """
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def pause(self, seconds: float) -> None:
+        """Holds every call for the next `seconds`."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def reserve(self, max_wait: float | None = None) -> float:
+        """
+        Takes a token and gets the seconds to wait before using it.
+
+        Raises `RateLimitedError` without taking the token when the wait
+        would be longer than `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, 0.0)
+            if self.rate > 0:
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                wait = max(wait, -(self.tokens - 1) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                raise RateLimitedError(f"The rate limit would hold the call for {wait:.1f}s.")
+            if self.rate > 0:
+                self.tokens -= 1
+            return wait
+
+    def acquire(self, max_wait: float | None = None) -> float:
+        """Waits for a token in a thread, returning the seconds waited."""
+        if wait := self.reserve(max_wait):
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, max_wait: float | None = None) -> float:
+        """Waits for a token without blocking the event loop, returning the seconds waited."""
+        if wait := self.reserve(max_wait):
+            await asyncio.sleep(wait)
+        return wait
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    Opens after `failure_threshold` consecutive failures, so the calls fail
+    at once instead of piling up retries against a provider that is down.
+    After `reset_timeout` seconds a single trial call is let through: the
+    circuit closes if it succeeds and opens again if it fails.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_started: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Gets the state of the circuit: closed, open or half-open."""
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self.opened_at < self.reset_timeout else "half-open"
+
+    def before_call(self, name: str = "provider") -> None:
+        """Raises `CircuitOpenError` when the call must not be made."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.reset_timeout - (now - self.opened_at)
+            # A trial that never reported, like a cancelled one, is given up after the timeout.
+            trial_running = self._trial_started is not None and now - self._trial_started < self.reset_timeout
+            if remaining > 0 or trial_running:
+                raise CircuitOpenError(
+                    f"The {name} circuit is open after {self.failures} failures, "
+                    f"retry in {max(remaining, 0):.1f}s."
+                )
+            self._trial_started = now
+
+    def record_success(self) -> None:
+        """Closes the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        """Counts a failure, opening the circuit at the threshold or after a failed trial."""
+        with self._lock:
+            self.failures += 1
+            if self._trial_started is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_started = None
+
+class ProviderGuard:
+    """
+    Retries, rate limit and circuit breaker of the calls to a provider.
+
+    Every attempt takes a token of the bucket and goes through the breaker.
+    The errors for which `classify` returns a `RetryableError` are retried
+    with the backoff of the policy. The throttled ones pause the bucket for
+    their `Retry-After`, holding every call sharing the guard, and the others
+    count as failures of the breaker, so a burst of `429` slows the calls
+    down instead of opening the circuit. The other errors are raised at once.
+    The retries and waits are recorded in the current span.
+    """
+    def __init__(
+            self,
+            name: str,
+            policy: RetryPolicy,
+            bucket: TokenBucket,
+            breaker: CircuitBreaker,
+            classify: Callable[[Exception], RetryableError | None] | None = None
+            ) -> None:
+        self.name = name
+        self.policy = policy
+        self.bucket = bucket
+        self.breaker = breaker
+        self.classify = classify or (lambda error: error if isinstance(error, RetryableError) else None)
+        self.calls = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, provider: str, **kwargs: object) -> "ProviderGuard":
+        """
+        Creates the guard of a provider from its defaults and environment variables.
+
+        The settings are read from `<PROVIDER>_MAX_RETRIES`, `_RETRY_BASE_DELAY`,
+        `_RETRY_MAX_DELAY`, `_RATE_LIMIT`, `_RATE_BURST`, `_BREAKER_FAILURES`
+        and `_BREAKER_RESET`. The other keyword arguments go to the constructor.
+        """
+        settings = {
+            key: type(default)(os.getenv(f"{provider.upper()}_{key.upper()}", default))
+            for key, default in PROVIDER_DEFAULTS[provider].items()
+        }
+        return cls(
+            provider,
+            RetryPolicy(settings['max_retries'], settings['retry_base_delay'], settings['retry_max_delay']),
+            TokenBucket(settings['rate_limit'], settings['rate_burst']),
+            CircuitBreaker(settings['breaker_failures'], settings['breaker_reset']),
+            **kwargs
+        )
+
+    def stats(self) -> dict:
+        """Gets the counters and the circuit state of the guard."""
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "circuit": self.breaker.state}
+
+    def _attempted(self, retry: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.retries += retry > 0
+
+    def _next_delay(self, error: Exception, retry: int) -> float:
+        """Records a failed attempt and gets the wait before the next one, raising when there is none."""
+        retryable = self.classify(error)
+        if retryable is None:
+            # The provider answered, so the error says nothing about its health.
+            self.breaker.record_success()
+            raise error
+        if retryable.throttled:
+            # The provider is up and asks every caller to slow down, not to stop.
+            self.breaker.record_success()
+            if retryable.retry_after is not None:
+                self.bucket.pause(retryable.retry_after)
+        else:
+            self.breaker.record_failure()
+        delay = self.policy.delay(retry + 1, retryable.retry_after)
+        if delay is None:
+            raise error
+        annotate(retries=retry + 1, last_retry_error=f"{type(error).__name__}: {error}")
+        return delay
+
+    def call(self, function: Callable[[], T]) -> T:
+        """Calls `function` in a thread, with the retries, rate limit and breaker."""
+        retry = 0
+        while True:
+            self.breaker.before_call(self.name)
+            if waited := self.bucket.acquire(self.policy.max_delay):
+                annotate(throttled_seconds=round(waited, 3))
+            self._attempted(retry)
+            try:
+                result = function()
+            except Exception as e:
+                time.sleep(self._next_delay(e, retry))
+                retry += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, function: Callable[[], Awaitable[T]]) -> T:
+        """Awaits `function()`, with the retries, rate limit and breaker."""
+        retry = 0
+        while True:
+            self.breaker.before_call(self.name)
+            if waited := await self.bucket.acquire_async(self.policy.max_delay):
+                annotate(throttled_seconds=round(waited, 3))
+            self._attempted(retry)
+            try:
+                result = await function()
+            except Exception as e:
+                await asyncio.sleep(self._next_delay(e, retry))
+                retry += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+def classify_openai_error(error: Exception) -> RetryableError | None:
+    """
+    Gets the retryable form of an OpenAI error: timeouts, connection errors, 408, 409, 429 and 5xx.
+
+    The 4xx answers come from a provider that is up, so they are throttled.
+    """
+    if isinstance(error, openai.APIConnectionError):
+        return RetryableError(str(error))
+    if isinstance(error, openai.APIStatusError) and (error.status_code in (408, 409, 429) or error.status_code >= 500):
+        headers = error.response.headers
+        try:
+            retry_after = float(headers['retry-after-ms']) / 1000
+        except (KeyError, ValueError):
+            retry_after = parse_retry_after(headers.get('retry-after'))
+        return RetryableError(str(error), retry_after=retry_after, throttled=error.status_code < 500)
+    return None
+
+def github_rate_limit_wait(response: requests.Response) -> float | None:
+    """Gets the seconds until the github quota resets, when `X-RateLimit-Remaining` is exhausted."""
+    if response.headers.get('X-RateLimit-Remaining') != '0':
+        return None
+    try:
+        return max(float(response.headers['X-RateLimit-Reset']) - time.time(), 0.0)
+    except (KeyError, ValueError):
+        return None
+
+def github_response_error(response: requests.Response) -> RetryableError | None:
+    """Gets the retryable error of a github response: rate limited, 429 or 5xx."""
+    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    rate_limited = response.status_code == 403 and (
+        retry_after is not None or response.headers.get('X-RateLimit-Remaining') == '0'
+    )
+    if not (rate_limited or response.status_code == 429 or response.status_code >= 500):
+        return None
+    if retry_after is None and rate_limited:
+        retry_after = github_rate_limit_wait(response)
+    return RetryableError(
+        f"Github answered {response.status_code}.",
+        retry_after=retry_after,
+        response=response,
+        throttled=response.status_code < 500
+    )
+
+def classify_github_error(error: Exception) -> RetryableError | None:
+    """Gets the retryable form of a github error: retryable responses, timeouts and connection errors."""
+    if isinstance(error, RetryableError):
+        return error
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return RetryableError(str(error))
+    return None
+
+CLASSIFIERS: Dict[str, Callable[[Exception], RetryableError | None]] = {
+    'llm': classify_openai_error,
+    'gh': classify_github_error,
+}
+
+_guards: Dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+def get_guard(provider: str) -> ProviderGuard:
+    """
+    Gets the guard shared by every call to a provider in the process, `llm` or `gh`.
+
+    Sharing it makes the rate limit and the circuit apply to all the sessions together.
+    """
+    with _guards_lock:
+        if provider not in _guards:
+            _guards[provider] = ProviderGuard.from_env(provider, classify=CLASSIFIERS[provider])
+        return _guards[provider]
@@ -1,49 +1,227 @@
 """Module for the search tools."""
 import base64
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Iterator
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from python.config import get_settings
+
+from .http_cache import HttpCache
 from .printer import print_function_message
+from .resilience import (
+    ProviderGuard,
+    ResilienceError,
+    RetryableError,
+    get_guard,
+    github_rate_limit_wait,
+    github_response_error,
+)
+from .tracing import get_tracer
+
+GH_API_URL = os.getenv('GH_API_URL', 'https://api.github.com').rstrip('/')
+GH_MAX_WORKERS = int(os.getenv('GH_MAX_WORKERS', '8'))
+GH_TIMEOUT = float(os.getenv('GH_TIMEOUT', '20'))
+GH_PER_PAGE = 100
+GH_CACHE = os.getenv('GH_CACHE', '1') == '1'
+GH_CACHE_DIR = os.getenv('GH_CACHE_DIR', '.cache/github')
+GH_CACHE_TTL = float(os.getenv('GH_CACHE_TTL', str(24 * 60 * 60)))
+GH_CACHE_MAX_BYTES = int(os.getenv('GH_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_cache: HttpCache | None = None
+
+def get_gh_session() -> requests.Session:
+    """
+    Gets the shared github session.
 
-def make_gh_authed_request(url: str) -> requests.Response:
+    The session keeps a keep-alive connection pool sized for the concurrent
+    README fetches, so every request reuses the same TCP/TLS connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=GH_MAX_WORKERS + 1
+            )
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+def get_gh_cache() -> HttpCache | None:
+    """
+    Gets the shared github response cache, if enabled.
+
+    The offline mode is read from the `GH_OFFLINE` environment variable when
+    the cache is first used.
+    """
+    global _cache
+    offline = os.getenv('GH_OFFLINE', '0') == '1'
+    if not GH_CACHE and not offline:
+        return None
+    with _session_lock:
+        if _cache is None:
+            _cache = HttpCache(
+                GH_CACHE_DIR,
+                ttl=GH_CACHE_TTL,
+                max_bytes=GH_CACHE_MAX_BYTES,
+                offline=offline
+            )
+        return _cache
+
+def get_gh_guard() -> ProviderGuard:
+    """Gets the guard of the github requests, configured by the `GH_*` retry and rate settings."""
+    return get_guard('gh')
+
+def make_gh_authed_request(url: str, params: dict | None = None) -> requests.Response:
   """
   Makes an authenticated request to the github API.
+
+  The request goes through the github guard: rate limited, 429 and 5xx
+  answers, timeouts and connection errors are retried with backoff, and an
+  exhausted `X-RateLimit-Remaining` holds every request until the quota
+  resets. Once the retries run out, the last answer is returned.
   """
   headers = {
       "User-Agent": "React-ReAct-Agent",
       "Accept": "application/vnd.github+json",
-      "Authorization": f"Bearer {os.getenv('GH_TOKEN')}"
+      "Authorization": f"Bearer {get_settings().gh_token}"
   }
-  response = requests.get(url, headers=headers, timeout=20)
+  guard = get_gh_guard()
+
+  def send() -> requests.Response:
+    if cache := get_gh_cache():
+      response = cache.get(get_gh_session(), url, headers=headers, params=params, timeout=GH_TIMEOUT)
+    else:
+      response = get_gh_session().get(url, headers=headers, params=params, timeout=GH_TIMEOUT)
+    if (wait := github_rate_limit_wait(response)) is not None:
+      guard.bucket.pause(wait)
+    # The offline misses are answered locally, so retrying them can't help.
+    if (error := github_response_error(response)) is not None and not (cache and cache.offline):
+      raise error
+    return response
+
+  with get_tracer().span("github.request", "http", url=url, params=params) as span:
+    try:
+      response = guard.call(send)
+    except RetryableError as e:
+      if e.response is None:
+        raise
+      response = e.response
+    span.set(status_code=response.status_code, response_bytes=len(response.content))
   return response
 
-def search_github(url: str, verbose: bool = False) -> list:
+def fetch_readme(item: dict, verbose: bool = False) -> str | None:
+    """
+    Fetches the README of a single repository.
+
+    Parameters:
+        item (dict): The repository item returned by the github API.
+    Returns:
+        str | None: The decoded README content, if it exists.
+    """
+    contents_url = item.get('url')
+    if not contents_url:
+        return None
+    readme_path = f"{contents_url}/readme"
+    try:
+        readme_response = make_gh_authed_request(readme_path)
+    except (requests.exceptions.RequestException, ResilienceError) as e:
+        print_function_message(f"Error on url: {readme_path}: {e}", verbose=verbose)
+        return None
+    if readme_response.status_code != 200:
+        return None
+    print_function_message(f"README.md found in {item.get('name')}.", verbose=verbose)
+    readme = readme_response.json()
+    return base64.b64decode(readme.get('content')).decode('utf-8')
+
+def iter_github_repo_pages(
+        url: str,
+        per_page: int = GH_PER_PAGE,
+        verbose: bool = False
+        ) -> Iterator[list]:
+    """
+    Iterates over the pages of a github repositories listing.
+
+    Parameters:
+        url (str): The user's github url.
+        per_page (int): The number of repositories requested per page.
+    Returns:
+        Iterator[list]: The repositories of each page, following the
+            `Link: rel=next` header until the last page.
+    """
+    params = {'per_page': per_page}
+    while url:
+        response = make_gh_authed_request(url, params=params)
+        if response.status_code != 200:
+            return
+        page = response.json()
+        print_function_message(f"{len(page)} repositories found.", verbose=verbose)
+        yield page
+        # The next link already carries the query string.
+        url = response.links.get('next', {}).get('url')
+        params = None
+
+def iter_github_readmes(
+        url: str,
+        verbose: bool = False,
+        max_workers: int = GH_MAX_WORKERS,
+        per_page: int = GH_PER_PAGE
+        ) -> Iterator[str]:
+    """
+    Yields the READMEs of the user's repositories as they arrive.
+
+    The READMEs of a page are fetched concurrently while the next page is
+    requested, and they are yielded in the repositories listing order. Only
+    one page of READMEs is held in memory at a time.
+
+    Parameters:
+        url (str): The user's github url.
+        max_workers (int): The maximum number of concurrent README requests.
+            A value of 1 fetches everything serially.
+        per_page (int): The number of repositories requested per page.
+    Returns:
+        Iterator[str]: The decoded README contents.
+    """
+    pages = iter_github_repo_pages(url, per_page=per_page, verbose=verbose)
+    if max_workers <= 1:
+        for page in pages:
+            for item in page:
+                if (readme := fetch_readme(item, verbose=verbose)) is not None:
+                    yield readme
+        return
+
+    # One extra worker prefetches the next page of the listing.
+    executor = ThreadPoolExecutor(max_workers=max_workers + 1)
+    try:
+        # The workers run in a copy of the caller context, so their requests are traced under its span.
+        next_page = executor.submit(copy_context().run, next, pages, None)
+        while (page := next_page.result()) is not None:
+            next_page = executor.submit(copy_context().run, next, pages, None)
+            futures = [executor.submit(copy_context().run, fetch_readme, item, verbose) for item in page]
+            for future in futures:
+                if (readme := future.result()) is not None:
+                    yield readme
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def search_github(url: str, verbose: bool = False, max_workers: int = GH_MAX_WORKERS) -> list:
     """
     Searches the user's github pages.
 
     Parameters:
         url (str): The user's github url.
+        max_workers (int): The maximum number of concurrent README requests.
+            A value of 1 fetches the READMEs serially.
     Returns:
-        list: The repos README.md files, if exists in branch main.
-    """
-    response = make_gh_authed_request(url)
-    results = []
-    if response.status_code == 200:
-        result = response.json()
-        print_function_message(f"{len(result)} repositories found.", verbose=verbose)
-        for item in result:
-            contents_url = item.get('url')
-            if contents_url:
-                readme_path = f"{contents_url}/readme"
-                try:
-                    readme_response = make_gh_authed_request(readme_path)
-                except requests.exceptions.Timeout:
-                    print_function_message(f"Timeout error on url: {readme_path}.", verbose=verbose)
-                    continue
-                if readme_response.status_code == 200:
-                    print_function_message(f"README.md found in {item.get('name')}.", verbose=verbose)
-                    readme = readme_response.json()
-                    content = base64.b64decode(readme.get('content')).decode('utf-8')
-                    results.append(content)
-    return results
+        list: The repos README.md files, if exists in branch main, in the
+            same order as the repositories listing.
+    """
+    return list(iter_github_readmes(url, verbose=verbose, max_workers=max_workers))
@@ -0,0 +1,142 @@
+"""Module for the append-only on-disk log of the agent sessions."""
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Tuple
+
+from .printer import print_function_message
+
+SESSION_DIR = os.getenv('SESSION_DIR', '.cache/sessions')
+
+MESSAGE_PREFIX = b'{"type": "message"'
+# A whole message line ends with its token count, which a cut one lacks.
+MESSAGE_END_PATTERN = re.compile(rb', "tokens": \d+\}\r?\n?$')
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+class SessionState(NamedTuple):
+    """The state of a session rebuilt from its log."""
+    entries: List[Tuple[dict, int]]
+    compacted: int
+    summary: str | None
+    infos: List[str]
+    code: dict
+    files: Dict[str, str]
+    status: dict
+
+class SessionStore:
+    """
+    Append-only JSONL log of an agent session.
+
+    Every message, compaction, gathered information and state change is
+    written as one line when it happens, so nothing is rewritten and a crash
+    loses at most the line being written. Each line is flushed to the OS, but
+    not synced to the disk. Loading replays the log: the messages are only
+    parsed once they are known to be kept, so the messages rolled into a
+    summary are skipped, and their token counts are stored to avoid counting
+    them again. A line cut short by a crash is skipped before the messages are
+    counted, so the pops, truncations and compactions after it still apply to
+    the right messages.
+    """
+    def __init__(self, session_id: str, directory: str = SESSION_DIR) -> None:
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session id: {session_id}")
+        self.session_id = session_id
+        self.path = os.path.join(directory, f"{session_id}.jsonl")
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, directory: str = SESSION_DIR) -> "SessionStore":
+        """Creates a new session, named by its start time."""
+        store = cls(f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}", directory)
+        store.append("session", created=time.time())
+        return store
+
+    @classmethod
+    def open(cls, session_id: str, directory: str = SESSION_DIR) -> "SessionStore":
+        """Opens an existing session, raising `FileNotFoundError` when there is none."""
+        store = cls(session_id, directory)
+        if not os.path.exists(store.path):
+            raise FileNotFoundError(f"No session {session_id} in {directory}.")
+        return store
+
+    def append(self, event_type: str, **fields: object) -> None:
+        """Appends an event to the log."""
+        line = json.dumps({"type": event_type, **fields}, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+                # A line cut short by a crash is ended, so the next events stay readable.
+                if self._file.tell() and not self._ends_with_newline():
+                    self._file.write("\n")
+            self._file.write(line)
+            self._file.flush()
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def close(self) -> None:
+        """Closes the log file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def load(self) -> SessionState:
+        """Rebuilds the state of the session from its log."""
+        offsets: List[int] = []
+        compacted = 0
+        summary = None
+        infos: List[str] = []
+        code: dict = {}
+        files: Dict[str, str] = {}
+        status: dict = {}
+        with open(self.path, 'rb') as file:
+            offset = 0
+            for number, line in enumerate(file, 1):
+                start, offset = offset, offset + len(line)
+                # The messages are only located here, and parsed once known to be kept.
+                if line.startswith(MESSAGE_PREFIX) and MESSAGE_END_PATTERN.search(line[-64:]):
+                    offsets.append(start)
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # The line being written when a session crashed is cut short.
+                    print_function_message(
+                        f"Skipped the cut line {number} of the session {self.session_id}.", verbose=True
+                    )
+                    continue
+                event_type = event["type"]
+                if event_type == "pop" and offsets:
+                    offsets.pop()
+                elif event_type == "truncate":
+                    del offsets[max(event["length"] - compacted, 0):]
+                elif event_type == "compact":
+                    del offsets[:event["count"]]
+                    compacted += event["count"]
+                    summary = event["summary"]
+                elif event_type == "info":
+                    infos.append(event["info"])
+                elif event_type == "code":
+                    code.update(event["code"])
+                    files.update(event.get("files", {}))
+                    for path in event.get("removed", []):
+                        files.pop(path, None)
+                elif event_type == "status":
+                    status = event["status"]
+
+            entries = []
+            for start in offsets:
+                file.seek(start)
+                try:
+                    event = json.loads(file.readline())
+                except json.JSONDecodeError:
+                    continue
+                entries.append((event["message"], event["tokens"]))
+        return SessionState(entries, compacted, summary, infos, code, files, status)
@@ -0,0 +1,126 @@
+"""Module for the content-addressed LLM response cache."""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Share of `max_bytes` left after evicting over the bound.
+EVICTION_TARGET = 0.9
+
+class SummaryCache:
+    """
+    Persistent LLM response cache backed by SQLite.
+
+    Responses are keyed by a hash of the model, the system prompt and the
+    message, which fully determine a bare request. The least recently used
+    entries are evicted once the stored responses grow over `max_bytes`, down
+    to 90% of it so the next eviction waits for more writes. The size of the
+    responses is counted once when the cache is opened, then kept up to date,
+    and counted again from the rows read to evict, which corrects the writes
+    of other processes.
+    """
+    def __init__(self, path: str, max_bytes: int = 20 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+        self._size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _stored_size(self, key: str) -> int:
+        """Gets the size of the stored response of a key, 0 when there is none."""
+        row = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def key(model: str, system: str, message: str) -> str:
+        """Gets the cache key of a request."""
+        digest = hashlib.sha256()
+        for part in (model, system, message):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Gets a cached response, marking it as recently used."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._connection.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Stores a response and evicts the least recently used ones over the size bound."""
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._size -= self._stored_size(key)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._size += size
+            if self._size > self.max_bytes:
+                rows = self._connection.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access"
+                ).fetchall()
+                self._size = sum(old_size for _, old_size in rows)
+                limit = self.max_bytes if self._size <= self.max_bytes else self.max_bytes * EVICTION_TARGET
+                for old_key, old_size in rows:
+                    if self._size <= limit:
+                        break
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    self._size -= old_size
+            self._connection.commit()
+
+    def invalidate(self, key: str) -> bool:
+        """Removes a cached response. Returns whether it was cached."""
+        with self._lock:
+            self._size -= self._stored_size(key)
+            cursor = self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._connection.commit()
+            return cursor.rowcount > 0
+
+    def clear(self) -> None:
+        """Removes every cached response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Gets the hit rate and size of the cache."""
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
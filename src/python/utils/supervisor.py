@@ -0,0 +1,209 @@
+"""Module for supervising the long-running dev server of a project."""
+import asyncio
+import os
+import re
+import signal
+import socket
+from collections import deque
+from typing import Deque, List, Tuple
+
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|\x1bc')
+READY_PATTERN = re.compile(
+    r'compiled successfully|compiled with warnings|you can now view|local:\s+http|ready in',
+    re.IGNORECASE
+)
+COMPILED_PATTERN = re.compile(
+    r'compiled successfully|compiled with warnings|failed to compile|hmr update|page reload',
+    re.IGNORECASE
+)
+MAX_LINE_CHARS = 2000
+READ_CHUNK_BYTES = 64 * 1024
+
+class DevServerSupervisor:
+    """
+    Runs a dev server in the background and watches its output.
+
+    The stdout and stderr lines are kept in a ring buffer of the last
+    `buffer_lines` lines. The server is ready as soon as a line matches the
+    listening banner or its port accepts connections, so the caller gets
+    control back without waiting for the process to end. Every compilation
+    after a change is counted, so a hot reload can be awaited.
+    """
+    def __init__(
+            self,
+            args: List[str],
+            cwd: str,
+            port: int = 3000,
+            buffer_lines: int = 200,
+            env: dict | None = None
+            ) -> None:
+        self.args = args
+        self.cwd = cwd
+        self.port = port
+        self.env = {**os.environ, 'BROWSER': 'none', 'PORT': str(port), **(env or {})}
+        self.output: Deque[Tuple[str, str]] = deque(maxlen=buffer_lines)
+        self.process: asyncio.subprocess.Process | None = None
+        self.compilations = 0
+        self.last_compilation: str | None = None
+        self._ready = asyncio.Event()
+        self._compiled = asyncio.Condition()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def url(self) -> str:
+        """Gets the local url of the server."""
+        return f"http://localhost:{self.port}"
+
+    @property
+    def running(self) -> bool:
+        """Checks if the server process is alive."""
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def ready(self) -> bool:
+        """Checks if the server is alive and ready."""
+        return self.running and self._ready.is_set()
+
+    @property
+    def returncode(self) -> int | None:
+        """Gets the exit code of the server, once it exited."""
+        return None if self.process is None else self.process.returncode
+
+    def tail(self, lines: int = 20) -> str:
+        """Gets the last output lines of the server."""
+        return "\n".join(line for _, line in list(self.output)[-lines:])
+
+    def port_open(self) -> bool:
+        """Checks if something accepts connections on the port."""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+            probe.settimeout(0.2)
+            return probe.connect_ex(('127.0.0.1', self.port)) == 0
+
+    async def start(self, timeout: float = 60) -> bool:
+        """
+        Starts the server and waits until it is ready, exits or the timeout ends.
+
+        Returns whether the server is ready. The server keeps starting in the
+        background after a timeout.
+        """
+        if self.running:
+            return await self.wait_ready(timeout)
+        self.output.clear()
+        self._ready.clear()
+        # A port already in use would look ready, so only the banner counts then.
+        probe_port = not await asyncio.to_thread(self.port_open)
+        self.process = await asyncio.create_subprocess_exec(
+            *self.args,
+            cwd=self.cwd,
+            env=self.env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # The server runs in its own process group, so its children are stopped with it.
+            start_new_session=hasattr(os, 'killpg')
+        )
+        self._tasks = [
+            asyncio.create_task(self._pump(self.process.stdout, 'stdout')),
+            asyncio.create_task(self._pump(self.process.stderr, 'stderr')),
+        ]
+        if probe_port:
+            self._tasks.append(asyncio.create_task(self._probe_port()))
+        return await self.wait_ready(timeout)
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Waits until the server is ready, exits or the timeout ends."""
+        if self.process is None:
+            return False
+        ready = asyncio.create_task(self._ready.wait())
+        exited = asyncio.create_task(self.process.wait())
+        await asyncio.wait({ready, exited}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in (ready, exited):
+            task.cancel()
+        return self.ready
+
+    async def wait_for_reload(self, after: int, timeout: float = 30) -> str | None:
+        """
+        Waits for the server to compile a change after the `after`-th compilation.
+
+        Returns the line reporting the compilation, or None on timeout or exit.
+
+        :param int after: The value of `compilations` before the change was written.
+        :param float timeout: The maximum seconds to wait.
+        """
+        async with self._compiled:
+            try:
+                await asyncio.wait_for(
+                    self._compiled.wait_for(lambda: self.compilations > after or not self.running),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                return None
+        return self.last_compilation if self.compilations > after else None
+
+    async def restart(self, timeout: float = 60) -> bool:
+        """Stops and starts the server again."""
+        await self.stop()
+        return await self.start(timeout)
+
+    async def stop(self, timeout: float = 5) -> None:
+        """Stops the server and its children, killing them after `timeout` seconds."""
+        if self.running:
+            self._signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self._signal(signal.SIGKILL)
+                await self.process.wait()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _signal(self, signum: int) -> None:
+        """Sends a signal to the server process group."""
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(self.process.pid, signum)
+            else:
+                self.process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+
+    async def _pump(self, stream: asyncio.StreamReader, name: str) -> None:
+        """Reads the output of a stream into the ring buffer, line by line."""
+        pending = b""
+        while chunk := await stream.read(READ_CHUNK_BYTES):
+            *lines, pending = (pending + chunk).split(b"\n")
+            # A line with no end is cut, so a single line can't grow without bound.
+            if len(pending) > MAX_LINE_CHARS:
+                lines.append(pending)
+                pending = b""
+            for line in lines:
+                await self._on_line(name, line.decode('utf-8', errors='replace'))
+        if pending:
+            await self._on_line(name, pending.decode('utf-8', errors='replace'))
+        # Wakes the reload waiters once the server exits.
+        async with self._compiled:
+            self._compiled.notify_all()
+
+    async def _on_line(self, name: str, line: str) -> None:
+        """Stores an output line and updates the readiness and the compilations."""
+        line = ANSI_PATTERN.sub('', line).rstrip()[:MAX_LINE_CHARS]
+        if not line:
+            return
+        self.output.append((name, line))
+        if READY_PATTERN.search(line):
+            self._ready.set()
+        if COMPILED_PATTERN.search(line):
+            async with self._compiled:
+                self.compilations += 1
+                self.last_compilation = line
+                self._compiled.notify_all()
+
+    async def _probe_port(self) -> None:
+        """Marks the server ready once its port accepts connections."""
+        while self.running and not self._ready.is_set():
+            if await asyncio.to_thread(self.port_open):
+                self._ready.set()
+                return
+            await asyncio.sleep(0.25)
@@ -0,0 +1,173 @@
+"""Module for the pre-built React project template store."""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Sequence
+
+from python.utils.process_output import run_process
+from python.utils.tracing import get_tracer
+
+CREATE_REACT_APP = ("yarn", "create", "react-app")
+TEMPLATE_DIR_NAME = "template"
+
+def link_or_copy(source: str, destination: str) -> str:
+    """Hardlinks a file, or copies it when the filesystem can't link it."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+    return destination
+
+class TemplateStore:
+    """
+    Local store of React project skeletons with their dependencies installed.
+
+    A template is built once, with `yarn create react-app` and `yarn add` of
+    the extra dependencies, in a folder named by the template version and a
+    hash of the create command and the dependency set. It is rebuilt only
+    when those change, and the outdated builds are removed. New projects are
+    copied from the template, with `node_modules` hardlinked instead of copied.
+    """
+    def __init__(
+            self,
+            root: str,
+            version: str = "cra-5",
+            create_args: Sequence[str] = CREATE_REACT_APP,
+            dependencies: Sequence[str] = (),
+            timeout: float = 300
+            ) -> None:
+        self.root = os.path.expanduser(root)
+        self.version = version
+        self.create_args = list(create_args)
+        self.dependencies = sorted(dependencies)
+        self.timeout = timeout
+        self._build_task: asyncio.Task | None = None
+
+    @property
+    def key(self) -> str:
+        """Gets the folder name of the template, which changes with its version and dependencies."""
+        digest = hashlib.sha256(json.dumps([self.create_args, self.dependencies]).encode('utf-8'))
+        return f"{self.version}-{digest.hexdigest()[:16]}"
+
+    @property
+    def path(self) -> str:
+        """Gets the folder of the built template."""
+        return os.path.join(self.root, self.key)
+
+    def is_built(self) -> bool:
+        """Checks if the template is built. Builds are moved in place only once complete."""
+        return os.path.isdir(self.path)
+
+    def warm(self) -> None:
+        """Starts building the template in the background, if it isn't built yet."""
+        if not self.is_built() and self._build_task is None:
+            self._build_task = asyncio.create_task(self.build())
+            self._build_task.add_done_callback(self._on_build_done)
+
+    def _on_build_done(self, task: asyncio.Task) -> None:
+        """Forgets a failed build, so the next call retries it and its error isn't lost."""
+        if task.cancelled() or task.exception() is not None:
+            self._build_task = None
+
+    async def ensure(self) -> str:
+        """Waits for the template to be built, building it if needed, and gets its folder."""
+        if self.is_built():
+            return self.path
+        self.warm()
+        # Shielded, so a cancelled caller doesn't cancel the build shared with the others.
+        return await asyncio.shield(self._build_task)
+
+    async def build(self) -> str:
+        """
+        Builds the template in a temporary folder and moves it in place.
+
+        Raises `subprocess.CalledProcessError` or `subprocess.TimeoutExpired`
+        when a yarn command fails, with the bounded output of the command.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        build_dir = tempfile.mkdtemp(prefix=f".{self.key}-", dir=self.root)
+        try:
+            template_path = os.path.join(build_dir, TEMPLATE_DIR_NAME)
+            await run_process(
+                [*self.create_args, TEMPLATE_DIR_NAME],
+                cwd=build_dir,
+                timeout=self.timeout
+            )
+            if self.dependencies:
+                await run_process(
+                    ["yarn", "add", *self.dependencies],
+                    cwd=template_path,
+                    timeout=self.timeout
+                )
+            try:
+                os.rename(template_path, self.path)
+            except OSError:
+                # Another process built the same template first.
+                if not self.is_built():
+                    raise
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        self.prune()
+        return self.path
+
+    def prune(self) -> List[str]:
+        """Removes the builds of the other versions and dependency sets."""
+        removed = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != self.key and not name.startswith(".") and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+        return removed
+
+    async def create_project(self, project_path: str) -> str:
+        """
+        Creates a project from the template, building the template if needed.
+
+        Returns a description of the creation.
+
+        :param str project_path: The folder of the new project.
+        """
+        start = time.perf_counter()
+        was_built = self.is_built()
+        with get_tracer().span("template.create_project", "internal", key=self.key, cached=was_built):
+            template_path = await self.ensure()
+            await asyncio.to_thread(self.copy_template, template_path, project_path)
+        source = "cached template" if was_built else "newly built template"
+        return f"Project created from the {source} {self.key} in {time.perf_counter() - start:.2f}s."
+
+    @staticmethod
+    def copy_template(template_path: str, project_path: str) -> None:
+        """Copies the template into a project, hardlinking its dependencies."""
+        node_modules = os.path.join(template_path, "node_modules")
+
+        def ignore(directory: str, names: List[str]) -> List[str]:
+            if directory == template_path:
+                return ["node_modules"]
+            # Build tools write their caches here, which must not reach the shared files.
+            if directory == node_modules:
+                return [".cache"]
+            return []
+
+        shutil.copytree(template_path, project_path, symlinks=True, ignore=ignore, dirs_exist_ok=True)
+        if os.path.isdir(node_modules):
+            shutil.copytree(
+                node_modules,
+                os.path.join(project_path, "node_modules"),
+                symlinks=True,
+                ignore=ignore,
+                copy_function=link_or_copy,
+                dirs_exist_ok=True
+            )
+
+        package_path = os.path.join(project_path, "package.json")
+        if os.path.exists(package_path):
+            with open(package_path) as file:
+                package = json.load(file)
+            package["name"] = os.path.basename(project_path)
+            with open(package_path, 'w') as file:
+                json.dump(package, file, indent=2)
@@ -0,0 +1,171 @@
+"""Module for parsing the tool calls written in the text of the assistant answers."""
+import hashlib
+import json
+import re
+from typing import List, NamedTuple
+
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+
+FUNCTION_MARKER = '<function'
+CALL_START = re.compile(r'<function\s*=\s*([A-Za-z0-9_]+)\s*\{')
+# What a call start may look like while it is still being streamed.
+PARTIAL_CALL_START = re.compile(r'<function\s*(?:=\s*(?:[A-Za-z0-9_]+\s*)?)?')
+CALL_END = re.compile(r'\s*>')
+ARGUMENT_TOKENS = re.compile(r'["\\{}]')
+
+class ParsedText(NamedTuple):
+    """The tool calls written in a text, and the text around them."""
+    tool_calls: List[ChatCompletionMessageToolCall]
+    text: str
+
+def tool_call_id(index: int, name: str, arguments: str) -> str:
+    """Gets an id derived from the call, so parsing the same answer again gives the same ids."""
+    digest = hashlib.sha1(f"{index}\0{name}\0{arguments}".encode('utf-8')).hexdigest()
+    return f"call_{digest[:24]}"
+
+def parse_tool_calls(text: str) -> ParsedText:
+    """Parses a whole text, skipping the scan when it has no `<function` marker."""
+    if FUNCTION_MARKER not in text:
+        return ParsedText([], text)
+    parser = ToolCallParser()
+    parser.feed(text)
+    return parser.close()
+
+class ToolCallParser:
+    """
+    Incremental parser of the `<function=name{...}>` tool calls written in an answer.
+
+    Some models write their tool calls in the text instead of calling the
+    tools. The text is fed in chunks as it streams and scanned once: the
+    chunks without a `<` are kept as they are, and a call is read from its
+    marker by matching the braces of its JSON arguments, which may span
+    several lines and hold braces in their strings. A call whose arguments
+    aren't valid JSON stays in the text.
+    """
+    def __init__(self) -> None:
+        self.tool_calls: List[ChatCompletionMessageToolCall] = []
+        self._text_parts: List[str] = []
+        # The text not consumed yet starts at `_start` in the buffer.
+        self._buffer = ""
+        self._start = 0
+        self._name = ""
+        self._arguments_start = -1
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+
+    def feed(self, chunk: str) -> List[ChatCompletionMessageToolCall]:
+        """Feeds a chunk of the text, returning the tool calls it completed."""
+        if not self._buffer and '<' not in chunk:
+            self._text_parts.append(chunk)
+            return []
+        # The consumed text is dropped once per chunk, and the offsets move with it.
+        offset = self._start
+        self._buffer = self._buffer[offset:] + chunk
+        self._start = 0
+        if self._arguments_start >= 0:
+            self._arguments_start -= offset
+            self._position -= offset
+            self._escaped_at -= offset
+        count = len(self.tool_calls)
+        self._scan(final=False)
+        return self.tool_calls[count:]
+
+    def close(self) -> ParsedText:
+        """Ends the text, keeping an unfinished call as text, and gets the result."""
+        self._scan(final=True)
+        return ParsedText(list(self.tool_calls), "".join(self._text_parts))
+
+    def _scan(self, final: bool) -> None:
+        """Consumes the buffer up to the end of the last complete call or text."""
+        buffer = self._buffer
+        while self._start < len(buffer):
+            if self._arguments_start < 0:
+                index = buffer.find(FUNCTION_MARKER, self._start)
+                if index < 0:
+                    # Only the end of the buffer may be the start of a marker cut by the chunk.
+                    tail = buffer.rfind('<', max(self._start, len(buffer) - len(FUNCTION_MARKER) + 1))
+                    if final or tail < 0 or not FUNCTION_MARKER.startswith(buffer[tail:]):
+                        tail = len(buffer)
+                    self._consume_text(tail)
+                    break
+                self._consume_text(index)
+                match = CALL_START.match(buffer, index)
+                if match is None:
+                    if not final and PARTIAL_CALL_START.fullmatch(buffer, index) is not None:
+                        break
+                    self._consume_text(index + 1)
+                    continue
+                self._name = match.group(1)
+                self._arguments_start = self._position = match.end() - 1
+                self._depth = 0
+                self._in_string = False
+                self._escaped_at = -1
+
+            end = self._match_braces()
+            if end < 0:
+                if final:
+                    self._arguments_start = -1
+                    self._consume_text(len(buffer))
+                break
+            close = CALL_END.match(buffer, end)
+            if close is None:
+                if not final and not buffer[end:].strip():
+                    break
+                # Not a call after all, its text is scanned again past the `<`.
+                self._arguments_start = -1
+                self._consume_text(self._start + 1)
+                continue
+            arguments = buffer[self._arguments_start:end]
+            self._arguments_start = -1
+            try:
+                json.loads(arguments)
+            except json.JSONDecodeError:
+                self._consume_text(close.end())
+                continue
+            self.tool_calls.append(ChatCompletionMessageToolCall(
+                id=tool_call_id(len(self.tool_calls), self._name, arguments),
+                type="function",
+                function=Function(name=self._name, arguments=arguments)
+            ))
+            self._start = close.end()
+        if self._start == len(buffer):
+            self._buffer = ""
+            self._start = 0
+
+    def _match_braces(self) -> int:
+        """Continues matching the braces of the arguments, getting their end or -1 when they are still open."""
+        if self._depth == 0 and self._position > self._arguments_start:
+            # Closed already, while the end of the call was still streaming.
+            return self._position
+        for token in ARGUMENT_TOKENS.finditer(self._buffer, self._position):
+            index = token.start()
+            char = token.group()
+            if self._in_string:
+                if index == self._escaped_at:
+                    continue
+                if char == '\\':
+                    self._escaped_at = index + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._position = index + 1
+                    return self._position
+        self._position = len(self._buffer)
+        return -1
+
+    def _consume_text(self, end: int) -> None:
+        """Moves the text up to `end` out of the buffer."""
+        if end > self._start:
+            self._text_parts.append(self._buffer[self._start:end])
+            self._start = end
@@ -0,0 +1,249 @@
+"""Module for tracing the agent LLM calls, tools, requests and subprocesses."""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List
+
+from openai.types import CompletionUsage
+
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '10000'))
+SERVICE_NAME = "react-react-agent"
+
+# Prices in dollars per million input, output and cached input tokens.
+MODEL_PRICES: Dict[str, tuple] = {
+    'gpt-4o-mini': (0.15, 0.60, 0.075),
+    'gpt-4o': (2.50, 10.00, 1.25),
+}
+
+_current_span: ContextVar["Span | None"] = ContextVar('current_span', default=None)
+
+def estimate_cost(model: str, usage: CompletionUsage | None) -> float | None:
+    """Estimates the cost in dollars of a completion, when the model price is known."""
+    if usage is None or model not in MODEL_PRICES:
+        return None
+    input_price, output_price, cached_price = MODEL_PRICES[model]
+    details = usage.prompt_tokens_details
+    cached = (details.cached_tokens or 0) if details else 0
+    return (
+        (usage.prompt_tokens - cached) * input_price
+        + cached * cached_price
+        + usage.completion_tokens * output_price
+    ) / 1_000_000
+
+def usage_attributes(model: str, usage: CompletionUsage | None) -> dict:
+    """Gets the span attributes of a completion usage."""
+    if usage is None:
+        return {}
+    details = usage.prompt_tokens_details
+    return {
+        'prompt_tokens': usage.prompt_tokens,
+        'completion_tokens': usage.completion_tokens,
+        'cached_tokens': (details.cached_tokens or 0) if details else 0,
+        'cost_usd': estimate_cost(model, usage),
+    }
+
+class Span:
+    """A timed operation, with its parent and its attributes."""
+    def __init__(self, name: str, kind: str, parent: "Span | None", attributes: dict) -> None:
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.path = f"{parent.path};{name}" if parent else name
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.status = "ok"
+        self.error: str | None = None
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self._start = time.perf_counter()
+        self.seconds = 0.0
+
+    def set(self, **attributes: object) -> None:
+        """Sets attributes of the span, skipping the None values."""
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def fail(self, error: BaseException | str) -> None:
+        """Marks the span as failed."""
+        self.status = "error"
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        """Ends the span."""
+        self.seconds = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self.seconds * 1e9)
+
+    def to_dict(self) -> dict:
+        """Gets the span as a JSON line."""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'seconds': round(self.seconds, 6),
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+    def to_otlp(self) -> dict:
+        """Gets the span in the OpenTelemetry OTLP/JSON format."""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 3 if self.kind in ('llm', 'http') else 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [otlp_attribute(key, value) for key, value in self.attributes.items()]
+            + [otlp_attribute('span.kind', self.kind)],
+            'status': {'code': 2, 'message': self.error} if self.status == "error" else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+def otlp_attribute(key: str, value: object) -> dict:
+    """Converts an attribute to an OTLP key/value."""
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': value if isinstance(value, str) else json.dumps(value)}
+    return {'key': key, 'value': typed}
+
+class Tracer:
+    """
+    Records the spans of the session.
+
+    The spans are nested with a context variable, so the spans of concurrent
+    tasks and of threads started with a copied context get the right parent.
+    The last `max_spans` finished spans are kept in memory, and each one is
+    appended to the JSONL file at `jsonl_path` as soon as it ends.
+    """
+    def __init__(self, jsonl_path: str | None = None, max_spans: int = TRACE_MAX_SPANS) -> None:
+        self.jsonl_path = jsonl_path
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        if jsonl_path and (directory := os.path.dirname(jsonl_path)):
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes: object) -> Iterator[Span]:
+        """Records a span around a block, as a child of the current span."""
+        span = Span(name, kind, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        """Keeps a finished span and appends it to the JSONL file."""
+        with self._lock:
+            self.spans.append(span)
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a') as file:
+                    file.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def export_jsonl(self, path: str) -> None:
+        """Writes the kept spans as JSON lines."""
+        with self._lock, open(path, 'w') as file:
+            for span in self.spans:
+                file.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+    def export_otlp(self, path: str) -> None:
+        """Writes the kept spans as an OTLP/JSON trace export request."""
+        with self._lock:
+            spans = [span.to_otlp() for span in self.spans]
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+        }]}
+        with open(path, 'w') as file:
+            json.dump(payload, file)
+
+    def summary(self, width: int = 30) -> str:
+        """
+        Summarizes the spans as a flame-style tree.
+
+        The spans with the same path of names are merged, with their total
+        seconds, their count and a bar relative to the slowest root. The
+        children of concurrent spans can add up to more than their parent,
+        so the bars are capped at `width`.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return "No spans recorded."
+        totals: Dict[str, List[float]] = {}
+        for span in spans:
+            total = totals.setdefault(span.path, [0.0, 0, 0])
+            total[0] += span.seconds
+            total[1] += 1
+            total[2] += span.status == "error"
+        scale = max((seconds for path, (seconds, _, _) in totals.items() if ';' not in path), default=0) or 1
+        lines = []
+        for path in sorted(totals, key=lambda path: [
+            (-totals.get(';'.join(path.split(';')[:depth + 1]), [0])[0], part)
+            for depth, part in enumerate(path.split(';'))
+        ]):
+            seconds, count, errors = totals[path]
+            depth = path.count(';')
+            label = f"{'  ' * depth}{path.rsplit(';', 1)[-1]}"
+            bar = '█' * min(max(round(seconds / scale * width), 1), width)
+            failed = f" {errors} failed" if errors else ""
+            lines.append(f"{label:<40} {seconds:>8.2f}s {count:>4}x{failed:<10} {bar}")
+
+        # The answers served by the summary cache never reached the provider.
+        cache_hits = sum(1 for span in spans if span.kind == "llm" and span.attributes.get('cache_hit'))
+        llm_spans = [span for span in spans if span.kind == "llm" and not span.attributes.get('cache_hit')]
+        tokens = {
+            key: sum(span.attributes.get(key, 0) for span in llm_spans)
+            for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens')
+        }
+        cost = sum(span.attributes.get('cost_usd') or 0 for span in llm_spans)
+        lines.append(
+            f"LLM calls: {len(llm_spans)}, prompt tokens: {tokens['prompt_tokens']} "
+            f"({tokens['cached_tokens']} cached), completion tokens: {tokens['completion_tokens']}, "
+            f"estimated cost: ${cost:.4f}"
+        )
+        if cache_hits:
+            lines.append(f"LLM cache hits: {cache_hits}, answered without calling the provider")
+        return "\n".join(lines)
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    """Gets the tracer of the session."""
+    return _tracer
+
+def configure_tracing(jsonl_path: str | None = None) -> Tracer:
+    """Replaces the tracer of the session, appending the spans to `jsonl_path` when set."""
+    global _tracer
+    _tracer = Tracer(jsonl_path)
+    return _tracer
+
+def current_span() -> Span | None:
+    """Gets the span of the running code, if any."""
+    return _current_span.get()
+
+def annotate(**attributes: object) -> None:
+    """Sets attributes of the current span, if any."""
+    if (span := _current_span.get()) is not None:
+        span.set(**attributes)